@@ -0,0 +1,115 @@
+"""
+Compares running many programs one after the other against running them
+as concurrent asyncio tasks, which take turns every slice. Reports the
+throughput and the latency of each program, from the start of the whole
+run until it finished. Awaiting the programs one at a time shows the cost
+of counting the slices apart from the cost of switching between them.
+
+Usage: python benchmarks/bench_async.py [programs] [slice size]
+"""
+
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SRC = os.path.join(ROOT, "src")
+sys.path.insert(0, SRC)
+
+from lexer import Lexer
+from interpreter import Interpreter
+from compiler import Compiler
+from output import CaptureSink
+
+PROGRAM = """
+setjmpp "loop"
+add rt rn rt
+sub rn 1 rn
+jmpif "loop" rn > 0
+stdout rt endl
+"""
+
+
+def workload(programs: int) -> list[int]:
+    """
+    Loop counts of the programs, mostly short with a few long ones, like
+    requests to a server.
+    """
+    rng = random.Random(0)
+    return [
+        rng.randint(50_000, 100_000) if rng.random() < 0.05 else rng.randint(500, 2_000)
+        for _ in range(programs)
+    ]
+
+
+def report(name: str, elapsed: float, latencies: list[float]) -> None:
+    latencies = sorted(latencies)
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[min(len(latencies) - 1, len(latencies) * 99 // 100)]
+
+    print(
+        f"{name:<12} {len(latencies) / elapsed:10.0f} programs/s   "
+        f"p50 {p50 * 1000:8.1f} ms   p99 {p99 * 1000:8.1f} ms   "
+        f"mean {statistics.mean(latencies) * 1000:8.1f} ms"
+    )
+
+
+def sequential(program, counts: list[int]) -> tuple[float, list[float]]:
+    latencies = []
+    start = time.perf_counter()
+
+    for count in counts:
+        Interpreter([], CaptureSink(), inputs={"rn": count}).run(program)
+        latencies.append(time.perf_counter() - start)
+
+    return time.perf_counter() - start, latencies
+
+
+async def awaited(
+    program, counts: list[int], sliceSize: int
+) -> tuple[float, list[float]]:
+    latencies = []
+    start = time.perf_counter()
+
+    for count in counts:
+        interpreter = Interpreter([], CaptureSink(), inputs={"rn": count})
+        await interpreter.runAsync(program, sliceSize)
+        latencies.append(time.perf_counter() - start)
+
+    return time.perf_counter() - start, latencies
+
+
+async def concurrent(
+    program, counts: list[int], sliceSize: int
+) -> tuple[float, list[float]]:
+    latencies = []
+    start = time.perf_counter()
+
+    async def one(count: int) -> None:
+        interpreter = Interpreter([], CaptureSink(), inputs={"rn": count})
+        await interpreter.runAsync(program, sliceSize)
+        latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(count) for count in counts))
+
+    return time.perf_counter() - start, latencies
+
+
+def main() -> None:
+    programs = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    sliceSize = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+
+    program = Compiler(Lexer(PROGRAM).iterLines()).compile()
+    counts = workload(programs)
+
+    print(f"{programs} programs, slice size {sliceSize}")
+    report("sequential", *sequential(program, counts))
+    report("awaited", *asyncio.run(awaited(program, counts, sliceSize)))
+    report("concurrent", *asyncio.run(concurrent(program, counts, sliceSize)))
+
+
+if __name__ == "__main__":
+    main()
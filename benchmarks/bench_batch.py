@@ -0,0 +1,69 @@
+"""
+Compares running a kernel over many sets of initial registers one
+Interpreter at a time against a single batch run over all of them.
+
+Usage: python benchmarks/bench_batch.py [lanes]
+"""
+
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SRC = os.path.join(ROOT, "src")
+sys.path.insert(0, SRC)
+
+import numpy
+
+from lexer import Lexer
+from interpreter import Interpreter
+from compiler import Compiler
+from output import CaptureSink
+from batch import BatchRunner
+
+# Iterates the logistic map, lanes stop after a different number of steps.
+KERNEL = """
+setjmpp "loop"
+sub 1 rx ry
+mul rx ry ry
+mul rr ry rx
+sub rn 1 rn
+jmpif "loop" rn > 0
+stdout rx
+"""
+
+
+def main() -> None:
+    lanes = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    random = numpy.random.default_rng(0)
+    inputs = {
+        "rx": random.uniform(0.1, 0.9, lanes).tolist(),
+        "rr": random.uniform(2.5, 4.0, lanes).tolist(),
+        "rn": random.integers(50, 100, lanes).tolist(),
+    }
+
+    start = time.perf_counter()
+    expected = []
+    for lane in range(lanes):
+        setup = "".join(f"set {name} {values[lane]!r}\n" for name, values in inputs.items())
+        sink = CaptureSink()
+        Interpreter(Lexer(setup + KERNEL).tokenize(), sink).run()
+        expected.append(sink.getvalue().decode())
+    single = time.perf_counter() - start
+
+    program = Compiler(Lexer(KERNEL).iterLines()).compile()
+
+    start = time.perf_counter()
+    result = BatchRunner(program, inputs).run()
+    batch = time.perf_counter() - start
+
+    assert result.outputs == expected
+
+    print(f"{lanes} lanes:")
+    print(f"  one interpreter per lane: {single * 1000:9.2f} ms")
+    print(f"  batch:                    {batch * 1000:9.2f} ms  {single / batch:6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Compares running a program through the daemon against starting a process
+per run. Reports the requests per second and the latency of each run for
+main.py per run, client.py per run, and a client keeping its connection
+open, alone and with several connections at once.
+
+Usage: python benchmarks/bench_daemon.py [runs] [connections]
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SRC = os.path.join(ROOT, "src")
+sys.path.insert(0, SRC)
+
+from client import Client
+
+PROGRAM = """
+set rn 200
+setjmpp "loop"
+add rt rn rt
+sub rn 1 rn
+jmpif "loop" rn > 0
+stdout rt endl
+"""
+
+
+def report(name: str, elapsed: float, latencies: list[float]) -> None:
+    latencies = sorted(latencies)
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[min(len(latencies) - 1, len(latencies) * 99 // 100)]
+
+    print(
+        f"{name:<24} {len(latencies) / elapsed:9.0f} requests/s   "
+        f"p50 {p50 * 1000:8.2f} ms   p99 {p99 * 1000:8.2f} ms"
+    )
+
+
+def timed(run, runs: int) -> tuple[float, list[float]]:
+    latencies = []
+    start = time.perf_counter()
+
+    for _ in range(runs):
+        before = time.perf_counter()
+        run()
+        latencies.append(time.perf_counter() - before)
+
+    return time.perf_counter() - start, latencies
+
+
+def processes(command: list[str], runs: int) -> tuple[float, list[float]]:
+    return timed(lambda: subprocess.run(command, check=True, capture_output=True), runs)
+
+
+def concurrent(
+    socketPath: str, path: str, runs: int, connections: int
+) -> tuple[float, list[float]]:
+    latencies: list[float] = []
+
+    def work() -> None:
+        with Client(socketPath) as client:
+            _, own = timed(lambda: client.run(path=path), runs // connections)
+        latencies.extend(own)
+
+    threads = [threading.Thread(target=work) for _ in range(connections)]
+    start = time.perf_counter()
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return time.perf_counter() - start, latencies
+
+
+def waitForSocket(socketPath: str) -> None:
+    deadline = time.monotonic() + 10
+
+    while not os.path.exists(socketPath):
+        if time.monotonic() > deadline:
+            raise RuntimeError("The daemon didn't start.")
+        time.sleep(0.01)
+
+
+def main() -> None:
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    connections = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "program.cnstr")
+        socketPath = os.path.join(directory, "cnstr.sock")
+
+        with open(path, "w") as f:
+            f.write(PROGRAM)
+
+        daemon = subprocess.Popen(
+            [sys.executable, os.path.join(SRC, "daemon.py"), "--socket", socketPath],
+            stdout=subprocess.DEVNULL,
+        )
+
+        try:
+            waitForSocket(socketPath)
+
+            report(
+                "main.py per run",
+                *processes(
+                    [sys.executable, os.path.join(SRC, "main.py"), "--no-cache", path],
+                    runs,
+                ),
+            )
+            report(
+                "client.py per run",
+                *processes(
+                    [
+                        sys.executable,
+                        os.path.join(SRC, "client.py"),
+                        "--socket",
+                        socketPath,
+                        path,
+                    ],
+                    runs,
+                ),
+            )
+
+            # Many more runs, the connection costs nothing to keep.
+            with Client(socketPath) as client:
+                report(
+                    "one connection",
+                    *timed(lambda: client.run(path=path), runs * 20),
+                )
+
+            report(
+                f"{connections} connections",
+                *concurrent(socketPath, path, runs * 20, connections),
+            )
+        finally:
+            daemon.terminate()
+            daemon.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Measures lexing throughput (lines/sec) of the single pass scanner against
+the word by word reference path (utils.smart_split + per-word checks).
+
+Usage: python benchmarks/bench_lexer.py [lines]
+"""
+
+import os
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+
+from lexer import Lexer
+from synthetic import straightLineProgram
+
+
+def throughput(lines: list[str], reference: bool) -> float:
+    lexer = Lexer("")
+    tokenizeLine = lexer._tokenizeLineReference if reference else lexer._tokenizeLine
+
+    start = time.perf_counter()
+    for line in lines:
+        tokenizeLine(line)
+    elapsed = time.perf_counter() - start
+
+    return len(lines) / elapsed
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    lines = straightLineProgram(count).splitlines()
+
+    reference = throughput(lines, True)
+    scanner = throughput(lines, False)
+
+    print(f"{len(lines)} lines:")
+    print(f"  smart_split + checks: {reference:12,.0f} lines/s")
+    print(f"  scanner:              {scanner:12,.0f} lines/s")
+    print(f"  speedup:              {scanner / reference:12.2f}x")
+
+
+if __name__ == "__main__":
+    main()
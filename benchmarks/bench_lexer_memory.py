@@ -0,0 +1,87 @@
+"""
+Compares peak memory of compiling through the flat token list
+(Lexer.tokenize) with compiling straight from the streaming lexer
+(Lexer.iterLines), reading from a string, a file and a memory map.
+
+Usage: python benchmarks/bench_lexer_memory.py [lines]
+"""
+
+import mmap
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+
+from lexer import Lexer
+from interpreter import Interpreter
+from compiler import Compiler
+from synthetic import straightLineProgram
+
+
+def flat(path: str) -> None:
+    with open(path) as f:
+        source = f.read()
+
+    Interpreter(Lexer(source).tokenize()).compile()
+
+
+def streamString(path: str) -> None:
+    with open(path) as f:
+        source = f.read()
+
+    Compiler(Lexer(source).iterLines(), keepLines=False).compile()
+
+
+def streamFile(path: str) -> None:
+    with open(path) as f:
+        Compiler(Lexer(f).iterLines(), keepLines=False).compile()
+
+
+def streamMmap(path: str) -> None:
+    with open(path, "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mapped:
+        Compiler(Lexer(mapped).iterLines(), keepLines=False).compile()
+
+
+def measure(function, path: str) -> tuple[float, int]:
+    # Timed separately, tracing allocations slows everything down.
+    start = time.perf_counter()
+    function(path)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    function(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return elapsed, peak
+
+
+def main() -> None:
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "generated.cnstr")
+
+        with open(path, "w") as f:
+            f.write(straightLineProgram(lines))
+
+        print(f"{os.path.getsize(path) / 2**20:.1f} MiB source, {lines} lines")
+
+        for name, function in (
+            ("tokenize + compile", flat),
+            ("iterLines, string", streamString),
+            ("iterLines, file", streamFile),
+            ("iterLines, mmap", streamMmap),
+        ):
+            elapsed, peak = measure(function, path)
+            print(f"  {name:<20} peak {peak / 2**20:8.1f} MiB  {elapsed:6.2f} s")
+
+
+if __name__ == "__main__":
+    main()
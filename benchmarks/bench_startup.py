@@ -0,0 +1,79 @@
+"""
+Compares cold startup (lex + compile) with warm startup (load from the
+bytecode cache), in process and end to end through main.py.
+
+Usage: python benchmarks/bench_startup.py [lines]
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+
+from lexer import Lexer
+from interpreter import Interpreter
+from bytecode import BytecodeCache
+from synthetic import straightLineProgram
+
+
+def timeIt(function, repeat: int) -> float:
+    best = float("inf")
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def main() -> None:
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "generated.cnstr")
+        source = straightLineProgram(lines)
+
+        with open(path, "w") as f:
+            f.write(source)
+
+        cache = BytecodeCache(path)
+
+        def cold() -> None:
+            Interpreter(Lexer(source).tokenize()).compile()
+
+        def warm() -> None:
+            with open(path) as f:
+                cache.load(f.read())
+
+        cache.store(source, Interpreter(Lexer(source).tokenize()).compile())
+
+        coldTime = timeIt(cold, 5)
+        warmTime = timeIt(warm, 5)
+
+        print(f"in process, {len(source.splitlines())} lines:")
+        print(f"  cold (lex + compile): {coldTime * 1000:8.2f} ms")
+        print(f"  warm (cache load):    {warmTime * 1000:8.2f} ms")
+        print(f"  speedup:              {coldTime / warmTime:8.2f}x")
+
+        def runMain(*flags: str) -> None:
+            subprocess.run(
+                [sys.executable, os.path.join(SRC, "main.py"), path, *flags],
+                stdout=subprocess.DEVNULL,
+                check=True,
+            )
+
+        coldTime = timeIt(lambda: runMain("--no-cache"), 5)
+        warmTime = timeIt(runMain, 5)
+
+        print("end to end, main.py:")
+        print(f"  cold (--no-cache):    {coldTime * 1000:8.2f} ms")
+        print(f"  warm (cached):        {warmTime * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Builds a string of up to 1M characters with 'strapp' in a loop, appending to
+a flat str every time and through ropes, to show how both scale with the
+final length.
+
+Usage: python benchmarks/bench_strapp.py [characters]
+"""
+
+import os
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+
+from lexer import Lexer
+from interpreter import Interpreter
+from output import CaptureSink
+import rope
+
+CHUNK = "0123456789"
+
+
+def appendProgram(characters: int) -> str:
+    return (
+        f"set rn {characters // len(CHUNK)}\n"
+        "set rs ''\n"
+        'setjmpp "loop"\n'
+        f"strapp rs '{CHUNK}' rs\n"
+        "add ri 1 ri\n"
+        'jmpif "loop" ri < rn\n'
+        "strlen rs rl\n"
+        "stdout rl endl\n"
+    )
+
+
+def timeRun(source: str, backend: str) -> float:
+    interpreter = Interpreter(Lexer(source).tokenize(), CaptureSink())
+    program = interpreter.compile()
+
+    start = time.perf_counter()
+    if backend == "pyexec":
+        interpreter.runTranspiled(program)
+    else:
+        interpreter.run(program)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    largest = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    minRopeLength = rope.MIN_ROPE_LENGTH
+
+    print(f"{'characters':>10}  {'backend':<8} {'flat str':>10} {'rope':>10}")
+
+    for characters in (largest // 8, largest // 4, largest // 2, largest):
+        source = appendProgram(characters)
+
+        for backend in ("closures", "pyexec"):
+            # Ropes are never built when every string counts as short.
+            rope.MIN_ROPE_LENGTH = float("inf")
+            flat = timeRun(source, backend)
+            rope.MIN_ROPE_LENGTH = minRopeLength
+            ropes = timeRun(source, backend)
+
+            print(
+                f"{characters:>10}  {backend:<8} {flat:>9.3f}s {ropes:>9.3f}s"
+            )
+
+
+if __name__ == "__main__":
+    main()
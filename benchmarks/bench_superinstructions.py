@@ -0,0 +1,64 @@
+"""
+Compares running the programs in programs/ without superinstructions, with
+statically fused superinstructions and with superinstructions picked from a
+pair profile of a previous run.
+
+Usage: python benchmarks/bench_superinstructions.py [repeat]
+"""
+
+import glob
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SRC = os.path.join(ROOT, "src")
+sys.path.insert(0, SRC)
+
+from lexer import Lexer
+from interpreter import Interpreter
+from compiler import Compiler
+from output import CaptureSink
+
+
+def timeIt(function, repeat: int) -> float:
+    best = float("inf")
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def main() -> None:
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    for path in sorted(glob.glob(os.path.join(ROOT, "programs", "*.cnstr"))):
+        with open(path) as f:
+            source = f.read()
+
+        program = Compiler(Lexer(source).iterLines()).compile()
+        profile = Interpreter([], CaptureSink()).profilePairs(program)
+
+        unfused = timeIt(
+            lambda: Interpreter([], CaptureSink()).run(program, fuse=False), repeat
+        )
+        fused = timeIt(lambda: Interpreter([], CaptureSink()).run(program), repeat)
+        profiled = timeIt(
+            lambda: Interpreter([], CaptureSink()).run(program, profile=profile),
+            repeat,
+        )
+
+        print(f"{os.path.basename(path)}, {len(program.instructions)} instructions:")
+        print(f"  unfused:          {unfused * 1000:8.2f} ms")
+        print(f"  fused:            {fused * 1000:8.2f} ms  {unfused / fused:5.2f}x")
+        print(f"  profile fused:    {profiled * 1000:8.2f} ms  {unfused / profiled:5.2f}x")
+        print("  most executed pairs:")
+        for line in profile.format(5).splitlines():
+            print(f"  {line}")
+
+
+if __name__ == "__main__":
+    main()
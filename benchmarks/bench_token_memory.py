@@ -0,0 +1,74 @@
+"""
+Measures the memory the token list of a large program keeps alive, per
+token, with the interned slotted tokens of the lexer against a fresh
+dataclass token with a __dict__ per word, as the lexer produced before.
+
+Usage: python benchmarks/bench_token_memory.py [lines]
+"""
+
+import os
+import sys
+import tracemalloc
+from dataclasses import dataclass
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+
+from common import TokenType, TokenValue
+from lexer import Lexer
+from synthetic import straightLineProgram, loopProgram, stringProgram
+
+
+@dataclass
+class DictToken:
+    """The token as it was, with a __dict__ per instance"""
+
+    tokenType: TokenType
+    tokenValue: TokenValue | None
+    value: str | int | float
+
+
+def interned(source: str) -> list:
+    return Lexer(source).tokenize()
+
+
+def perWord(source: str) -> list:
+    # Values are shared like before, only the tokens are fresh.
+    return [
+        DictToken(token.tokenType, token.tokenValue, token.value)
+        for token in Lexer(source).tokenize()
+    ]
+
+
+def retained(function, source: str) -> tuple[int, int]:
+    """
+    Returns the number of tokens and the bytes they keep allocated.
+    """
+    tracemalloc.start()
+    tokens = function(source)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return len(tokens), size
+
+
+def main() -> None:
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    # Mostly straight arithmetic, with some loops and string handling.
+    source = straightLineProgram(lines)
+    source += loopProgram(10, 3) * (lines // 100)
+    source += stringProgram(10) * (lines // 100)
+
+    print(f"{source.count(chr(10))} lines:")
+
+    for name, function in (("dataclass per word", perWord), ("interned slots", interned)):
+        count, size = retained(function, source)
+        print(
+            f"  {name:<20} {count:>9} tokens  {size / 1e6:8.1f} MB  "
+            f"{size / count:6.1f} bytes/token"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""
+Runs the benchmark suite: tokenizing, every opcode handler, compiling and
+running synthetic programs, and the example programs end to end. Results
+are written as JSON and can be compared against a saved baseline, which
+fails if a benchmark got slower by more than the threshold. Benchmarks
+which look slower are timed again first, to tell noise from regressions.
+
+Usage: python benchmarks/run_benchmarks.py [-k FILTER] [--output FILE]
+       [--baseline FILE] [--save-baseline FILE] [--threshold 0.25]
+       [--retries 3]
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import sys
+import timeit
+from typing import Callable
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SRC = os.path.join(ROOT, "src")
+sys.path.insert(0, SRC)
+
+from lexer import Lexer
+from interpreter import Interpreter
+from compiler import Compiler, Program
+from output import OutputSink, CaptureSink
+from synthetic import straightLineProgram, loopProgram, stringProgram, outputProgram
+
+PROGRAMS = os.path.join(ROOT, "programs")
+
+# Registers the opcode benchmarks read, set before the measured instruction.
+OPCODE_SETUP = 'set ra 7\nset rb 2\nset rs "hello"\nset ri 1\nsetjmpp "here"\n'
+
+OPCODES = {
+    "mov": "mov ra rb",
+    "cpy": "cpy ra rb",
+    "set": "set rb 5",
+    "add": "add ra 3 rb",
+    "sub": "sub ra 3 rb",
+    "mul": "mul ra 3 rb",
+    "div": "div ra 3 rb",
+    "mod": "mod ra 3 rb",
+    "pow": "pow ra 3 rb",
+    "stdout": "stdout ra , rs endl",
+    "jmp": 'jmp "here"',
+    "jmpif": 'jmpif "here" ra > rb',
+    "strlen": "strlen rs rb",
+    "strapp": 'strapp rs "abc" rb',
+    "charat": "charat rs ri rb",
+}
+
+SYNTHETIC = {
+    "straight": straightLineProgram(2000),
+    "loops": loopProgram(20, 3),
+    "strings": stringProgram(500),
+    "output": outputProgram(2000),
+}
+
+Benchmark = Callable[[], object]
+
+
+class NullSink(OutputSink):
+    """Discards output"""
+
+    def write(self, string: str) -> None:
+        pass
+
+
+def compileSource(source: str) -> Program:
+    return Compiler(Lexer(source).iterLines()).compile()
+
+
+def runner(program: Program, backend: str) -> Benchmark:
+    def run() -> None:
+        interpreter = Interpreter([], NullSink(), program.legacyFloats)
+
+        if backend == "pyexec":
+            interpreter.runTranspiled(program)
+        else:
+            interpreter.run(program)
+
+    return run
+
+
+def referenceRunner(source: str) -> Benchmark:
+    tokens = Lexer(source).tokenize()
+    return lambda: Interpreter(tokens, NullSink()).interpret()
+
+
+def opcodeHandler(line: str) -> Benchmark:
+    """
+    Returns the lowered op of a single instruction, with the registers it
+    reads already set.
+    """
+    program = compileSource(OPCODE_SETUP + line)
+    interpreter = Interpreter([], NullSink())
+    ops = interpreter._lower(program)
+
+    for op in ops[:-1]:
+        op()
+
+    return ops[-1]
+
+
+def benchmarks() -> dict[str, Benchmark]:
+    suite: dict[str, Benchmark] = {}
+
+    lexerSource = straightLineProgram(2000)
+    lexerLines = lexerSource.splitlines()
+    lexer = Lexer("")
+
+    suite["lexer/tokenize"] = lambda: Lexer(lexerSource).tokenize()
+    suite["lexer/smart_split"] = lambda: [
+        lexer._tokenizeLineReference(line) for line in lexerLines
+    ]
+
+    for name, line in OPCODES.items():
+        suite[f"opcode/{name}"] = opcodeHandler(line)
+
+    for name, source in SYNTHETIC.items():
+        program = compileSource(source)
+
+        suite[f"compile/{name}"] = lambda source=source: compileSource(source)
+        suite[f"synthetic/{name}/closures"] = runner(program, "closures")
+        suite[f"synthetic/{name}/pyexec"] = runner(program, "pyexec")
+
+    for path in sorted(glob.glob(os.path.join(PROGRAMS, "*.cnstr"))):
+        with open(path, "r") as f:
+            source = f.read()
+
+        name = os.path.splitext(os.path.basename(path))[0]
+        program = compileSource(source)
+
+        suite[f"programs/{name}/reference"] = referenceRunner(source)
+        suite[f"programs/{name}/closures"] = runner(program, "closures")
+        suite[f"programs/{name}/pyexec"] = runner(program, "pyexec")
+
+    return suite
+
+
+def measure(suite: dict[str, Benchmark], repeat: int) -> dict[str, float]:
+    """
+    Returns the best time of a call of each benchmark, in seconds, over the
+    repeats. Each repeat times the whole suite once, so that a slow spell of
+    the machine costs one timing of many benchmarks, not every timing of a
+    few of them.
+    """
+    timers = {name: timeit.Timer(benchmark) for name, benchmark in suite.items()}
+    numbers = {name: timer.autorange()[0] for name, timer in timers.items()}
+    best = dict.fromkeys(suite, float("inf"))
+
+    for _ in range(repeat):
+        for name, timer in timers.items():
+            seconds = timer.timeit(numbers[name]) / numbers[name]
+            best[name] = min(best[name], seconds)
+
+    return best
+
+
+def slower(
+    results: dict[str, float], baseline: dict[str, float], threshold: float
+) -> list[str]:
+    """
+    Returns the names of the benchmarks which are slower than the baseline
+    by more than the threshold.
+    """
+    return [
+        name
+        for name, seconds in results.items()
+        if name in baseline and seconds / baseline[name] - 1 > threshold
+    ]
+
+
+def retime(
+    suite: dict[str, Benchmark],
+    results: dict[str, float],
+    baseline: dict[str, float],
+    threshold: float,
+    repeat: int,
+    retries: int,
+) -> None:
+    """
+    Times the benchmarks which look slower than the baseline again, keeping
+    their best time, so that only the ones slower every time are reported.
+    Timings on a busy machine vary by more than common thresholds, but
+    mostly upwards.
+    """
+    for _ in range(retries):
+        suspects = slower(results, baseline, threshold)
+
+        if not suspects:
+            return
+
+        retimed = measure({name: suite[name] for name in suspects}, repeat)
+
+        for name, seconds in retimed.items():
+            results[name] = min(results[name], seconds)
+
+
+def compare(
+    results: dict[str, float], baseline: dict[str, float], threshold: float
+) -> list[str]:
+    """
+    Prints the results next to the baseline and returns the names of the
+    benchmarks which got slower by more than the threshold.
+    """
+    regressions = []
+
+    for name, seconds in results.items():
+        if name not in baseline:
+            print(f"{name:<36} {seconds * 1e6:12.3f} us  (new)")
+            continue
+
+        change = seconds / baseline[name] - 1
+        flag = ""
+
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+
+        print(
+            f"{name:<36} {seconds * 1e6:12.3f} us  "
+            f"{baseline[name] * 1e6:12.3f} us  {change:+7.1%}{flag}"
+        )
+
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the cnstr benchmark suite.")
+    parser.add_argument(
+        "-k",
+        dest="filter",
+        default="",
+        help="only run the benchmarks whose name contains this",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="number of timings of each benchmark, the best one counts",
+    )
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument(
+        "--baseline", help="compare against the results in this JSON file"
+    )
+    parser.add_argument(
+        "--save-baseline",
+        metavar="FILE",
+        help="write the results to this JSON file, for later --baseline runs",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=3,
+        help="times to time benchmarks slower than the baseline again",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="fail if a benchmark is slower than the baseline by this fraction",
+    )
+    args = parser.parse_args()
+
+    suite = {
+        name: benchmark
+        for name, benchmark in benchmarks().items()
+        if args.filter in name
+    }
+    results = measure(suite, args.repeat)
+    baseline = None
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)["results"]
+
+        retime(suite, results, baseline, args.threshold, args.repeat, args.retries)
+    else:
+        for name, seconds in results.items():
+            print(f"{name:<36} {seconds * 1e6:12.3f} us")
+
+    data = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(data, f, indent=2)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+
+        if regressions:
+            print(
+                f"{len(regressions)} benchmarks regressed by more than "
+                f"{args.threshold:.0%}: {', '.join(regressions)}"
+            )
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
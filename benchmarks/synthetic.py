@@ -0,0 +1,77 @@
+"""
+Generators for synthetic cnstr programs used by the benchmarks.
+"""
+
+
+def straightLineProgram(lines: int) -> str:
+    """
+    Long straight-line arithmetic and string appends, without jumps.
+    """
+    source = ['set rs "x"', "set rn 3"]
+
+    for i in range(lines // 2):
+        source.append(f"add r{i % 10} {i} r{(i + 1) % 10}")
+        source.append("strapp rs 'y' rs")
+
+    return "\n".join(source) + "\n"
+
+
+def loopProgram(iterations: int, depth: int = 3) -> str:
+    """
+    Nested 'jmpif' counting loops, each running the given iterations per
+    trip of the loop around it, with a little arithmetic in the innermost.
+    """
+    source = []
+
+    for level in range(depth):
+        source.append(f"set rc{level} {iterations}")
+        source.append(f'setjmpp "loop{level}"')
+
+    source.append("add rt rc0 rt")
+    source.append("mul rt 3 rt")
+    source.append("mod rt 1000003 rt")
+
+    for level in reversed(range(depth)):
+        source.append(f"sub rc{level} 1 rc{level}")
+        source.append(f'jmpif "loop{level}" rc{level} > 0')
+
+    source.append("stdout rt endl")
+
+    return "\n".join(source) + "\n"
+
+
+def stringProgram(iterations: int) -> str:
+    """
+    Builds a string with 'strapp' and walks it back with 'strlen' and
+    'charat', copying every character into a second string.
+    """
+    return (
+        'set rs ""\n'
+        f"set rn {iterations}\n"
+        'setjmpp "build"\n'
+        'strapp rs "ab" rs\n'
+        "sub rn 1 rn\n"
+        'jmpif "build" rn > 0\n'
+        "strlen rs rl\n"
+        'set rr ""\n'
+        'setjmpp "walk"\n'
+        "sub rl 1 rl\n"
+        "charat rs rl rc\n"
+        "strapp rr rc rr\n"
+        'jmpif "walk" rl > 0\n'
+        "strlen rr rl\n"
+        "stdout rl endl\n"
+    )
+
+
+def outputProgram(lines: int) -> str:
+    """
+    Writes a line of numbers and strings on every trip around a loop.
+    """
+    return (
+        f"set rn {lines}\n"
+        'setjmpp "loop"\n'
+        'stdout "line" , rn , "of output" endl\n'
+        "sub rn 1 rn\n"
+        'jmpif "loop" rn > 0\n'
+    )
@@ -1,11 +1,60 @@
+import os
+import sys
 import unittest
+
+# The interpreter modules import each other by their flat module names.
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+
 from tests.utils import test_is_number, test_smart_split
+from tests.interpreter import test_run, test_numerics
+from tests.bytecode import test_bytecode
+from tests.output import test_sinks
+from tests.lexer import test_iter_lines, test_scanner
+from tests.optimizer import test_optimizer
+from tests.fusion import test_fusion
+from tests.transpiler import test_transpiler
+from tests.strings import test_rope
+from tests.batch import test_batch
+from tests.pool import test_pool
+from tests.api import test_api
+from tests.limits import test_limits
+from tests.concurrency import test_async_run
+from tests.profiler import test_profiler
+from tests.snapshot import test_snapshot
+from tests.incremental import test_incremental
+from tests.typeinference import test_type_inference
+from tests.daemon import test_daemon
+from tests.debugger import test_debugger
+from tests.benchmarks import test_run_benchmarks
 
 
 def main() -> None:
     testLoader = unittest.TestLoader()
-    tests = testLoader.loadTestsFromModule(test_is_number)
-    tests = testLoader.loadTestsFromModule(test_smart_split)
+    tests = unittest.TestSuite()
+    tests.addTests(testLoader.loadTestsFromModule(test_is_number))
+    tests.addTests(testLoader.loadTestsFromModule(test_smart_split))
+    tests.addTests(testLoader.loadTestsFromModule(test_run))
+    tests.addTests(testLoader.loadTestsFromModule(test_numerics))
+    tests.addTests(testLoader.loadTestsFromModule(test_bytecode))
+    tests.addTests(testLoader.loadTestsFromModule(test_sinks))
+    tests.addTests(testLoader.loadTestsFromModule(test_iter_lines))
+    tests.addTests(testLoader.loadTestsFromModule(test_scanner))
+    tests.addTests(testLoader.loadTestsFromModule(test_optimizer))
+    tests.addTests(testLoader.loadTestsFromModule(test_fusion))
+    tests.addTests(testLoader.loadTestsFromModule(test_transpiler))
+    tests.addTests(testLoader.loadTestsFromModule(test_rope))
+    tests.addTests(testLoader.loadTestsFromModule(test_batch))
+    tests.addTests(testLoader.loadTestsFromModule(test_pool))
+    tests.addTests(testLoader.loadTestsFromModule(test_api))
+    tests.addTests(testLoader.loadTestsFromModule(test_limits))
+    tests.addTests(testLoader.loadTestsFromModule(test_async_run))
+    tests.addTests(testLoader.loadTestsFromModule(test_profiler))
+    tests.addTests(testLoader.loadTestsFromModule(test_snapshot))
+    tests.addTests(testLoader.loadTestsFromModule(test_incremental))
+    tests.addTests(testLoader.loadTestsFromModule(test_type_inference))
+    tests.addTests(testLoader.loadTestsFromModule(test_daemon))
+    tests.addTests(testLoader.loadTestsFromModule(test_debugger))
+    tests.addTests(testLoader.loadTestsFromModule(test_run_benchmarks))
     testRunner = unittest.TextTestRunner()
     testRunner.run(tests)
 
@@ -0,0 +1,140 @@
+"""
+Library API for running cnstr programs in a long-lived process.
+
+Errors are raised as CnstrSyntaxError or CnstrRuntimeError instead of
+printed, and compiled programs are cached by their source, so hosting many
+runs costs neither a process nor a compile per run.
+
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Mapping
+
+from lexer import Lexer
+from interpreter import Interpreter, SLICE_SIZE
+from compiler import Compiler, Program
+from output import CaptureSink
+from errors import CnstrRuntimeError
+from limits import Limits
+from rope import Rope
+
+# Number of compiled programs kept by compileProgram().
+CACHE_SIZE = 256
+
+
+@dataclass
+class Result:
+    """Output and final registers of a program run"""
+
+    output: str
+    registers: dict[str, int | float | str]
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def compileProgram(source: str, legacyFloats: bool = False) -> Program:
+    """
+    Compiles a source, or returns the cached program if it was compiled
+    before. Raises CnstrSyntaxError if it doesn't compile.
+    """
+    program = Compiler(
+        Lexer(source, legacyFloats).iterLines(),
+        keepLines=False,
+        legacyFloats=legacyFloats,
+    ).compile()
+    program.source = source
+
+    return program
+
+
+def run(
+    source: str | Program,
+    inputs: Mapping[str, int | float | str] | None = None,
+    limits: Limits | None = None,
+    backend: str = "closures",
+    legacyFloats: bool = False,
+) -> Result:
+    """
+    Runs a program and returns its output and final registers. Raises
+    CnstrSyntaxError if the source doesn't compile and CnstrRuntimeError if
+    the program fails, with the output written before the error. Exceeding
+    a limit raises CnstrLimitError, a kind of CnstrRuntimeError.
+
+    :param source: The source code, or a program from compileProgram()
+    :param inputs: Initial values of registers, the others start at zero
+    :param limits: Bounds on the instructions, time and output of the run
+    :param backend: "closures" or "pyexec", like the --backend option
+    :param legacyFloats: Whether every number is a float
+    """
+    program = _prepare(source, inputs, backend, legacyFloats)
+    sink = CaptureSink()
+    interpreter = Interpreter([], sink, program.legacyFloats, inputs, limits)
+
+    try:
+        if backend == "pyexec":
+            interpreter.runTranspiled(program)
+        else:
+            interpreter.run(program)
+    except CnstrRuntimeError as error:
+        error.output = sink.getvalue().decode()
+        raise
+
+    return Result(sink.getvalue().decode(), _registersOf(interpreter))
+
+
+async def runAsync(
+    source: str | Program,
+    inputs: Mapping[str, int | float | str] | None = None,
+    limits: Limits | None = None,
+    backend: str = "closures",
+    legacyFloats: bool = False,
+    sliceSize: int = SLICE_SIZE,
+) -> Result:
+    """
+    Runs a program like run(), as a coroutine which lets other tasks run
+    after every slice of about sliceSize instructions. Compiling isn't
+    sliced.
+    """
+    program = _prepare(source, inputs, backend, legacyFloats)
+    sink = CaptureSink()
+    interpreter = Interpreter([], sink, program.legacyFloats, inputs, limits)
+
+    try:
+        if backend == "pyexec":
+            await interpreter.runTranspiledAsync(program, sliceSize)
+        else:
+            await interpreter.runAsync(program, sliceSize)
+    except CnstrRuntimeError as error:
+        error.output = sink.getvalue().decode()
+        raise
+
+    return Result(sink.getvalue().decode(), _registersOf(interpreter))
+
+
+def _prepare(
+    source: str | Program,
+    inputs: Mapping[str, int | float | str] | None,
+    backend: str,
+    legacyFloats: bool,
+) -> Program:
+    if backend not in ("closures", "pyexec"):
+        raise ValueError(f"Unknown backend '{backend}'.")
+
+    for register, value in (inputs or {}).items():
+        if type(value) not in (int, float, str):
+            raise TypeError(
+                f"Register '{register}' must be a number or a string, "
+                f"got '{type(value)}'"
+            )
+
+    if isinstance(source, Program):
+        return source
+
+    return compileProgram(source, legacyFloats)
+
+
+def _registersOf(interpreter: Interpreter) -> dict[str, int | float | str]:
+    return {
+        register: str(value) if type(value) is Rope else value
+        for register, value in interpreter._registers.items()
+    }
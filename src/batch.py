@@ -0,0 +1,701 @@
+from dataclasses import dataclass, field
+from typing import Callable, Mapping, Sequence
+
+from compiler import Opcode, OperandKind, Operand, Instruction, Program
+from lowering import COMPARE_OPERATORS, mathOperators
+from numerics import zero, isIndex, indexLiteral
+from rope import isString, concat
+
+try:
+    import numpy as np
+except ImportError:
+    # Only batch execution needs numpy.
+    np = None
+
+
+# Integers are stored in float64 lanes, which are only exact up to 2**53.
+MAX_EXACT_INTEGER = 2**53
+
+BatchOp = Callable[["np.ndarray"], "np.ndarray"]
+
+
+@dataclass
+class BatchResult:
+    """
+    Output, errors and final registers of every lane of a batch run.
+    Numeric registers are float64 arrays, with integral telling which lanes
+    hold an int. Other registers are object arrays.
+    """
+
+    outputs: list[str]
+    errors: list[str | None]
+    registers: dict[str, "np.ndarray"]
+    integral: dict[str, "np.ndarray"] = field(default_factory=dict)
+
+    def column(self, register: str) -> list[int | float | str]:
+        """
+        Returns the value of a register in every lane.
+        """
+        values = self.registers[register]
+
+        if register not in self.integral:
+            return values.tolist()
+
+        return [
+            int(value) if isInt else value
+            for value, isInt in zip(values.tolist(), self.integral[register].tolist())
+        ]
+
+    def lane(self, lane: int) -> dict[str, int | float | str]:
+        """
+        Returns the registers of a single lane.
+        """
+        registers = {}
+
+        for register, values in self.registers.items():
+            value = values[lane]
+
+            if register in self.integral:
+                value = int(value) if self.integral[register][lane] else float(value)
+
+            registers[register] = value
+
+        return registers
+
+
+class BatchRunner:
+    """
+    Runs a compiled program over many sets of initial register values (lanes)
+    at once, with every register held as a numpy array over the lanes.
+
+    Lanes are regrouped before every basic block: the lanes waiting at the
+    lowest block run it together, so lanes that diverge at a 'jmpif' join
+    up again where their paths meet. Numeric registers are float64 arrays
+    with a mask of the lanes holding ints, and math on them is element-wise.
+    Registers which can hold strings are object arrays, evaluated lane by
+    lane.
+
+    Output is collected per lane instead of written anywhere. Errors stop
+    only the lanes they happen in, including Python errors like division by
+    zero which would otherwise end the run. Unlike single runs, integers must
+    stay within 2**53 and complex results of 'pow' are errors.
+    """
+
+    def __init__(
+        self,
+        program: Program,
+        inputs: Mapping[str, Sequence[int | float | str]],
+        lanes: int | None = None,
+    ) -> None:
+        """
+        :param program: The program to run
+        :param inputs: Initial values of registers, one sequence of values
+            per register with a value for every lane
+        :param lanes: The number of lanes, if there are no inputs
+        """
+        if np is None:
+            raise ImportError("Batch execution requires numpy.")
+
+        self._program = program
+        self._math = mathOperators(program)
+        self._zero = zero(program.legacyFloats)
+
+        sizes = {len(values) for values in inputs.values()}
+        if lanes is not None:
+            sizes.add(lanes)
+        if len(sizes) != 1:
+            raise ValueError("Every input must have a value for every lane.")
+
+        self._lanes = sizes.pop()
+
+        unknown = set(inputs) - set(program.registerNames)
+        if unknown:
+            raise ValueError(f"Unknown registers: {', '.join(sorted(unknown))}")
+
+        self._slotOf = {name: slot for slot, name in enumerate(program.registerNames)}
+        self._isObject = self._inferObjectRegisters(inputs)
+        self._values: list[np.ndarray] = []
+        self._integral: list[np.ndarray | None] = []
+
+        for slot, name in enumerate(program.registerNames):
+            if self._isObject[slot]:
+                values = np.empty(self._lanes, dtype=object)
+                values[:] = list(inputs[name]) if name in inputs else self._zero
+                self._values.append(values)
+                self._integral.append(None)
+            elif name in inputs:
+                column = inputs[name]
+                self._values.append(np.asarray(column, dtype=np.float64).copy())
+                self._integral.append(self._integralOf(column))
+            else:
+                self._values.append(np.full(self._lanes, float(self._zero)))
+                self._integral.append(
+                    np.full(self._lanes, type(self._zero) is int, dtype=bool)
+                )
+
+        self._outputs: list[list[str]] = [[] for _ in range(self._lanes)]
+        self._errors: list[str | None] = [None] * self._lanes
+        self._active = np.ones(self._lanes, dtype=bool)
+        self._pcs = np.zeros(self._lanes, dtype=np.int64)
+
+        # Targets of duplicated jump points differ between lanes.
+        self._targets = {
+            label: np.full(
+                self._lanes, program.target(program.jumpPoints[label]), dtype=np.int64
+            )
+            for label in program.duplicateJumpPoints
+        }
+
+    def _integralOf(self, column: Sequence[int | float]) -> "np.ndarray":
+        if isinstance(column, np.ndarray) and column.dtype.kind in "iu":
+            return np.ones(len(column), dtype=bool)
+        if isinstance(column, np.ndarray) and column.dtype.kind == "f":
+            return np.zeros(len(column), dtype=bool)
+
+        return np.array([type(value) is int for value in column], dtype=bool)
+
+    def _inferObjectRegisters(
+        self, inputs: Mapping[str, Sequence[int | float | str]]
+    ) -> list[bool]:
+        """
+        Returns which registers can hold a string at some point, they are
+        stored as object arrays.
+        """
+        isObject = [False] * len(self._program.registerNames)
+
+        for name, values in inputs.items():
+            if not (isinstance(values, np.ndarray) and values.dtype.kind in "iuf"):
+                if any(isString(value) for value in values):
+                    isObject[self._slotOf[name]] = True
+
+        changed = True
+        while changed:
+            changed = False
+
+            for instruction in self._program.instructions:
+                opcode = instruction.opcode
+                operands = instruction.operands
+                dest = None
+
+                if opcode == Opcode.SET and isString(operands[1][1]):
+                    dest = operands[0][1]
+                elif opcode in (Opcode.STRAPP, Opcode.CHARAT):
+                    dest = operands[2][1]
+                elif opcode in (Opcode.CPY, Opcode.MOV):
+                    if isObject[operands[0][1]]:
+                        dest = operands[1][1]
+                elif opcode in self._math:
+                    if any(
+                        kind == OperandKind.REGISTER and isObject[value]
+                        for kind, value in operands[:2]
+                    ):
+                        dest = operands[2][1]
+
+                if dest is not None and not isObject[dest]:
+                    isObject[dest] = True
+                    changed = True
+
+        return isObject
+
+    def run(self) -> BatchResult:
+        """
+        Runs every lane to the end, or until it fails.
+        """
+        blocks = self._lowerBlocks()
+        end = len(self._program.instructions)
+        pcs = self._pcs
+        active = self._active
+
+        if end == 0:
+            active[:] = False
+
+        while True:
+            activeLanes = np.flatnonzero(active)
+            if activeLanes.size == 0:
+                break
+
+            activePcs = pcs[activeLanes]
+            pc = int(activePcs.min())
+            lanes = activeLanes[activePcs == pc]
+
+            ops, stop = blocks[pc]
+            pcs[lanes] = stop
+
+            for op in ops:
+                lanes = op(lanes)
+                if lanes.size == 0:
+                    break
+
+            active[lanes[pcs[lanes] >= end]] = False
+
+        return self._result()
+
+    def _result(self) -> BatchResult:
+        registers: dict[str, np.ndarray] = {}
+        integral: dict[str, np.ndarray] = {}
+
+        for slot, name in enumerate(self._program.registerNames):
+            registers[name] = self._values[slot]
+            if not self._isObject[slot]:
+                integral[name] = self._integral[slot]
+
+        return BatchResult(
+            ["".join(output) for output in self._outputs],
+            self._errors,
+            registers,
+            integral,
+        )
+
+    def _lowerBlocks(self) -> dict[int, tuple[list[BatchOp], int]]:
+        """
+        Returns the ops and the end of every basic block, by its start.
+        """
+        instructions = self._program.instructions
+        end = len(instructions)
+
+        leaders = {0} | self._program.jumpTargets()
+        for i, instruction in enumerate(instructions):
+            if instruction.opcode in (Opcode.JMP, Opcode.JMPIF):
+                leaders.add(i + 1)
+
+        starts = sorted(leader for leader in leaders if leader < end)
+        blocks: dict[int, tuple[list[BatchOp], int]] = {}
+
+        for start, stop in zip(starts, starts[1:] + [end]):
+            ops = [
+                op
+                for op in (self.lowerInstruction(i) for i in instructions[start:stop])
+                if op is not None
+            ]
+            blocks[start] = (ops, stop)
+
+        return blocks
+
+    def lowerInstruction(self, instruction: Instruction) -> BatchOp | None:
+        opcode = instruction.opcode
+
+        if opcode == Opcode.NOP:
+            return None
+        elif opcode == Opcode.SETJMPP:
+            return self.lowerSetJumpPoint(instruction)
+        elif opcode in (Opcode.MOV, Opcode.CPY):
+            return self.lowerCopy(instruction)
+        elif opcode == Opcode.SET:
+            return self.lowerSet(instruction)
+        elif opcode in self._math:
+            return self.lowerMath(instruction)
+        elif opcode == Opcode.STDOUT:
+            return self.lowerStdout(instruction)
+        elif opcode == Opcode.JMP:
+            return self.lowerJmp(instruction)
+        elif opcode == Opcode.JMPIF:
+            return self.lowerJmpIf(instruction)
+        elif opcode in (Opcode.STRLEN, Opcode.STRAPP, Opcode.CHARAT):
+            return self.lowerString(instruction)
+        else:
+            raise NotImplementedError("Invalid opcode.")
+
+    def lowerSetJumpPoint(self, instruction: Instruction) -> BatchOp | None:
+        (_, label), = instruction.operands
+
+        if label not in self._targets:
+            return None
+
+        targets = self._targets[label]
+        target = self._program.target(instruction.lineNum)
+
+        def op(lanes: np.ndarray) -> np.ndarray:
+            targets[lanes] = target
+            return lanes
+
+        return op
+
+    def lowerCopy(self, instruction: Instruction) -> BatchOp:
+        source, (_, dest) = instruction.operands
+        isMove = instruction.opcode == Opcode.MOV
+
+        def op(lanes: np.ndarray) -> np.ndarray:
+            self._store(dest, lanes, *self._load(source, lanes))
+
+            if isMove:
+                self._store(source[1], lanes, *self._constant(self._zero, lanes))
+
+            return lanes
+
+        return op
+
+    def lowerSet(self, instruction: Instruction) -> BatchOp:
+        (_, dest), (_, value) = instruction.operands
+
+        def op(lanes: np.ndarray) -> np.ndarray:
+            self._store(dest, lanes, *self._constant(value, lanes))
+            return lanes
+
+        return op
+
+    def lowerMath(self, instruction: Instruction) -> BatchOp:
+        a, b, (_, dest) = instruction.operands
+        opcode = instruction.opcode
+
+        if self._isObjectOperand(a) or self._isObjectOperand(b):
+            function = self._math[opcode]
+
+            def op(lanes: np.ndarray) -> np.ndarray:
+                valuesA = self._objects(a, lanes)
+                valuesB = self._objects(b, lanes)
+                results = np.empty(lanes.size, dtype=object)
+                failed = np.zeros(lanes.size, dtype=bool)
+
+                for i, (valueA, valueB) in enumerate(zip(valuesA, valuesB)):
+                    try:
+                        results[i] = function(valueA, valueB)
+                    except Exception as exception:
+                        self._fail(lanes[i], instruction, _describe(exception))
+                        failed[i] = True
+
+                lanes, results = lanes[~failed], results[~failed]
+                self._storeObjects(dest, lanes, results)
+                return lanes
+
+            return op
+
+        legacyFloats = self._program.legacyFloats
+
+        def op(lanes: np.ndarray) -> np.ndarray:
+            valuesA, integralA = self._load(a, lanes)
+            valuesB, integralB = self._load(b, lanes)
+
+            with np.errstate(all="ignore"):
+                values, integral, errors = _numericMath(
+                    opcode, valuesA, integralA, valuesB, integralB, legacyFloats
+                )
+
+            for message, failed in errors:
+                for lane in lanes[failed]:
+                    self._fail(lane, instruction, message)
+
+            if errors:
+                ok = ~np.logical_or.reduce([failed for _, failed in errors])
+                lanes, values, integral = lanes[ok], values[ok], integral[ok]
+
+            self._store(dest, lanes, values, integral)
+            return lanes
+
+        return op
+
+    def lowerStdout(self, instruction: Instruction) -> BatchOp:
+        pieces = instruction.operands
+        outputs = self._outputs
+
+        if all(kind == OperandKind.CONSTANT for kind, _ in pieces):
+            string = "".join(value for _, value in pieces)
+
+            def op(lanes: np.ndarray) -> np.ndarray:
+                for lane in lanes.tolist():
+                    outputs[lane].append(string)
+                return lanes
+
+            return op
+
+        def op(lanes: np.ndarray) -> np.ndarray:
+            columns = [
+                [value] * lanes.size
+                if kind == OperandKind.CONSTANT
+                else [str(item) for item in self._objects((kind, value), lanes)]
+                for kind, value in pieces
+            ]
+
+            for lane, strings in zip(lanes.tolist(), zip(*columns)):
+                outputs[lane].append("".join(strings))
+
+            return lanes
+
+        return op
+
+    def lowerJmp(self, instruction: Instruction) -> BatchOp:
+        (_, label), = instruction.operands
+        return self._jumpTo(instruction, label, None)
+
+    def lowerJmpIf(self, instruction: Instruction) -> BatchOp:
+        (_, label), a, (_, compare), b = instruction.operands
+        function = COMPARE_OPERATORS[compare]
+
+        if label not in self._program.jumpPoints:
+            return self._jumpTo(instruction, label, None)
+
+        def condition(lanes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+            if not (self._isObjectOperand(a) or self._isObjectOperand(b)):
+                return function(self._load(a, lanes)[0], self._load(b, lanes)[0]), lanes
+
+            taken = np.zeros(lanes.size, dtype=bool)
+            failed = np.zeros(lanes.size, dtype=bool)
+
+            for i, (valueA, valueB) in enumerate(
+                zip(self._objects(a, lanes), self._objects(b, lanes))
+            ):
+                try:
+                    taken[i] = function(valueA, valueB)
+                except Exception as exception:
+                    self._fail(lanes[i], instruction, _describe(exception))
+                    failed[i] = True
+
+            return taken[~failed], lanes[~failed]
+
+        return self._jumpTo(instruction, label, condition)
+
+    def _jumpTo(
+        self,
+        instruction: Instruction,
+        label: str,
+        condition: Callable[["np.ndarray"], tuple["np.ndarray", "np.ndarray"]] | None,
+    ) -> BatchOp:
+        pcs = self._pcs
+
+        if label not in self._program.jumpPoints:
+
+            def op(lanes: np.ndarray) -> np.ndarray:
+                for lane in lanes.tolist():
+                    self._fail(lane, instruction, f"Jump point '{label}' does not exist.")
+                return lanes[:0]
+
+            return op
+
+        targets = self._targets.get(label)
+        target = self._program.target(self._program.jumpPoints[label])
+
+        def op(lanes: np.ndarray) -> np.ndarray:
+            if condition is not None:
+                taken, lanes = condition(lanes)
+                jumping = lanes[taken]
+            else:
+                jumping = lanes
+
+            pcs[jumping] = target if targets is None else targets[jumping]
+            return lanes
+
+        return op
+
+    def lowerString(self, instruction: Instruction) -> BatchOp:
+        opcode = instruction.opcode
+        operands = instruction.operands
+        legacyFloats = self._program.legacyFloats
+        (_, dest) = operands[-1]
+
+        def strlen(value: object) -> int:
+            if not isString(value):
+                raise LaneError(
+                    f"Invalid command usage for 'strlen'. Expected string, got '{type(value)}'"
+                )
+            return len(value)
+
+        def strapp(value1: object, value2: object) -> str:
+            for value in (value1, value2):
+                if not isString(value):
+                    raise LaneError(
+                        f"Invalid command usage for 'strapp'. Expected string, got '{type(value)}'"
+                    )
+            return concat(value1, value2)
+
+        def charat(value1: object, value2: object) -> str:
+            if not isString(value1):
+                raise LaneError(
+                    f"Invalid command usage for 'charat'. Expected string, got '{type(value1)}'"
+                )
+            if not isIndex(value2, legacyFloats):
+                raise LaneError(
+                    f"Invalid command usage for 'charat'. Expected number, got '{type(value2)}'"
+                )
+            if not -1 < value2 < len(value1):
+                raise LaneError("Invalid command usage for 'charat'. Index out of bounds.")
+            return value1[int(value2)]
+
+        if opcode == Opcode.STRLEN:
+            function, inputs = strlen, operands[:1]
+        elif opcode == Opcode.STRAPP:
+            function, inputs = strapp, operands[:2]
+        else:
+            function, inputs = charat, operands[:2]
+
+            if inputs[1][0] == OperandKind.CONSTANT:
+                # Literal indices are converted to int.
+                index = indexLiteral(inputs[1][1])
+                inputs = (inputs[0], (OperandKind.CONSTANT, index))
+
+        def op(lanes: np.ndarray) -> np.ndarray:
+            columns = [self._objects(operand, lanes) for operand in inputs]
+            results = np.empty(lanes.size, dtype=object)
+            failed = np.zeros(lanes.size, dtype=bool)
+
+            for i, values in enumerate(zip(*columns)):
+                try:
+                    results[i] = function(*values)
+                except LaneError as error:
+                    self._fail(lanes[i], instruction, str(error))
+                    failed[i] = True
+
+            lanes, results = lanes[~failed], results[~failed]
+            self._storeObjects(dest, lanes, results)
+            return lanes
+
+        return op
+
+    def _isObjectOperand(self, operand: Operand) -> bool:
+        kind, value = operand
+
+        if kind == OperandKind.CONSTANT:
+            return isString(value)
+
+        return self._isObject[value]
+
+    def _constant(
+        self, value: object, lanes: "np.ndarray"
+    ) -> tuple["np.ndarray", "np.ndarray | None"]:
+        if isString(value):
+            values = np.empty(lanes.size, dtype=object)
+            values[:] = value
+            return values, None
+
+        return (
+            np.full(lanes.size, float(value)),
+            np.full(lanes.size, type(value) is int, dtype=bool),
+        )
+
+    def _load(
+        self, operand: Operand, lanes: "np.ndarray"
+    ) -> tuple["np.ndarray", "np.ndarray | None"]:
+        """
+        Returns the values of an operand in the lanes, and which of them are
+        ints if they are numeric.
+        """
+        kind, value = operand
+
+        if kind == OperandKind.CONSTANT:
+            return self._constant(value, lanes)
+
+        integral = self._integral[value]
+        return (
+            self._values[value][lanes],
+            None if integral is None else integral[lanes],
+        )
+
+    def _objects(self, operand: Operand, lanes: "np.ndarray") -> list[object]:
+        """
+        Returns the values of an operand in the lanes as Python objects.
+        """
+        values, integral = self._load(operand, lanes)
+
+        if integral is None:
+            return values.tolist()
+
+        return [
+            int(value) if isInt else value
+            for value, isInt in zip(values.tolist(), integral.tolist())
+        ]
+
+    def _store(
+        self,
+        slot: int,
+        lanes: "np.ndarray",
+        values: "np.ndarray",
+        integral: "np.ndarray | None",
+    ) -> None:
+        if self._isObject[slot] and integral is not None:
+            objects = values.astype(object)
+            objects[integral] = values[integral].astype(np.int64).astype(object)
+            self._values[slot][lanes] = objects
+            return
+
+        self._values[slot][lanes] = values
+
+        if integral is not None:
+            self._integral[slot][lanes] = integral
+
+    def _storeObjects(self, slot: int, lanes: "np.ndarray", results: "np.ndarray") -> None:
+        if self._isObject[slot]:
+            self._values[slot][lanes] = results
+            return
+
+        # Only numbers reach registers which never hold strings.
+        self._values[slot][lanes] = results.astype(np.float64)
+        self._integral[slot][lanes] = [type(result) is int for result in results]
+
+    def _fail(self, lane: int, instruction: Instruction, message: str) -> None:
+        self._errors[lane] = f"Error on line {instruction.lineNum}: {message}"
+        self._active[lane] = False
+
+
+class LaneError(Exception):
+    """Runtime error of a single lane"""
+
+
+def _describe(exception: Exception) -> str:
+    return f"{type(exception).__name__}: {exception}"
+
+
+def _numericMath(
+    opcode: Opcode,
+    a: "np.ndarray",
+    integralA: "np.ndarray",
+    b: "np.ndarray",
+    integralB: "np.ndarray",
+    legacyFloats: bool,
+) -> tuple["np.ndarray", "np.ndarray", list[tuple[str, "np.ndarray"]]]:
+    """
+    Applies a math opcode element-wise with the semantics of Python numbers.
+    Returns the values, which of them are ints and the lanes which failed
+    with each error message.
+    """
+    integral = integralA & integralB
+    errors: list[tuple[str, np.ndarray]] = []
+
+    if opcode == Opcode.ADD:
+        values = a + b
+    elif opcode == Opcode.SUB:
+        values = a - b
+    elif opcode == Opcode.MUL:
+        values = a * b
+    elif opcode in (Opcode.DIV, Opcode.MOD):
+        byZero = b == 0
+        if byZero.any():
+            message = (
+                "ZeroDivisionError: division by zero"
+                if opcode == Opcode.DIV
+                else "ZeroDivisionError: modulo by zero"
+            )
+            errors.append((message, byZero))
+
+        if opcode == Opcode.MOD:
+            values = np.mod(a, b)
+        else:
+            values = a / b
+
+            if legacyFloats:
+                integral = np.zeros_like(integral)
+            else:
+                # Quotients of ints stay ints if they are whole.
+                integral = integral & (np.mod(a, b) == 0)
+    else:
+        values = np.power(a, b)
+        integral = integral & (b >= 0)
+
+        byZero = (a == 0) & (b < 0)
+        if byZero.any():
+            errors.append(
+                ("ZeroDivisionError: 0.0 cannot be raised to a negative power", byZero)
+            )
+
+        fractional = (a < 0) & (b != np.floor(b)) & np.isfinite(b)
+        if fractional.any():
+            errors.append(("Complex results are not supported in batches.", fractional))
+
+        overflow = ~integral & np.isinf(values) & np.isfinite(a) & np.isfinite(b)
+        if overflow.any():
+            errors.append(("OverflowError: Numerical result out of range", overflow))
+
+    inexact = integral & (np.abs(values) > MAX_EXACT_INTEGER)
+    if inexact.any():
+        errors.append(
+            ("Integer result exceeds the exact range of batches (2**53).", inexact)
+        )
+
+    return values, integral, errors
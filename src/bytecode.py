@@ -0,0 +1,305 @@
+from array import array
+from dataclasses import dataclass
+import hashlib
+import marshal
+import os
+
+from common import TokenValue
+from compiler import Opcode, OperandKind, Operand, Instruction, Program
+
+
+BYTECODE_MAGIC = b"CNSTRBC"
+BYTECODE_VERSION = 4
+
+CACHE_DIRECTORY = "__cnstrcache__"
+CACHE_SUFFIX = ".cnstrc"
+
+# Operands are stored as (constant pool index << 2) | tag, registers as
+# (slot << 2) | TAG_REGISTER.
+TAG_CONSTANT = 0
+TAG_REGISTER = 1
+TAG_COMPARE = 2
+
+
+def sourceHash(source: str) -> str:
+    """
+    Returns the hash a compiled program is cached under.
+    """
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+def programHash(program: Program) -> str:
+    """
+    Returns the hash of a compiled program's content, which tells apart
+    programs compiled from one source with different options.
+    """
+    return hashlib.sha256(Bytecode.fromProgram(program).dumps("")).hexdigest()
+
+
+@dataclass
+class Bytecode:
+    """
+    Flat representation of a compiled program: one opcode per instruction,
+    a single operand array indexed through offsets, a constant pool shared
+    by all literal operands, the register names and the jump table.
+    """
+
+    opcodes: array
+    offsets: array
+    operands: array
+    lineNums: array
+    constants: list[str | int | float]
+    registerNames: list[str]
+    jumpPoints: dict[str, int]
+    duplicateJumpPoints: list[str]
+    legacyFloats: bool = False
+
+    @classmethod
+    def fromProgram(cls, program: Program) -> "Bytecode":
+        opcodes = array("B")
+        offsets = array("I", [0])
+        operands = array("I")
+        lineNums = array("I")
+        constants: list[str | int | float] = []
+        pool: dict[tuple[type, str | int | float], int] = {}
+
+        def encode(operand: Operand) -> int:
+            kind, value = operand
+
+            if kind == OperandKind.REGISTER:
+                return value << 2 | TAG_REGISTER
+
+            if isinstance(value, TokenValue):
+                tag = TAG_COMPARE
+                value = value.name
+            else:
+                tag = TAG_CONSTANT
+
+            # Keyed by type as well, since 1.0 == 1 but they print differently.
+            key = (type(value), value)
+            if key not in pool:
+                pool[key] = len(constants)
+                constants.append(value)
+
+            return pool[key] << 2 | tag
+
+        for instruction in program.instructions:
+            opcodes.append(instruction.opcode)
+            operands.extend(encode(operand) for operand in instruction.operands)
+            offsets.append(len(operands))
+            lineNums.append(instruction.lineNum)
+
+        return cls(
+            opcodes,
+            offsets,
+            operands,
+            lineNums,
+            constants,
+            list(program.registerNames),
+            dict(program.jumpPoints),
+            sorted(program.duplicateJumpPoints),
+            program.legacyFloats,
+        )
+
+    def toProgram(self, source: str = "") -> Program:
+        constants = self.constants
+        operands = self.operands
+        offsets = self.offsets
+        instructions: list[Instruction] = []
+
+        for i, opcode in enumerate(self.opcodes):
+            decoded: list[Operand] = []
+
+            for operand in operands[offsets[i] : offsets[i + 1]]:
+                tag = operand & 3
+
+                if tag == TAG_REGISTER:
+                    decoded.append((OperandKind.REGISTER, operand >> 2))
+                elif tag == TAG_COMPARE:
+                    name = constants[operand >> 2]
+                    decoded.append((OperandKind.CONSTANT, TokenValue[name]))
+                else:
+                    decoded.append((OperandKind.CONSTANT, constants[operand >> 2]))
+
+            instructions.append(
+                Instruction(Opcode(opcode), tuple(decoded), self.lineNums[i])
+            )
+
+        return Program(
+            instructions,
+            dict(self.jumpPoints),
+            set(self.duplicateJumpPoints),
+            list(self.registerNames),
+            source=source,
+            legacyFloats=self.legacyFloats,
+        )
+
+    def dumps(self, hash: str) -> bytes:
+        """
+        Serializes the bytecode, tagged with the hash of its source.
+        """
+        return BYTECODE_MAGIC + marshal.dumps(
+            (
+                BYTECODE_VERSION,
+                hash,
+                self.opcodes.tobytes(),
+                self.offsets.tobytes(),
+                self.operands.tobytes(),
+                self.lineNums.tobytes(),
+                tuple(self.constants),
+                tuple(self.registerNames),
+                tuple(self.jumpPoints.items()),
+                tuple(self.duplicateJumpPoints),
+                self.legacyFloats,
+            )
+        )
+
+    @classmethod
+    def loads(cls, data: bytes, hash: str | None = None) -> "Bytecode | None":
+        """
+        Deserializes bytecode. Returns None if the data is not valid bytecode
+        of this version, or was compiled from a source with a different hash.
+        """
+        if not data.startswith(BYTECODE_MAGIC):
+            return None
+
+        try:
+            fields = marshal.loads(data[len(BYTECODE_MAGIC) :])
+        except (EOFError, ValueError, TypeError):
+            return None
+
+        if not isinstance(fields, tuple) or len(fields) != 11:
+            return None
+
+        (
+            version,
+            storedHash,
+            opcodes,
+            offsets,
+            operands,
+            lineNums,
+            constants,
+            registerNames,
+            jumpPoints,
+            duplicateJumpPoints,
+            legacyFloats,
+        ) = fields
+
+        if version != BYTECODE_VERSION:
+            return None
+
+        if hash is not None and storedHash != hash:
+            return None
+
+        return cls(
+            array("B", opcodes),
+            array("I", offsets),
+            array("I", operands),
+            array("I", lineNums),
+            list(constants),
+            list(registerNames),
+            dict(jumpPoints),
+            list(duplicateJumpPoints),
+            legacyFloats,
+        )
+
+    def disassemble(self) -> str:
+        """
+        Returns a human readable listing of the bytecode.
+        """
+        lines: list[str] = []
+
+        for i, opcode in enumerate(self.opcodes):
+            arguments: list[str] = []
+
+            for operand in self.operands[self.offsets[i] : self.offsets[i + 1]]:
+                if operand & 3 == TAG_REGISTER:
+                    name = self.registerNames[operand >> 2]
+                    arguments.append(f"%{operand >> 2}({name})")
+                    continue
+
+                value = self.constants[operand >> 2]
+
+                if operand & 3 == TAG_CONSTANT and isinstance(value, str):
+                    value = repr(value)
+
+                arguments.append(f"#{operand >> 2}({value})")
+
+            lines.append(
+                f"{i:>5} {self.lineNums[i]:>5}  {Opcode(opcode).name:<8} {' '.join(arguments)}".rstrip()
+            )
+
+        lines.append(f"jmp points: {self.jumpPoints}")
+
+        return "\n".join(lines)
+
+
+class BytecodeCache:
+    """
+    Caches compiled programs next to their source, like __pycache__.
+    Optimized programs are cached separately per optimization level and
+    digit limit, which bounds constant folding, and programs with legacy
+    float semantics separately from the others.
+    """
+
+    def __init__(
+        self,
+        sourcePath: str,
+        optimization: int = 0,
+        legacyFloats: bool = False,
+        maxDigits: int | None = None,
+    ) -> None:
+        directory, name = os.path.split(os.path.abspath(sourcePath))
+        stem = os.path.splitext(name)[0]
+
+        if legacyFloats:
+            stem += ".legacy"
+        if optimization:
+            stem += f".opt-{optimization}"
+
+            if maxDigits is not None:
+                stem += f".digits-{maxDigits}"
+
+        self._path = os.path.join(directory, CACHE_DIRECTORY, stem + CACHE_SUFFIX)
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    def load(self, source: str) -> Program | None:
+        """
+        Returns the cached program for the source, or None if there is no
+        up to date cache entry.
+        """
+        try:
+            with open(self._path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+
+        bytecode = Bytecode.loads(data, sourceHash(source))
+
+        if bytecode is None:
+            return None
+
+        return bytecode.toProgram(source)
+
+    def store(self, source: str, program: Program) -> bool:
+        """
+        Writes the program to the cache. Returns False if the cache directory
+        isn't writable.
+        """
+        data = Bytecode.fromProgram(program).dumps(sourceHash(source))
+        temporaryPath = f"{self._path}.{os.getpid()}.tmp"
+
+        try:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+
+            with open(temporaryPath, "wb") as f:
+                f.write(data)
+
+            os.replace(temporaryPath, self._path)
+        except OSError:
+            return False
+
+        return True
@@ -0,0 +1,161 @@
+"""
+Runs cnstr programs on a daemon. Only the protocol is imported, so the
+client starts in a fraction of the time the interpreter does.
+
+"""
+
+import argparse
+import os
+import socket
+import sys
+
+from errors import CnstrError, CnstrProtocolError
+from protocol import DEFAULT_SOCKET, receiveMessage, sendMessage
+
+
+class Client:
+    """
+    A connection to a daemon, which runs any number of programs in turn.
+    """
+
+    def __init__(self, socketPath: str = DEFAULT_SOCKET) -> None:
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+        try:
+            self._socket.connect(socketPath)
+        except OSError as error:
+            self._socket.close()
+            raise CnstrProtocolError(
+                f"Can't connect to a daemon on '{socketPath}': {error}"
+            ) from None
+
+    def run(
+        self,
+        source: str | None = None,
+        path: str | None = None,
+        inputs: dict[str, int | float | str] | None = None,
+        backend: str | None = None,
+        legacyFloats: bool | None = None,
+    ) -> dict:
+        """
+        Runs a source, or the file at a path the daemon can read, and
+        returns the daemon's reply.
+        """
+        request: dict = {"source": source} if path is None else {"path": path}
+
+        if inputs:
+            request["inputs"] = inputs
+        if backend is not None:
+            request["backend"] = backend
+        if legacyFloats is not None:
+            request["legacyFloats"] = legacyFloats
+
+        sendMessage(self._socket, request)
+        reply = receiveMessage(self._socket)
+
+        if reply is None:
+            raise CnstrProtocolError("The daemon closed the connection.")
+
+        return reply
+
+    def close(self) -> None:
+        self._socket.close()
+
+    def __enter__(self) -> "Client":
+        return self
+
+    def __exit__(self, *exception) -> None:
+        self.close()
+
+
+def parseInput(text: str) -> tuple[str, int | float | str]:
+    """
+    Parses a register=value option. Values which read as numbers are
+    numbers, the rest are strings.
+    """
+    register, separator, value = text.partition("=")
+
+    if not separator:
+        raise argparse.ArgumentTypeError(f"expected register=value, got '{text}'")
+
+    for convert in (int, float):
+        try:
+            return register, convert(value)
+        except ValueError:
+            pass
+
+    return register, value
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a cnstr program on a daemon.")
+    parser.add_argument("source", nargs="?", default="source.txt")
+    parser.add_argument(
+        "--socket",
+        default=DEFAULT_SOCKET,
+        help=f"path of the daemon's socket, defaults to {DEFAULT_SOCKET}",
+    )
+    parser.add_argument(
+        "--input",
+        metavar="REGISTER=VALUE",
+        type=parseInput,
+        action="append",
+        default=[],
+        help="initial value of a register, can be repeated",
+    )
+    parser.add_argument(
+        "--send-source",
+        action="store_true",
+        help="send the file's content instead of its path, "
+        "for daemons which can't read it",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=("closures", "pyexec"),
+        default=None,
+        help="backend to run on, defaults to the daemon's",
+    )
+    parser.add_argument(
+        "--legacy-floats",
+        action="store_true",
+        default=None,
+        help="make every number a float, like the original interpreter",
+    )
+    parser.add_argument(
+        "--registers",
+        action="store_true",
+        help="print the final registers after the output",
+    )
+    args = parser.parse_args()
+
+    try:
+        if args.send_source:
+            with open(args.source, "r") as f:
+                request = {"source": f.read()}
+        else:
+            request = {"path": os.path.abspath(args.source)}
+
+        with Client(args.socket) as client:
+            reply = client.run(
+                **request,
+                inputs=dict(args.input),
+                backend=args.backend,
+                legacyFloats=args.legacy_floats,
+            )
+    except (CnstrError, OSError) as error:
+        print(error)
+        exit(1)
+
+    sys.stdout.write(reply.get("output", ""))
+
+    if not reply.get("ok"):
+        print(reply.get("error"))
+        exit(1)
+
+    if args.registers:
+        for register, value in reply["registers"].items():
+            print(f"{register} = {value!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -54,13 +54,16 @@ class TokenValue(Enum):
 
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Token:
-    """Represents a token"""
+    """
+    Represents a token. Tokens are immutable, so the lexer hands out the
+    same token for every occurrence of a word.
+    """
 
     tokenType: TokenType
     tokenValue: TokenValue | None
-    value: str | float
+    value: str | int | float
 
     def __str__(self) -> str:
         return f"{self.tokenType}"
@@ -103,3 +106,39 @@ COMPARE_MAP = {
     "<=": TokenValue.COMPARE_LTE,
 }
 
+
+
+def formatTokenList(tokens: list[Token]) -> str:
+    """
+    Formats a list of tokens as their types, e.g. 'COMMAND<ADD> REGISTER'.
+    """
+    string = ""
+    for token in tokens:
+        string += token.tokenType.name
+        if token.tokenValue is not None:
+            string += f"<{token.tokenValue.name.removeprefix(token.tokenType.name + '_')}>"
+        string += " "
+    return string.rstrip()
+
+
+def recreateLine(tokens: list[Token]) -> str:
+    """
+    Recreates the source text of a line from its tokens.
+    """
+    string = ""
+    for token in tokens:
+        if token.tokenType == TokenType.ENDLINE:
+            string += "\n"
+            continue
+
+        if token.tokenType == TokenType.LITERAL:
+            if token.tokenValue == TokenValue.LITERAL_STRING:
+                string += f"'{token.value}'"
+            else:
+                string += str(token.value)
+        else:
+            string += token.value
+
+        string += " "
+
+    return string.rstrip()
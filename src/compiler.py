@@ -0,0 +1,603 @@
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import Iterable
+import linecache
+from enum import IntEnum, auto
+
+from common import (
+    TokenType,
+    TokenValue,
+    Token,
+    COMMAND_MAP,
+    formatTokenList,
+    recreateLine,
+)
+from errors import ErrorDetail, CnstrSyntaxError
+from lexer import Lexer
+
+
+class Opcode(IntEnum):
+    """Enumeration of compiled instruction opcodes"""
+
+    NOP = auto()
+    MOV = auto()
+    CPY = auto()
+    SET = auto()
+    ADD = auto()
+    SUB = auto()
+    MUL = auto()
+    DIV = auto()
+    MOD = auto()
+    POW = auto()
+    STDOUT = auto()
+    SETJMPP = auto()
+    JMP = auto()
+    JMPIF = auto()
+    STRLEN = auto()
+    STRAPP = auto()
+    CHARAT = auto()
+
+
+class OperandKind(IntEnum):
+    """Enumeration of operand kinds"""
+
+    REGISTER = auto()
+    CONSTANT = auto()
+
+
+Operand = tuple[OperandKind, object]
+
+
+MATH_OPCODES = {
+    TokenValue.COMMAND_ADD: Opcode.ADD,
+    TokenValue.COMMAND_SUB: Opcode.SUB,
+    TokenValue.COMMAND_MUL: Opcode.MUL,
+    TokenValue.COMMAND_DIV: Opcode.DIV,
+    TokenValue.COMMAND_MOD: Opcode.MOD,
+    TokenValue.COMMAND_POW: Opcode.POW,
+}
+
+
+@dataclass
+class Instruction:
+    """A validated source line, lowered to an opcode and resolved operands"""
+
+    opcode: Opcode
+    operands: tuple
+    lineNum: int
+
+
+@dataclass
+class Program:
+    """A compiled program, ready to be executed by the interpreter"""
+
+    instructions: list[Instruction]
+    jumpPoints: dict[str, int]
+    duplicateJumpPoints: set[str] = field(default_factory=set)
+    registerNames: list[str] = field(default_factory=list)
+    lines: list[list[Token]] = field(default_factory=list)
+    source: str = ""
+    sourcePath: str = ""
+    legacyFloats: bool = False
+
+    def target(self, lineNum: int) -> int:
+        """
+        Returns the index of the instruction execution continues at after
+        jumping to a jump point on the given line.
+        """
+        return bisect_right(
+            self.instructions, lineNum, key=lambda instruction: instruction.lineNum
+        )
+
+    def jumpTargets(self) -> set[int]:
+        """
+        Returns the indices of every instruction a jump can continue at.
+        """
+        targets = {self.target(lineNum) for lineNum in self.jumpPoints.values()}
+
+        # Duplicated jump points can be redefined while running.
+        for instruction in self.instructions:
+            if instruction.opcode == Opcode.SETJMPP:
+                targets.add(self.target(instruction.lineNum))
+
+        return targets
+
+    def line(self, lineNum: int) -> list[Token]:
+        """
+        Returns the tokens of a source line, re-lexing it from the source (or
+        the source file) if the program was compiled without keeping them.
+        """
+        if self.lines:
+            return self.lines[lineNum]
+
+        if self.source:
+            line = self.source.splitlines()[lineNum]
+        else:
+            line = linecache.getline(self.sourcePath, lineNum + 1)
+
+        lexer = Lexer(line, self.legacyFloats)
+        return lexer.tokenizeLine(line.rstrip("\n"))[:-1]
+
+
+def undefinedJumps(
+    jumps: Iterable[tuple[str, int, list[Token]]], jumpPoints: Iterable[str]
+) -> list[ErrorDetail]:
+    """
+    Returns an error for every jump, given by its label, line number and
+    tokens, to a jump point which isn't defined anywhere in the program.
+    """
+    return [
+        ErrorDetail(
+            lineNum,
+            f"Jump point '{label}' does not exist.",
+            recreateLine(line),
+            formatTokenList(line),
+        )
+        for label, lineNum, line in jumps
+        if label not in jumpPoints
+    ]
+
+
+class Compiler:
+    """
+    Validates every line of a token stream once and lowers it into a list of
+    instructions, so the interpreter doesn't re-check lines while running.
+    """
+
+    def __init__(
+        self,
+        lines: Iterable[list[Token]],
+        keepLines: bool = True,
+        legacyFloats: bool = False,
+        link: bool = True,
+    ) -> None:
+        """
+        :param lines: The tokens of every line, e.g. from Lexer.iterLines()
+        :param keepLines: Whether the program keeps the tokens for error
+            messages, instead of re-lexing the failing line from its source
+        :param legacyFloats: Whether the program runs with legacy float
+            semantics, the lines must be lexed with the same setting
+        :param link: Whether to check that jumps go to defined jump points,
+            off when compiling part of a program
+        """
+        self._lines = lines
+        self._keepLines = keepLines
+        self._legacyFloats = legacyFloats
+        self._link = link
+        self._lineNum = 0
+        self._currentLine: list[Token] = []
+        self._errors: list[ErrorDetail] = []
+
+        self._jumpPoints: dict[str, int] = {"start": 0}
+        self._definedJumpPoints: set[str] = set()
+        self._duplicateJumpPoints: set[str] = set()
+
+        # Label, line number and tokens of every jump, checked when linking.
+        self._jumps: list[tuple[str, int, list[Token]]] = []
+
+        # Every register name gets a fixed slot in the register file.
+        self._registerSlots: dict[str, int] = {}
+
+    def compile(self) -> Program:
+        """
+        Compiles the lines in a single pass and returns the program. Jump
+        targets are resolved when the program is lowered, so jumps to jump
+        points further down need no second pass.
+        """
+        instructions: list[Instruction] = []
+        keptLines: list[list[Token]] = []
+
+        for i, line in enumerate(self._lines):
+            self._lineNum = i
+            self._currentLine = line
+
+            if self._keepLines:
+                keptLines.append(line)
+
+            instruction = self.compileLine(line)
+
+            if instruction is None:
+                instruction = Instruction(Opcode.NOP, (), i)
+
+            instructions.append(instruction)
+
+        if len(self._errors) > 0:
+            raise CnstrSyntaxError("compiling", self._errors)
+
+        if self._link:
+            errors = undefinedJumps(self._jumps, self._jumpPoints)
+
+            if errors:
+                raise CnstrSyntaxError("linking", errors)
+
+        return Program(
+            instructions,
+            self._jumpPoints,
+            self._duplicateJumpPoints,
+            list(self._registerSlots),
+            keptLines,
+            legacyFloats=self._legacyFloats,
+        )
+
+    def _addJumpPoint(self, label: str) -> None:
+        if label in self._definedJumpPoints:
+            self._duplicateJumpPoints.add(label)
+
+        self._definedJumpPoints.add(label)
+        self._jumpPoints[label] = self._lineNum
+
+    def compileLine(self, line: list[Token]) -> Instruction | None:
+        if len(line) == 0:
+            return None
+
+        command = line[0]
+        if command.tokenType == TokenType.COMMENT:
+            return None
+
+        elif command.tokenType != TokenType.COMMAND:
+            return self.error(
+                f"Unsupported code statement '{formatTokenList(line)}'."
+            )
+
+        if command.tokenValue == TokenValue.COMMAND_MOV:
+            return self.compileMov(line)
+        elif command.tokenValue == TokenValue.COMMAND_SET:
+            return self.compileSet(line)
+        elif command.tokenValue == TokenValue.COMMAND_CPY:
+            return self.compileCpy(line)
+        elif command.tokenValue in MATH_OPCODES:
+            return self.compileMath(line, command.tokenValue)
+        elif command.tokenValue == TokenValue.COMMAND_STDOUT:
+            return self.compileStdout(line)
+        elif command.tokenValue == TokenValue.COMMAND_SETJMPP:
+            return self.compileSetJumpPoint(line)
+        elif command.tokenValue == TokenValue.COMMAND_JMP:
+            return self.compileJmp(line)
+        elif command.tokenValue == TokenValue.COMMAND_JMPIF:
+            return self.compileJmpIf(line)
+        elif command.tokenValue == TokenValue.COMMAND_STRLEN:
+            return self.compileStrlen(line)
+        elif command.tokenValue == TokenValue.COMMAND_STRAPP:
+            return self.compileStrapp(line)
+        elif command.tokenValue == TokenValue.COMMAND_CHARAT:
+            return self.compileCharAt(line)
+        elif command.tokenValue == TokenValue.COMMAND_SPACE:
+            return None
+        else:
+            return self.error(f"Unsupported command '{command.value}'.")
+
+    def compileMov(self, line: list[Token]) -> Instruction | None:
+        result = self._expectTypes(
+            line, [TokenType.COMMAND, TokenType.REGISTER, TokenType.REGISTER]
+        )
+
+        if not result:
+            return self.error(
+                f"Invalid command usage for 'mov'. Expected command in form 'mov <regX> <regY>'"
+            )
+
+        command, register1, register2 = line
+
+        return self._instruction(
+            Opcode.MOV, self._operand(register1), self._operand(register2)
+        )
+
+    def compileSet(self, line: list[Token]) -> Instruction | None:
+        result = self._expectTypes(
+            line, [TokenType.COMMAND, TokenType.REGISTER, TokenType.LITERAL]
+        )
+
+        if not result:
+            return self.error(
+                f"Invalid command usage for 'set'. Expected command in form 'set <regX> <literal>'"
+            )
+
+        command, register, literal = line
+
+        if literal.tokenValue == TokenValue.LITERAL_NUMBER:
+            value = literal.value
+        elif literal.tokenValue == TokenValue.LITERAL_STRING:
+            value = literal.value
+        else:
+            raise NotImplementedError("Invalid literal type.")
+
+        return self._instruction(
+            Opcode.SET, self._operand(register), (OperandKind.CONSTANT, value)
+        )
+
+    def compileCpy(self, line: list[Token]) -> Instruction | None:
+        result = self._expectTypes(
+            line, [TokenType.COMMAND, TokenType.REGISTER, TokenType.REGISTER]
+        )
+
+        if not result:
+            return self.error(
+                f"Invalid command usage for 'cpy'. Expected command in form 'cpy <regFr> <regTo>'"
+            )
+
+        command, register1, register2 = line
+
+        return self._instruction(
+            Opcode.CPY, self._operand(register1), self._operand(register2)
+        )
+
+    def compileMath(
+        self, line: list[Token], operation: TokenValue
+    ) -> Instruction | None:
+        result = self._expectTypes(
+            line,
+            [
+                TokenType.COMMAND,
+                (TokenType.REGISTER, TokenType.LITERAL),
+                (TokenType.REGISTER, TokenType.LITERAL),
+                TokenType.REGISTER,
+            ],
+        )
+
+        if not result:
+            return self.error(
+                f"Invalid usage for '{operation.name.lower()}'. Expected command in form '{operation.name.lower()} <reg|num> <reg|num> <regO>'"
+            )
+
+        command, inA, inB, register3 = line
+
+        for token in (inA, inB):
+            if (
+                token.tokenType == TokenType.LITERAL
+                and token.tokenValue != TokenValue.LITERAL_NUMBER
+            ):
+                return self.error(
+                    f"Invalid usage for '{operation.name.lower()}'. Expected literal number, got '{token.tokenValue}'."
+                )
+
+        return self._instruction(
+            MATH_OPCODES[operation],
+            self._operand(inA),
+            self._operand(inB),
+            self._operand(register3),
+        )
+
+    def compileStdout(self, line: list[Token]) -> Instruction | None:
+        # Don't expect any arguments, just print everything in the line
+        if len(line) == 1:
+            return self._instruction(Opcode.STDOUT, (OperandKind.CONSTANT, "\n"))
+
+        pieces: list[Operand] = []
+        for token in line[1:]:
+            if token.tokenType == TokenType.REGISTER:
+                pieces.append(self._operand(token))
+            elif token.tokenType == TokenType.LITERAL:
+                pieces.append((OperandKind.CONSTANT, str(token.value)))
+            elif token.tokenType == TokenType.COMMAND:
+                if token.tokenValue == TokenValue.COMMAND_ENDL:
+                    pieces.append((OperandKind.CONSTANT, "\n"))
+                elif token.tokenValue == TokenValue.COMMAND_SPACE:
+                    pieces.append((OperandKind.CONSTANT, " "))
+                else:
+                    pieces.append((OperandKind.CONSTANT, token.value))
+
+            elif token.tokenType == TokenType.COMPARE:
+                pieces.append((OperandKind.CONSTANT, token.value))
+            else:
+                raise NotImplementedError("Invalid token type.")
+
+        return self._instruction(Opcode.STDOUT, *pieces)
+
+    def compileSetJumpPoint(self, line: list[Token]) -> Instruction | None:
+        result = self._expectTypes(line, [TokenType.COMMAND, TokenType.LITERAL])
+
+        if not result:
+            return self.error(
+                f"Invalid command usage for 'setjmpp'. Expected command in form 'setjmpp <string lit>'"
+            )
+
+        command, literal = line
+
+        if literal.tokenValue != TokenValue.LITERAL_STRING:
+            return self.error(
+                f"Invalid command usage for 'setjmpp'. Expected literal string, got '{literal.tokenValue}'"
+            )
+
+        # Check for valid jump point name
+        if not literal.value.isalnum():
+            return self.error(
+                f"Invalid command usage for 'setjmpp'. Jump point name must be alphanumeric."
+            )
+
+        if literal.value.lower() != literal.value:
+            return self.error(
+                f"Invalid command usage for 'setjmpp'. Jump point name must be lowercase."
+            )
+
+        if literal.value in COMMAND_MAP.keys():
+            return self.error(
+                f"Invalid command usage for 'setjmpp'. Jump point name cannot shadow built in names."
+            )
+
+        self._addJumpPoint(literal.value)
+
+        return self._instruction(
+            Opcode.SETJMPP, (OperandKind.CONSTANT, literal.value)
+        )
+
+    def compileJmp(self, line: list[Token]) -> Instruction | None:
+        result = self._expectTypes(line, [TokenType.COMMAND, TokenType.LITERAL])
+
+        if not result:
+            return self.error(
+                f"Invalid command usage for 'jmp'. Expected command in form 'jmp <string lit>'"
+            )
+
+        command, literal = line
+
+        if literal.tokenValue != TokenValue.LITERAL_STRING:
+            return self.error(
+                f"Invalid command usage for 'jmp'. Expected literal string, got '{literal.tokenValue}'"
+            )
+
+        self._jumps.append((literal.value, self._lineNum, line))
+        return self._instruction(Opcode.JMP, (OperandKind.CONSTANT, literal.value))
+
+    def compileJmpIf(self, line: list[Token]) -> Instruction | None:
+        result = self._expectTypes(
+            line,
+            [
+                TokenType.COMMAND,
+                TokenType.LITERAL,
+                TokenType.REGISTER,
+                TokenType.COMPARE,
+                (TokenType.REGISTER, TokenType.LITERAL),
+            ],
+        )
+
+        if not result:
+            return self.error(
+                f"Invalid command usage for 'jmpif'. Expected command in form 'jmpif <string lit> <reg> <compare> <reg|number>'"
+            )
+
+        command, jumpPoint, arg1, compare, arg2 = line
+
+        if arg2.tokenType == TokenType.LITERAL:
+            if arg2.tokenValue != TokenValue.LITERAL_NUMBER:
+                return self.error(
+                    f"Invalid command usage for 'jmpif'. Expected literal number, got '{arg2.tokenValue}'."
+                )
+
+            operand2 = (OperandKind.CONSTANT, arg2.value)
+        else:
+            operand2 = self._operand(arg2)
+
+        if jumpPoint.tokenValue != TokenValue.LITERAL_STRING:
+            return self.error(
+                f"Invalid command usage for 'jmpif'. Expected literal string, got '{jumpPoint.tokenValue}'"
+            )
+
+        self._jumps.append((jumpPoint.value, self._lineNum, line))
+        return self._instruction(
+            Opcode.JMPIF,
+            (OperandKind.CONSTANT, jumpPoint.value),
+            self._operand(arg1),
+            (OperandKind.CONSTANT, compare.tokenValue),
+            operand2,
+        )
+
+    def compileStrlen(self, line: list[Token]) -> Instruction | None:
+        result = self._expectTypes(
+            line, [TokenType.COMMAND, TokenType.REGISTER, TokenType.REGISTER]
+        )
+
+        if not result:
+            return self.error(
+                f"Invalid command usage for 'strlen'. Expected command in form 'strlen <regIn> <regOut>'"
+            )
+
+        command, arg1, arg2 = line
+
+        return self._instruction(
+            Opcode.STRLEN, self._operand(arg1), self._operand(arg2)
+        )
+
+    def compileStrapp(self, line: list[Token]) -> Instruction | None:
+        result = self._expectTypes(
+            line,
+            [
+                TokenType.COMMAND,
+                TokenType.REGISTER,
+                (TokenType.REGISTER, TokenType.LITERAL),
+                TokenType.REGISTER,
+            ],
+        )
+
+        if not result:
+            return self.error(
+                f"Invalid command usage for 'strapp'. Expected command in form 'strapp <regIn> <reg|literal> <regOut>'"
+            )
+
+        command, arg1, arg2, arg3 = line
+
+        if (
+            arg2.tokenType == TokenType.LITERAL
+            and arg2.tokenValue != TokenValue.LITERAL_STRING
+        ):
+            return self.error(
+                f"Invalid command usage for 'strapp'. Expected string literal, got '{arg2.tokenValue}'"
+            )
+
+        return self._instruction(
+            Opcode.STRAPP,
+            self._operand(arg1),
+            self._operand(arg2),
+            self._operand(arg3),
+        )
+
+    def compileCharAt(self, line: list[Token]) -> Instruction | None:
+        result = self._expectTypes(
+            line,
+            [
+                TokenType.COMMAND,
+                TokenType.REGISTER,
+                (TokenType.REGISTER, TokenType.LITERAL),
+                TokenType.REGISTER,
+            ],
+        )
+
+        if not result:
+            return self.error(
+                f"Invalid command usage for 'charat'. Expected command in form 'charat <regIn> <reg|literal> <regOut>'"
+            )
+
+        command, arg1, arg2, arg3 = line
+
+        if (
+            arg2.tokenType == TokenType.LITERAL
+            and arg2.tokenValue != TokenValue.LITERAL_NUMBER
+        ):
+            return self.error(
+                f"Invalid command usage for 'charat'. Expected number literal, got '{arg2.tokenValue}'"
+            )
+
+        return self._instruction(
+            Opcode.CHARAT,
+            self._operand(arg1),
+            self._operand(arg2),
+            self._operand(arg3),
+        )
+
+    def _instruction(self, opcode: Opcode, *operands: Operand) -> Instruction:
+        return Instruction(opcode, operands, self._lineNum)
+
+    def _operand(self, token: Token) -> Operand:
+        if token.tokenType == TokenType.REGISTER:
+            slot = self._registerSlots.setdefault(
+                token.value, len(self._registerSlots)
+            )
+            return (OperandKind.REGISTER, slot)
+
+        return (OperandKind.CONSTANT, token.value)
+
+    def _expectTypes(
+        self, line: list[Token], types: list[TokenType | tuple[TokenType]]
+    ) -> bool:
+        if len(line) != len(types):
+            return False
+
+        for expectedType, token in zip(types, line):
+            if isinstance(expectedType, tuple):
+                if token.tokenType not in expectedType:
+                    return False
+                continue
+
+            if token.tokenType != expectedType:
+                return False
+
+        return True
+
+    def error(self, message: str) -> None:
+        self._errors.append(
+            ErrorDetail(
+                self._lineNum,
+                message,
+                recreateLine(self._currentLine),
+                formatTokenList(self._currentLine),
+            )
+        )
@@ -0,0 +1,78 @@
+from bisect import bisect_right
+
+from compiler import Opcode, Instruction, Program
+
+
+# Successor of blocks that run off the end of the program.
+EXIT = -1
+
+
+def jumpTargets(
+    program: Program, instructions: list[Instruction]
+) -> dict[str, list[int]]:
+    """
+    Returns the indices a jump to each jump point can continue at, in the
+    instructions of the program, which may have been rewritten since.
+    """
+    lineNums = [instruction.lineNum for instruction in instructions]
+    targets = {
+        label: [bisect_right(lineNums, lineNum)]
+        for label, lineNum in program.jumpPoints.items()
+    }
+
+    # Duplicated jump points can be redefined while running.
+    for instruction in instructions:
+        if instruction.opcode == Opcode.SETJMPP:
+            (_, label), = instruction.operands
+            targets[label].append(bisect_right(lineNums, instruction.lineNum))
+
+    return targets
+
+
+def buildBlocks(
+    program: Program, instructions: list[Instruction]
+) -> tuple[list[range], list[list[int]]]:
+    """
+    Splits the instructions into basic blocks at jumps and jump targets and
+    returns the blocks and the successors of every block, EXIT for running
+    off the end.
+    """
+    end = len(instructions)
+    targets = jumpTargets(program, instructions)
+
+    leaders = {0}
+    for labelTargets in targets.values():
+        leaders.update(labelTargets)
+    for i, instruction in enumerate(instructions):
+        if instruction.opcode in (Opcode.JMP, Opcode.JMPIF):
+            leaders.add(i + 1)
+
+    starts = sorted(leader for leader in leaders if leader < end)
+    blocks = [range(start, stop) for start, stop in zip(starts, starts[1:] + [end])]
+    blockAt = {block.start: i for i, block in enumerate(blocks)}
+    blockAt[end] = EXIT
+
+    successors: list[list[int]] = []
+    for block in blocks:
+        if not block:
+            successors.append([])
+            continue
+
+        last = instructions[block.stop - 1]
+        following: list[int] = []
+
+        if last.opcode in (Opcode.JMP, Opcode.JMPIF):
+            label = last.operands[0][1]
+
+            # Jumps to missing jump points always stop the program.
+            if label in targets:
+                following.extend(blockAt[target] for target in targets[label])
+
+                if last.opcode == Opcode.JMPIF:
+                    following.append(blockAt[block.stop])
+        else:
+            following.append(blockAt[block.stop])
+
+        successors.append(sorted(set(following)))
+
+    return blocks, successors
@@ -0,0 +1,238 @@
+"""
+Serves program runs over a Unix socket, so a caller pays for starting the
+interpreter and compiling a program once rather than on every run.
+
+Each request is a message with the program's "source", or the "path" of
+its file, and optionally the "inputs" registers, "backend" and
+"legacyFloats". The reply holds "ok", the "output" and the final
+"registers", or the "stage" the run failed in and its "error". The stage is
+"request", "read", "compile", "run", or "internal" for errors of the daemon
+itself. Requests on one connection are answered in order, connections are
+served concurrently as asyncio tasks.
+
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import threading
+
+import api
+from errors import CnstrError, CnstrSyntaxError, CnstrRuntimeError
+from interpreter import SLICE_SIZE
+from limits import Limits, addLimitArguments, limitsFromArguments
+from protocol import (
+    DEFAULT_SOCKET,
+    HEADER,
+    decodeMessage,
+    encodeMessage,
+    messageSize,
+)
+
+
+class Daemon:
+    """
+    A server of program runs on a Unix socket. Compiled programs are kept
+    by api.compileProgram() between requests, keyed by their source.
+    """
+
+    def __init__(
+        self,
+        socketPath: str = DEFAULT_SOCKET,
+        backend: str = "closures",
+        legacyFloats: bool = False,
+        limits: Limits | None = None,
+        sliceSize: int = SLICE_SIZE,
+    ) -> None:
+        self.socketPath = socketPath
+        self.ready = threading.Event()
+        self._backend = backend
+        self._legacyFloats = legacyFloats
+        self._limits = limits
+        self._sliceSize = sliceSize
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._server: asyncio.AbstractServer | None = None
+
+    def serveForever(self) -> None:
+        asyncio.run(self.serve())
+
+    async def serve(self) -> None:
+        """
+        Listens on the socket until stop() is called. Raises
+        CnstrProtocolError if another daemon already listens on it.
+        """
+        self._removeStaleSocket()
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_unix_server(self._handle, self.socketPath)
+
+        try:
+            self.ready.set()
+
+            async with self._server:
+                try:
+                    await self._server.serve_forever()
+                except asyncio.CancelledError:
+                    pass
+        finally:
+            self.ready.clear()
+
+            try:
+                os.unlink(self.socketPath)
+            except FileNotFoundError:
+                pass
+
+    def stop(self) -> None:
+        """
+        Stops serving, from any thread.
+        """
+        if self._loop is not None and self._server is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+
+    async def respond(self, request: dict) -> dict:
+        """
+        Runs the program of a request and returns the reply.
+        """
+        source = request.get("source")
+        path = request.get("path")
+        inputs = request.get("inputs") or {}
+        backend = request.get("backend") or self._backend
+        legacyFloats = request.get("legacyFloats", self._legacyFloats)
+
+        if (source is None) == (path is None):
+            return _failure("request", "A request needs either a source or a path.")
+        if not isinstance(source if path is None else path, str):
+            return _failure("request", "The source and path must be strings.")
+        if not isinstance(inputs, dict):
+            return _failure("request", "The inputs must be an object.")
+
+        if path is not None:
+            try:
+                with open(path, "r") as f:
+                    source = f.read()
+            except (OSError, UnicodeDecodeError) as error:
+                return _failure("read", f"Can't read '{path}': {error}")
+
+        try:
+            result = await api.runAsync(
+                source,
+                inputs,
+                self._limits,
+                backend,
+                bool(legacyFloats),
+                self._sliceSize,
+            )
+        except CnstrSyntaxError as error:
+            return _failure("compile", str(error))
+        except CnstrRuntimeError as error:
+            return _failure("run", str(error), error.output)
+        except (ValueError, TypeError) as error:
+            return _failure("request", str(error))
+        except Exception as error:
+            # A bug shouldn't leave the client without a reply.
+            return _failure("internal", f"{type(error).__name__}: {error}")
+
+        return {"ok": True, "output": result.output, "registers": result.registers}
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(HEADER.size)
+                except asyncio.IncompleteReadError:
+                    # Closed between two requests.
+                    break
+
+                try:
+                    data = await reader.readexactly(messageSize(header))
+                    request = decodeMessage(data)
+                except CnstrError as error:
+                    # The stream can't be trusted past a bad message.
+                    writer.write(encodeMessage(_failure("request", str(error))))
+                    await writer.drain()
+                    break
+
+                reply = await self.respond(request)
+
+                try:
+                    message = encodeMessage(reply)
+                except (CnstrError, ValueError) as error:
+                    # Like a reply too long to send, or registers too large
+                    # to write as JSON.
+                    message = encodeMessage(
+                        _failure("internal", f"Can't send the reply: {error}")
+                    )
+
+                writer.write(message)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def _removeStaleSocket(self) -> None:
+        # A socket file left behind by a daemon which didn't shut down
+        # cleanly refuses connections.
+        if not os.path.exists(self.socketPath):
+            return
+
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+        try:
+            probe.connect(self.socketPath)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.unlink(self.socketPath)
+            return
+        finally:
+            probe.close()
+
+        raise CnstrError(f"A daemon already listens on '{self.socketPath}'.")
+
+
+def _failure(stage: str, error: str, output: str = "") -> dict:
+    return {"ok": False, "stage": stage, "error": error, "output": output}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Serve cnstr program runs over a Unix socket."
+    )
+    parser.add_argument(
+        "--socket",
+        default=DEFAULT_SOCKET,
+        help=f"path of the socket to listen on, defaults to {DEFAULT_SOCKET}",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=("closures", "pyexec"),
+        default="closures",
+        help="backend of requests which don't choose one",
+    )
+    parser.add_argument(
+        "--legacy-floats",
+        action="store_true",
+        help="make every number a float in requests which don't choose",
+    )
+    addLimitArguments(parser)
+    args = parser.parse_args()
+
+    daemon = Daemon(
+        args.socket, args.backend, args.legacy_floats, limitsFromArguments(args)
+    )
+    signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+
+    try:
+        print(f"listening on {args.socket}", flush=True)
+        daemon.serveForever()
+    except CnstrError as error:
+        print(error)
+        exit(1)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
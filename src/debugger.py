@@ -0,0 +1,421 @@
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from common import TokenType
+from compiler import Opcode, Instruction, Program
+from errors import PROGRAM_ERRORS
+from fusion import Fuser
+from lexer import Lexer
+from limits import LimitExceeded
+from lowering import Op, COMPARE_OPERATORS
+from rope import Rope, isString
+
+if TYPE_CHECKING:
+    from interpreter import Interpreter
+
+
+Condition = Callable[[Mapping[str, int | float | str]], bool]
+
+
+@dataclass
+class Breakpoint:
+    """
+    A line to stop before, whenever the condition holds if there is one.
+    'hits' counts the stops.
+    """
+
+    lineNum: int
+    condition: Condition | None = None
+    hits: int = 0
+
+
+@dataclass
+class Stop:
+    """
+    Where and why a debugged run paused. 'reason' is "breakpoint", "watchpoint"
+    or "step". Watchpoints give the register with its old and new value.
+    """
+
+    reason: str
+    lineNum: int
+    register: str | None = None
+    old: int | float | str | None = None
+    new: int | float | str | None = None
+
+
+class DebugStop(Exception):
+    """
+    Raised by an instrumented op to pause the run, with the instruction it
+    continues at.
+    """
+
+    def __init__(self, pc: int, stop: Stop) -> None:
+        super().__init__(stop.reason)
+        self.pc = pc
+        self.stop = stop
+
+
+def writtenSlots(instruction: Instruction) -> tuple[int, ...]:
+    """
+    Returns the register slots an instruction writes.
+    """
+    opcode = instruction.opcode
+    operands = instruction.operands
+
+    if opcode == Opcode.MOV:
+        return (operands[0][1], operands[1][1])
+    if opcode == Opcode.SET:
+        return (operands[0][1],)
+    if opcode in (Opcode.NOP, Opcode.SETJMPP, Opcode.STDOUT, Opcode.JMP, Opcode.JMPIF):
+        return ()
+
+    # The destination comes last in the others.
+    return (operands[-1][1],)
+
+
+def parseCondition(text: str, legacyFloats: bool = False) -> Condition:
+    """
+    Parses a condition written like the comparison of 'jmpif', e.g.
+    'rn > 10' or 'rs = "done"'. Raises ValueError if it isn't one.
+    """
+    tokens, errors = Lexer("", legacyFloats).lexLine(text)
+
+    if (
+        errors
+        or len(tokens) != 3
+        or tokens[0].tokenType != TokenType.REGISTER
+        or tokens[1].tokenType != TokenType.COMPARE
+        or tokens[2].tokenType not in (TokenType.REGISTER, TokenType.LITERAL)
+    ):
+        raise ValueError(
+            f"Invalid condition '{text}'. Expected '<reg> <compare> <reg|literal>'."
+        )
+
+    register, compare, other = tokens
+    function = COMPARE_OPERATORS[compare.tokenValue]
+
+    if other.tokenType == TokenType.REGISTER:
+        return lambda registers: function(
+            registers[register.value], registers[other.value]
+        )
+
+    return lambda registers: function(registers[register.value], other.value)
+
+
+class Debugger:
+    """
+    Runs a compiled program with breakpoints, watchpoints on registers and
+    single steps. Only the instructions with a breakpoint, or which write a
+    watched register, are replaced by instrumented ops. They are left out
+    of superinstructions, the rest of the program is fused like in a normal
+    run.
+
+    The fuel for the limits is kept across steps and continues, so the
+    instruction count is the same as without stopping.
+
+    Watchpoints stop after an instruction changed the register, whether by
+    'set', 'mov', 'cpy' or any other instruction writing it.
+    """
+
+    def __init__(
+        self, interpreter: "Interpreter", program: Program | None = None
+    ) -> None:
+        self._interpreter = interpreter
+        self._ops = interpreter._lower(program)
+        self._program = interpreter._program
+        self._fuser = Fuser(interpreter, self._program, self._ops)
+        self._fused = self._fuser.fuse()
+        self._instrumented: tuple[list[Op], Fuser] | None = None
+        self._atBreakpoint = False
+        self._fuel = 0
+
+        # The first instruction of each line.
+        self._indices: dict[int, int] = {}
+        for i, instruction in enumerate(self._program.instructions):
+            self._indices.setdefault(instruction.lineNum, i)
+
+        self.breakpoints: dict[int, Breakpoint] = {}
+        self.watchpoints: set[str] = set()
+        self.pc = 0
+
+    @property
+    def finished(self) -> bool:
+        return self.pc >= len(self._ops)
+
+    @property
+    def lineNum(self) -> int | None:
+        """
+        The line of the next instruction, None once the program finished.
+        """
+        if self.finished:
+            return None
+
+        return self._program.instructions[self.pc].lineNum
+
+    @property
+    def registers(self) -> dict[str, int | float | str]:
+        return {
+            register: str(value) if type(value) is Rope else value
+            for register, value in self._interpreter._registers.items()
+        }
+
+    def addBreakpoint(
+        self, lineNum: int, condition: str | Condition | None = None
+    ) -> Breakpoint:
+        """
+        Stops the run before the line, if the condition holds. Conditions are
+        written like the comparison of 'jmpif', or are functions of the
+        registers. A condition which fails to evaluate stops too.
+        """
+        if lineNum not in self._indices:
+            raise ValueError(f"Line {lineNum} has no instruction.")
+
+        if isinstance(condition, str):
+            condition = parseCondition(condition, self._program.legacyFloats)
+
+        breakpoint = Breakpoint(lineNum, condition)
+        self.breakpoints[lineNum] = breakpoint
+        self._instrumented = None
+
+        return breakpoint
+
+    def removeBreakpoint(self, lineNum: int) -> None:
+        del self.breakpoints[lineNum]
+        self._instrumented = None
+
+    def watch(self, register: str) -> None:
+        """
+        Stops the run after every change of the register.
+        """
+        if register not in self._program.registerNames:
+            raise ValueError(f"Register '{register}' is not used by the program.")
+
+        self.watchpoints.add(register)
+        self._instrumented = None
+
+    def unwatch(self, register: str) -> None:
+        self.watchpoints.remove(register)
+        self._instrumented = None
+
+    def step(self) -> Stop | None:
+        """
+        Runs the next instruction and returns where the run is now, None
+        once the program finished.
+        """
+        if self.finished:
+            return None
+
+        interpreter = self._interpreter
+        pc = self.pc
+        slots = self._watchedSlots(self._program.instructions[pc])
+        regs = interpreter._registers.slots
+        before = [regs[slot] for slot in slots]
+
+        try:
+            target = self._ops[pc]()
+
+            guard = interpreter._guard
+
+            if target is not None and target <= pc and guard is not None:
+                self._fuel -= pc + 1 - target
+
+                if self._fuel < 0:
+                    self._fuel = guard.refuel(self._fuel)
+        except PROGRAM_ERRORS + (LimitExceeded,) as exception:
+            interpreter._raiseFrom(pc, exception)
+
+        self.pc = pc + 1 if target is None else target
+        self._atBreakpoint = False
+        interpreter._output.flush()
+
+        for slot, old in zip(slots, before):
+            if changed(old, regs[slot]):
+                return self._watchpointStop(pc, slot, old)
+
+        if self.finished:
+            interpreter._lineNum = self.pc
+            return None
+
+        return Stop("step", self.lineNum)
+
+    def continueRun(self) -> Stop | None:
+        """
+        Runs until a breakpoint or watchpoint stops the run and returns the
+        stop, None once the program finished.
+        """
+        if self.finished:
+            return None
+
+        if self._atBreakpoint:
+            # Leave the breakpoint the run stopped at.
+            stop = self.step()
+
+            if stop is None or stop.reason == "watchpoint":
+                return stop
+
+        if self.breakpoints or self.watchpoints:
+            ops, fuser = self._instrumentedOps()
+        else:
+            ops, fuser = self._fused, self._fuser
+
+        try:
+            self._execute(ops, fuser)
+        except DebugStop as paused:
+            self.pc = paused.pc
+            self._atBreakpoint = paused.stop.reason == "breakpoint"
+            return paused.stop
+        finally:
+            self._interpreter._output.flush()
+
+        return None
+
+    def _execute(self, ops: list[Op], fuser: Fuser) -> None:
+        """
+        Runs the ops like Interpreter._executeGuarded() from the current
+        instruction, with the fuel left by the last step or continue.
+        """
+        interpreter = self._interpreter
+        guard = interpreter._guard
+        lasts = interpreter._lastInstructions(ops, fuser)
+        pc = self.pc
+        end = len(ops)
+
+        if guard is not None:
+            self._fuel = guard.refuel(self._fuel)
+
+        fuel = self._fuel
+
+        try:
+            while pc < end:
+                target = ops[pc]()
+
+                if target is None:
+                    pc += 1
+                else:
+                    if target <= pc and guard is not None:
+                        fuel -= lasts[pc] + 1 - target
+
+                        if fuel < 0:
+                            fuel = guard.refuel(fuel)
+
+                    pc = target
+        except DebugStop as paused:
+            # Watchpoints stop after their instruction, which may jump back.
+            if paused.pc <= pc and paused.stop.reason == "watchpoint":
+                fuel -= pc + 1 - paused.pc
+
+            raise
+        except PROGRAM_ERRORS + (LimitExceeded,) as exception:
+            interpreter._raiseFrom(pc, exception, fuser)
+        finally:
+            self._fuel = fuel
+
+        self.pc = pc
+        interpreter._lineNum = pc
+
+    def _instrumentedOps(self) -> tuple[list[Op], Fuser]:
+        # Rebuilt whenever the breakpoints or watchpoints change.
+        if self._instrumented is not None:
+            return self._instrumented
+
+        instrumented: dict[int, Op] = {}
+
+        for i, instruction in enumerate(self._program.instructions):
+            slots = self._watchedSlots(instruction)
+
+            if slots:
+                instrumented[i] = self._watching(i, self._ops[i], slots)
+
+            breakpoint = self.breakpoints.get(instruction.lineNum)
+
+            if breakpoint is not None and self._indices[instruction.lineNum] == i:
+                instrumented[i] = self._breaking(
+                    i, instrumented.get(i, self._ops[i]), breakpoint
+                )
+
+        fuser = Fuser(
+            self._interpreter, self._program, self._ops, barriers=instrumented
+        )
+        ops = fuser.fuse()
+
+        for i, op in instrumented.items():
+            ops[i] = op
+
+        self._instrumented = (ops, fuser)
+        return self._instrumented
+
+    def _watching(self, i: int, op: Op, slots: tuple[int, ...]) -> Op:
+        regs = self._interpreter._registers.slots
+
+        def watched() -> int | None:
+            before = [regs[slot] for slot in slots]
+            target = op()
+
+            for slot, old in zip(slots, before):
+                if changed(old, regs[slot]):
+                    raise DebugStop(
+                        i + 1 if target is None else target,
+                        self._watchpointStop(i, slot, old),
+                    )
+
+            return target
+
+        return watched
+
+    def _breaking(self, i: int, op: Op, breakpoint: Breakpoint) -> Op:
+        registers = self._interpreter._registers
+        condition = breakpoint.condition
+
+        def breaking() -> int | None:
+            if condition is None or self._holds(condition, registers):
+                breakpoint.hits += 1
+                raise DebugStop(i, Stop("breakpoint", breakpoint.lineNum))
+
+            return op()
+
+        return breaking
+
+    def _holds(
+        self, condition: Condition, registers: Mapping[str, int | float | str]
+    ) -> bool:
+        try:
+            return bool(condition(registers))
+        except (KeyError,) + PROGRAM_ERRORS:
+            return True
+
+    def _watchpointStop(self, i: int, slot: int, old: int | float | str) -> Stop:
+        new = self._interpreter._registers.slots[slot]
+
+        return Stop(
+            "watchpoint",
+            self._program.instructions[i].lineNum,
+            self._program.registerNames[slot],
+            str(old) if type(old) is Rope else old,
+            str(new) if type(new) is Rope else new,
+        )
+
+    def _watchedSlots(self, instruction: Instruction) -> tuple[int, ...]:
+        if not self.watchpoints:
+            return ()
+
+        names = self._program.registerNames
+        return tuple(
+            slot
+            for slot in writtenSlots(instruction)
+            if names[slot] in self.watchpoints
+        )
+
+
+def changed(old: object, new: object) -> bool:
+    """
+    Returns whether a register write changed the value, including its type.
+    """
+    if new is old:
+        return False
+
+    # Appending turns strings into ropes of the same value.
+    if isString(old) and isString(new):
+        return old != new
+
+    return type(new) is not type(old) or new != old
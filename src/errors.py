@@ -0,0 +1,153 @@
+from dataclasses import dataclass
+import sys
+
+
+# Python errors a program can cause, like division by zero, adding a string
+# to a number or printing an int too long to convert. They are reported as
+# runtime errors of the program.
+PROGRAM_ERRORS = (ArithmeticError, TypeError, ValueError)
+
+
+@dataclass
+class ErrorDetail:
+    """
+    A single error in a program. 'line' is the recreated line and 'tokens'
+    the formatted token list, if the line could be tokenized.
+    """
+
+    lineNum: int
+    message: str
+    line: str | None = None
+    tokens: str | None = None
+
+    def __str__(self) -> str:
+        text = f"Error on line {self.lineNum}:\n - {self.message}"
+
+        if self.line is not None:
+            text += f'\n - LINE: "{self.line}"'
+        if self.tokens is not None:
+            text += f"\n - TOKENS: {self.tokens}"
+
+        return text
+
+
+class CnstrError(Exception):
+    """Base class of the errors of cnstr programs"""
+
+
+class CnstrSyntaxError(CnstrError):
+    """
+    Raised when a program fails to tokenize or compile. Every error found
+    is reported at once, the first one is also available directly.
+    """
+
+    def __init__(self, stage: str, errors: list[ErrorDetail]) -> None:
+        """
+        :param stage: What failed, "tokenizing", "compiling" or "linking"
+        :param errors: The errors, in line order
+        """
+        super().__init__(errors[0].message)
+        self.stage = stage
+        self.errors = errors
+
+    @property
+    def lineNum(self) -> int:
+        return self.errors[0].lineNum
+
+    @property
+    def message(self) -> str:
+        return self.errors[0].message
+
+    @property
+    def line(self) -> str | None:
+        return self.errors[0].line
+
+    @property
+    def tokens(self) -> str | None:
+        return self.errors[0].tokens
+
+    def __str__(self) -> str:
+        return (
+            f"Encountered {len(self.errors)} errors while {self.stage}:\n"
+            + "\n".join(str(error) for error in self.errors)
+        )
+
+
+class CnstrRuntimeError(CnstrError):
+    """
+    Raised when a running program fails. api.run() sets 'output' to what
+    the program wrote before the error.
+    """
+
+    def __init__(
+        self, lineNum: int, message: str, line: str | None, tokens: str | None
+    ) -> None:
+        super().__init__(message)
+        self.detail = ErrorDetail(lineNum, message, line, tokens)
+        self.output = ""
+
+    @property
+    def lineNum(self) -> int:
+        return self.detail.lineNum
+
+    @property
+    def message(self) -> str:
+        return self.detail.message
+
+    @property
+    def line(self) -> str | None:
+        return self.detail.line
+
+    @property
+    def tokens(self) -> str | None:
+        return self.detail.tokens
+
+    def __str__(self) -> str:
+        return str(self.detail)
+
+
+class CnstrLimitError(CnstrRuntimeError):
+    """
+    Raised when a program exceeds one of its limits. 'limit' is which one,
+    "instructions", "time", "output" or "digits".
+    """
+
+    def __init__(
+        self,
+        lineNum: int,
+        message: str,
+        line: str | None,
+        tokens: str | None,
+        limit: str,
+    ) -> None:
+        super().__init__(lineNum, message, line, tokens)
+        self.limit = limit
+
+
+class CnstrSnapshotError(CnstrError):
+    """
+    Raised when a snapshot can't be read, or doesn't belong to the program
+    it should resume.
+    """
+
+
+class CnstrProtocolError(CnstrError):
+    """
+    Raised when a message between the daemon and a client isn't framed or
+    encoded correctly, or the connection closes in the middle of one.
+    """
+
+
+def describe(exception: Exception) -> str:
+    """
+    Returns the message a Python error is reported with.
+    """
+    if isinstance(exception, ValueError) and "integer string conversion" in str(
+        exception
+    ):
+        return (
+            "OverflowError: Number is too large to print, it has more than "
+            f"{sys.get_int_max_str_digits()} digits."
+        )
+
+    return f"{type(exception).__name__}: {exception}"
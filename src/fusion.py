@@ -0,0 +1,415 @@
+from collections import Counter
+from collections.abc import Collection
+from typing import TYPE_CHECKING
+
+from compiler import Opcode, OperandKind, Instruction, Program
+from lowering import MATH_OPERATORS, COMPARE_OPERATORS, Op, mathOperators
+
+if TYPE_CHECKING:
+    from interpreter import Interpreter
+
+
+# Longest run of instructions fused into one superinstruction.
+MAX_LENGTH = 3
+
+JUMP_OPCODES = (Opcode.JMP, Opcode.JMPIF)
+
+
+def isNop(program: Program, instruction: Instruction) -> bool:
+    """
+    Returns whether the instruction has no effect when it runs.
+    """
+    if instruction.opcode == Opcode.NOP:
+        return True
+
+    return (
+        instruction.opcode == Opcode.SETJMPP
+        and instruction.operands[0][1] not in program.duplicateJumpPoints
+    )
+
+
+class PairProfile:
+    """
+    Counts how often each instruction of a program fell through to the next
+    one during a run, i.e. how often each adjacent pair was executed.
+    """
+
+    def __init__(self, program: Program) -> None:
+        self._program = program
+        self.counts = [0] * len(program.instructions)
+
+    def pairs(self) -> Counter[tuple[Opcode, Opcode]]:
+        """
+        Returns the execution counts of adjacent pairs by their opcodes. No-ops
+        in between, like comments, are skipped over.
+        """
+        instructions = self._program.instructions
+        pairs: Counter[tuple[Opcode, Opcode]] = Counter()
+        previous = None
+
+        for i, instruction in enumerate(instructions):
+            if isNop(self._program, instruction):
+                continue
+
+            if previous is not None:
+                # Jumps can land on the no-ops in between.
+                count = min(self.counts[previous:i])
+
+                if count:
+                    pairs[instructions[previous].opcode, instruction.opcode] += count
+
+            # Pairs don't continue across jumps.
+            previous = i if instruction.opcode not in JUMP_OPCODES else None
+
+        return pairs
+
+    def format(self, n: int = 10) -> str:
+        return "\n".join(
+            f"{count:>10}  {a.name.lower()} -> {b.name.lower()}"
+            for (a, b), count in self.pairs().most_common(n)
+        )
+
+
+class Fuser:
+    """
+    Fuses runs of adjacent instructions into superinstructions, so the
+    dispatch loop makes one call where it would make several.
+
+    A run never crosses a jump target and only its last instruction may
+    jump. The fused op replaces the op of the first instruction and
+    continues after the run; the other ops stay in place untouched.
+    Common runs get a dedicated op, the rest are composed from their ops.
+
+    Without a profile every possible run is fused from the start of the
+    program. With one, the most executed pairs are fused first and pairs
+    which never ran are left alone. Barriers are instructions left out of
+    every run, which keep their own op.
+    """
+
+    def __init__(
+        self,
+        interpreter: "Interpreter",
+        program: Program,
+        ops: list[Op],
+        profile: PairProfile | None = None,
+        barriers: Collection[int] = (),
+    ) -> None:
+        self._interpreter = interpreter
+        self._program = program
+        self._ops = ops
+        self._profile = profile
+        self._barriers = barriers
+        self._math = mathOperators(program, interpreter._limits.maxDigits)
+        self.fused = 0
+
+        # Instructions fused into each superinstruction, by its index.
+        self.runs: dict[int, list[int]] = {}
+
+        # The last exception raised before the last instruction of a run, with
+        # the instruction which raised it.
+        self._failure: tuple[BaseException, int] | None = None
+
+    def fuse(self) -> list[Op]:
+        """
+        Returns the ops with superinstructions in place of the fused runs.
+        """
+        instructions = self._program.instructions
+        end = len(instructions)
+        leaders = self._program.jumpTargets()
+        taken = [False] * end
+
+        for barrier in self._barriers:
+            taken[barrier] = True
+        ops = list(self._ops)
+
+        if self._profile is None:
+            starts = range(end)
+        else:
+            counts = self._profile.counts
+            starts = sorted(
+                (i for i in range(end) if counts[i]), key=lambda i: -counts[i]
+            )
+
+        for start in starts:
+            if taken[start]:
+                continue
+
+            # No-ops are fused along, they don't count towards the length.
+            run = [] if isNop(self._program, instructions[start]) else [start]
+            stop = start + 1
+            while (
+                stop < end
+                and stop not in leaders
+                and not taken[stop]
+                and instructions[stop - 1].opcode not in JUMP_OPCODES
+            ):
+                if not isNop(self._program, instructions[stop]):
+                    if len(run) == MAX_LENGTH:
+                        break
+                    run.append(stop)
+                stop += 1
+
+            if stop - start < 2:
+                continue
+
+            ops[start] = self.fuseRun(run, stop)
+            taken[start:stop] = [True] * (stop - start)
+            self.runs[start] = run
+            self.fused += 1
+
+        return ops
+
+    def failingInstruction(self, index: int, exception: BaseException) -> int:
+        """
+        Returns the instruction which raised an exception in the op at the
+        index. Superinstructions record the instruction when one before
+        their last fails, otherwise it is the last one, which is also where
+        the limits are checked after a jump back.
+        """
+        run = self.runs.get(index)
+
+        if not run:
+            return index
+
+        failure = self._failure
+        self._failure = None
+
+        if failure is not None and failure[0] is exception:
+            return failure[1]
+
+        return run[-1]
+
+    def failed(self, exception: BaseException, index: int) -> None:
+        """
+        Records the instruction of a superinstruction which raised.
+        """
+        self._failure = (exception, index)
+
+    def fuseRun(self, run: list[int], stop: int) -> Op:
+        """
+        Returns the superinstruction for the instructions at the indices in
+        run, which continues at stop.
+        """
+        instructions = [self._program.instructions[i] for i in run]
+        opcodes = tuple(instruction.opcode for instruction in instructions)
+
+        if (
+            len(instructions) >= 2
+            and opcodes[-1] == Opcode.JMPIF
+            and self._isPlainJump(instructions[-1])
+        ):
+            return self.fuseBranch(run, stop)
+
+        if opcodes == (Opcode.CPY, Opcode.CPY):
+            return self.fuseCpyCpy(run, stop)
+
+        if (
+            opcodes[:2] == (Opcode.CPY, Opcode.CPY)
+            and opcodes[2] in MATH_OPERATORS
+            and self._registersOnly(instructions[2])
+        ):
+            return self.fuseCpyCpyMath(run, stop)
+
+        return self.compose(run, stop)
+
+    def _isPlainJump(self, instruction: Instruction) -> bool:
+        (_, label) = instruction.operands[0]
+        return (
+            label in self._program.jumpPoints
+            and label not in self._program.duplicateJumpPoints
+        )
+
+    def _registersOnly(self, instruction: Instruction) -> bool:
+        return all(kind == OperandKind.REGISTER for kind, _ in instruction.operands)
+
+    def fuseBranch(self, run: list[int], following: int) -> Op:
+        """
+        Run ending in a conditional jump, with the comparison inlined. A counter
+        increment followed by the loop condition, e.g. 'add ri 1 ri' and
+        'jmpif "loop" ri < rn', becomes a single op.
+        """
+        regs = self._interpreter._registers.slots
+        failed = self.failed
+        first = run[0]
+        *body, jmpif = (self._program.instructions[i] for i in run)
+        (_, label), (_, x), (_, compare), (kindY, y) = jmpif.operands
+        compareFunction = COMPARE_OPERATORS[compare]
+        target = self._program.target(self._program.jumpPoints[label])
+
+        if (
+            len(body) == 1
+            and body[0].opcode in MATH_OPERATORS
+            and body[0].operands[0][0] == OperandKind.REGISTER
+            and body[0].operands[1][0] == OperandKind.CONSTANT
+        ):
+            function = self._math[body[0].opcode]
+            (_, a), (_, b), (_, dest) = body[0].operands
+
+            if kindY == OperandKind.REGISTER:
+
+                def op() -> int:
+                    try:
+                        regs[dest] = function(regs[a], b)
+                    except BaseException as exception:
+                        failed(exception, first)
+                        raise
+                    return target if compareFunction(regs[x], regs[y]) else following
+
+            else:
+
+                def op() -> int:
+                    try:
+                        regs[dest] = function(regs[a], b)
+                    except BaseException as exception:
+                        failed(exception, first)
+                        raise
+                    return target if compareFunction(regs[x], y) else following
+
+            return op
+
+        ops = [self._ops[i] for i in run[:-1]]
+
+        if len(ops) == 1:
+            op1, = ops
+
+            if kindY == OperandKind.REGISTER:
+
+                def op() -> int:
+                    try:
+                        op1()
+                    except BaseException as exception:
+                        failed(exception, first)
+                        raise
+                    return target if compareFunction(regs[x], regs[y]) else following
+
+            else:
+
+                def op() -> int:
+                    try:
+                        op1()
+                    except BaseException as exception:
+                        failed(exception, first)
+                        raise
+                    return target if compareFunction(regs[x], y) else following
+
+        else:
+            op1, op2 = ops
+            second = run[1]
+
+            if kindY == OperandKind.REGISTER:
+
+                def op() -> int:
+                    try:
+                        op1()
+                    except BaseException as exception:
+                        failed(exception, first)
+                        raise
+                    try:
+                        op2()
+                    except BaseException as exception:
+                        failed(exception, second)
+                        raise
+                    return target if compareFunction(regs[x], regs[y]) else following
+
+            else:
+
+                def op() -> int:
+                    try:
+                        op1()
+                    except BaseException as exception:
+                        failed(exception, first)
+                        raise
+                    try:
+                        op2()
+                    except BaseException as exception:
+                        failed(exception, second)
+                        raise
+                    return target if compareFunction(regs[x], y) else following
+
+        return op
+
+    def fuseCpyCpy(self, run: list[int], following: int) -> Op:
+        regs = self._interpreter._registers.slots
+        ((_, source1), (_, dest1)), ((_, source2), (_, dest2)) = (
+            self._program.instructions[i].operands for i in run
+        )
+
+        def op() -> int:
+            regs[dest1] = regs[source1]
+            regs[dest2] = regs[source2]
+            return following
+
+        return op
+
+    def fuseCpyCpyMath(self, run: list[int], following: int) -> Op:
+        """
+        Register shuffle, e.g. 'cpy ra rt', 'cpy rb ra', 'add rb rt rb'.
+        """
+        regs = self._interpreter._registers.slots
+        cpy1, cpy2, math = (self._program.instructions[i] for i in run)
+        (_, source1), (_, dest1) = cpy1.operands
+        (_, source2), (_, dest2) = cpy2.operands
+        function = self._math[math.opcode]
+        (_, a), (_, b), (_, dest) = math.operands
+
+        def op() -> int:
+            regs[dest1] = regs[source1]
+            regs[dest2] = regs[source2]
+            regs[dest] = function(regs[a], regs[b])
+            return following
+
+        return op
+
+    def compose(self, run: list[int], following: int) -> Op:
+        """
+        Fuses a run by calling the ops of its instructions one after another.
+        Exceptions before the last op record the instruction which raised,
+        the try blocks cost nothing until one does.
+        """
+        failed = self.failed
+        ops = [self._ops[i] for i in run]
+
+        if not ops:
+
+            def op() -> int:
+                return following
+
+        elif len(ops) == 1:
+            op1, = ops
+
+            def op() -> int:
+                target = op1()
+                return following if target is None else target
+
+        elif len(ops) == 2:
+            op1, op2 = ops
+            first = run[0]
+
+            def op() -> int:
+                try:
+                    op1()
+                except BaseException as exception:
+                    failed(exception, first)
+                    raise
+                target = op2()
+                return following if target is None else target
+
+        else:
+            op1, op2, op3 = ops
+            first, second = run[:2]
+
+            def op() -> int:
+                try:
+                    op1()
+                except BaseException as exception:
+                    failed(exception, first)
+                    raise
+                try:
+                    op2()
+                except BaseException as exception:
+                    failed(exception, second)
+                    raise
+                target = op3()
+                return following if target is None else target
+
+        return op
@@ -0,0 +1,233 @@
+from dataclasses import dataclass, field, replace
+import time
+
+from common import Token
+from compiler import (
+    Compiler,
+    Instruction,
+    Opcode,
+    OperandKind,
+    Program,
+    undefinedJumps,
+)
+from errors import ErrorDetail, CnstrSyntaxError
+from lexer import Lexer
+
+
+@dataclass
+class CachedLine:
+    """
+    A line lexed and compiled on its own. The instruction uses the line's
+    own register slots, in the order of 'registerNames', and line 0.
+    """
+
+    tokens: list[Token]
+    lexErrors: list[str]
+    instruction: Instruction | None = None
+    compileErrors: list[ErrorDetail] = field(default_factory=list)
+    registerNames: list[str] = field(default_factory=list)
+    jumpPoint: str | None = None
+    jump: str | None = None
+
+
+@dataclass
+class CompileStats:
+    """Work done by the last incremental compile, times in seconds"""
+
+    lines: int = 0
+    relexed: int = 0
+    reused: int = 0
+    lexTime: float = 0.0
+    compileTime: float = 0.0
+    linkTime: float = 0.0
+    changedJumpPoints: list[str] = field(default_factory=list)
+
+    @property
+    def totalTime(self) -> float:
+        return self.lexTime + self.compileTime + self.linkTime
+
+    def format(self) -> str:
+        text = (
+            f"compiled {self.lines} lines ({self.relexed} re-lexed, "
+            f"{self.reused} cached) in {self.totalTime * 1e3:.2f} ms: "
+            f"lex {self.lexTime * 1e3:.2f} ms, "
+            f"compile {self.compileTime * 1e3:.2f} ms, "
+            f"link {self.linkTime * 1e3:.2f} ms"
+        )
+
+        if self.changedJumpPoints:
+            text += f"\nchanged jump points: {', '.join(self.changedJumpPoints)}"
+
+        return text
+
+
+class IncrementalCompiler:
+    """
+    Compiles successive versions of a program, re-lexing and recompiling
+    only the lines whose text changed. Every line is cached by its content
+    with its tokens and instruction, the register slots, jump table and
+    line numbers are assembled from the cache on each compile, so moved
+    lines and moved or renamed jump points need no recompiling. The result
+    is the same program a Compiler produces from the whole source.
+    """
+
+    def __init__(self, legacyFloats: bool = False) -> None:
+        self._legacyFloats = legacyFloats
+        self._lexer = Lexer("", legacyFloats)
+        self._cache: dict[str, CachedLine] = {}
+        self._jumpPoints: dict[str, int] = {}
+        self.stats = CompileStats()
+
+    def compile(self, source: str) -> Program:
+        """
+        Compiles the source and returns the program. Raises
+        CnstrSyntaxError like lexing and compiling the whole source would,
+        the cache keeps the lines which did compile.
+        """
+        stats = CompileStats()
+        cache: dict[str, CachedLine] = {}
+        entries: list[CachedLine] = []
+
+        for line in splitLines(source):
+            entry = cache.get(line) or self._cache.get(line)
+
+            if entry is None:
+                entry = self._lexLine(line, stats)
+                stats.relexed += 1
+            else:
+                stats.reused += 1
+
+            cache[line] = entry
+            entries.append(entry)
+
+        # Only the lines of the latest version are kept.
+        self._cache = cache
+        stats.lines = len(entries)
+        self.stats = stats
+
+        lexErrors = [
+            ErrorDetail(i, message)
+            for i, entry in enumerate(entries)
+            for message in entry.lexErrors
+        ]
+
+        if lexErrors:
+            raise CnstrSyntaxError("tokenizing", lexErrors)
+
+        start = time.perf_counter()
+
+        for entry in entries:
+            if entry.instruction is None and not entry.compileErrors:
+                self._compileLine(entry)
+
+        stats.compileTime = time.perf_counter() - start
+
+        compileErrors = [
+            replace(error, lineNum=i)
+            for i, entry in enumerate(entries)
+            for error in entry.compileErrors
+        ]
+
+        if compileErrors:
+            raise CnstrSyntaxError("compiling", compileErrors)
+
+        start = time.perf_counter()
+
+        try:
+            return self._link(entries)
+        finally:
+            stats.linkTime = time.perf_counter() - start
+
+    def _lexLine(self, line: str, stats: CompileStats) -> CachedLine:
+        start = time.perf_counter()
+        tokens, errors = self._lexer.lexLine(line)
+        stats.lexTime += time.perf_counter() - start
+
+        return CachedLine(tokens, errors)
+
+    def _compileLine(self, entry: CachedLine) -> None:
+        compiler = Compiler(
+            [entry.tokens], keepLines=False, legacyFloats=self._legacyFloats, link=False
+        )
+
+        try:
+            program = compiler.compile()
+        except CnstrSyntaxError as error:
+            entry.compileErrors = error.errors
+            return
+
+        instruction = program.instructions[0]
+        entry.instruction = instruction
+        entry.registerNames = program.registerNames
+
+        if instruction.opcode == Opcode.SETJMPP:
+            entry.jumpPoint = instruction.operands[0][1]
+        elif instruction.opcode in (Opcode.JMP, Opcode.JMPIF):
+            entry.jump = instruction.operands[0][1]
+
+    def _link(self, entries: list[CachedLine]) -> Program:
+        """
+        Assembles the cached lines into a program: gives registers their
+        slots in the order of first use, numbers the instructions and
+        rebuilds the jump table.
+        """
+        instructions: list[Instruction] = []
+        registerSlots: dict[str, int] = {}
+        jumpPoints: dict[str, int] = {"start": 0}
+        definedJumpPoints: set[str] = set()
+        duplicateJumpPoints: set[str] = set()
+        jumps = []
+
+        for i, entry in enumerate(entries):
+            template = entry.instruction
+            slots = [
+                registerSlots.setdefault(name, len(registerSlots))
+                for name in entry.registerNames
+            ]
+            operands = tuple(
+                (kind, slots[value]) if kind == OperandKind.REGISTER else (kind, value)
+                for kind, value in template.operands
+            )
+            instructions.append(Instruction(template.opcode, operands, i))
+
+            label = entry.jumpPoint
+            if label is not None:
+                if label in definedJumpPoints:
+                    duplicateJumpPoints.add(label)
+
+                definedJumpPoints.add(label)
+                jumpPoints[label] = i
+
+            if entry.jump is not None:
+                jumps.append((entry.jump, i, entry.tokens))
+
+        errors = undefinedJumps(jumps, jumpPoints)
+
+        if errors:
+            raise CnstrSyntaxError("linking", errors)
+
+        # Jump points which moved, or were added or removed by a rename.
+        if self._jumpPoints:
+            self.stats.changedJumpPoints = sorted(
+                label
+                for label in jumpPoints.keys() | self._jumpPoints.keys()
+                if jumpPoints.get(label) != self._jumpPoints.get(label)
+            )
+
+        self._jumpPoints = jumpPoints
+
+        return Program(
+            instructions,
+            jumpPoints,
+            duplicateJumpPoints,
+            list(registerSlots),
+            [entry.tokens for entry in entries],
+            legacyFloats=self._legacyFloats,
+        )
+
+
+def splitLines(source: str) -> list[str]:
+    """
+    Splits a source into lines the way the lexer reads them.
+    """
+    return source.splitlines()
@@ -1,16 +1,690 @@
-from common import TokenType, TokenValue, Token, COMMAND_MAP, COMPARE_MAP
+from collections.abc import Callable, Iterator, Mapping, MutableMapping
+import asyncio
+import operator
+import time
+
+from common import (
+    TokenType,
+    TokenValue,
+    Token,
+    COMMAND_MAP,
+    COMPARE_MAP,
+    formatTokenList,
+    recreateLine,
+)
+from compiler import Compiler, Program
+from lowering import Lowerer, Op, COMPARE_OPERATORS
+from fusion import Fuser, PairProfile
+from profiler import LineProfile
+from transpiler import Transpiler
+from output import OutputSink, BufferedSink
+from errors import (
+    ErrorDetail,
+    CnstrSyntaxError,
+    CnstrRuntimeError,
+    CnstrLimitError,
+    CnstrSnapshotError,
+    PROGRAM_ERRORS,
+    describe,
+)
+from limits import (
+    Limits,
+    LimitExceeded,
+    LimitGuard,
+    LimitedSink,
+    boundedMultiply,
+    boundedPower,
+)
+from snapshot import Snapshot, Checkpoints
+from typeinference import TypeInference, ProgramTypes, worthInferring
+from debugger import Debugger
+from bytecode import programHash
+from numerics import zero, divide, isIndex, indexLiteral
+from rope import Rope, isString, concat
+
+
+# Instructions an async run executes before it lets other tasks run.
+SLICE_SIZE = 10_000
+
+
+class Registers(dict):
+    """Register file which creates registers as zero when they are first read"""
+
+    def __init__(self, zero: int | float = 0) -> None:
+        super().__init__()
+        self._zero = zero
+
+    def __missing__(self, register: str) -> int | float:
+        self[register] = self._zero
+        return self._zero
+
+
+class RegisterFile(MutableMapping):
+    """
+    Slot-indexed register file of a compiled program. The values live in a
+    preallocated list, this mapping is only a name to value view over it.
+    """
+
+    def __init__(self, names: list[str], zero: int | float = 0) -> None:
+        self._names = list(names)
+        self._slotOf = {name: slot for slot, name in enumerate(self._names)}
+        self.slots: list[int | float | str] = [zero] * len(self._names)
+
+    def slotOf(self, register: str) -> int:
+        return self._slotOf[register]
+
+    def __getitem__(self, register: str) -> float | str:
+        return self.slots[self._slotOf[register]]
+
+    def __setitem__(self, register: str, value: float | str) -> None:
+        if register not in self._slotOf:
+            self._slotOf[register] = len(self._names)
+            self._names.append(register)
+            self.slots.append(value)
+            return
+
+        self.slots[self._slotOf[register]] = value
+
+    def __delitem__(self, register: str) -> None:
+        raise TypeError("Registers can't be deleted.")
+
+    def __contains__(self, register: object) -> bool:
+        return register in self._slotOf
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __repr__(self) -> str:
+        return repr(dict(zip(self._names, self.slots)))
 
 
 class Interpreter:
-    def __init__(self, tokens: list[Token]) -> None:
+    def __init__(
+        self,
+        tokens: list[Token],
+        output: OutputSink | None = None,
+        legacyFloats: bool = False,
+        inputs: Mapping[str, int | float | str] | None = None,
+        limits: Limits | None = None,
+    ) -> None:
+        """
+        :param tokens: The tokens of the program
+        :param output: Where the 'stdout' command writes to
+        :param legacyFloats: Whether to use the original semantics, where
+            every number is a float. The tokens must be lexed the same way.
+        :param inputs: Initial values of registers, the others start at zero
+        :param limits: Bounds on the instructions, time and output of runs
+        """
         self._tokens = tokens
+        self._legacyFloats = legacyFloats
+        self._zero = zero(legacyFloats)
+        self._divide = operator.truediv if legacyFloats else divide
+        self._output = output if output is not None else BufferedSink()
+        self._limits = limits if limits is not None else Limits()
+        self._guard: LimitGuard | None = None
+
+        self._multiply = operator.mul
+        self._power = operator.pow
+
+        if self._limits.maxDigits is not None:
+            self._multiply = boundedMultiply(self._limits.maxDigits)
+            self._power = boundedPower(self._limits.maxDigits)
+
+        if self._limits.maxOutputBytes is not None:
+            self._output = LimitedSink(self._output, self._limits.maxOutputBytes)
         self._lineNum = 0
         self._currentLine: list[Token] = []
+        self._program: Program | None = None
+        self._lowerer: Lowerer | None = None
+
+        self._inputs = dict(inputs) if inputs is not None else {}
 
-        self._registers: dict[str, float | str] = {}
+        self._registers: dict[str, int | float | str] = Registers(self._zero)
+        self._registers.update(self._inputs)
         self._jumpPoints: dict[str:int] = {"start": 0}
 
     def interpret(self) -> None:
+        """
+        Interprets the tokens line by line. This is the reference mode, which
+        re-validates every line each time it is executed.
+        """
+        lines = self._splitLines()
+        guard = self._newGuard()
+        fuel = guard.refuel(0) if guard is not None else 0
+        lineNum = 0
+
+        self._link(lines)
+
+        try:
+            while self._lineNum < len(lines):
+                lineNum = self._lineNum
+                self._currentLine = lines[lineNum]
+
+                self.interpretLine(self._currentLine)
+
+                if self._lineNum < lineNum and guard is not None:
+                    fuel -= lineNum - self._lineNum
+
+                    if fuel < 0:
+                        fuel = guard.refuel(fuel)
+
+                self._lineNum += 1
+        except PROGRAM_ERRORS as exception:
+            self.raiseError(describe(exception))
+        except LimitExceeded as exceeded:
+            # A jump back has already moved to its target.
+            self._lineNum = lineNum
+            self.raiseError(str(exceeded), exceeded.limit)
+        finally:
+            self._output.flush()
+
+    def compile(self) -> Program:
+        """
+        Validates every line once and compiles the tokens into a program.
+        """
+        return Compiler(
+            self._splitLines(), legacyFloats=self._legacyFloats
+        ).compile()
+
+    def run(
+        self,
+        program: Program | None = None,
+        fuse: bool = True,
+        profile: PairProfile | None = None,
+        resume: Snapshot | None = None,
+        checkpoints: Checkpoints | None = None,
+    ) -> None:
+        """
+        Runs a compiled program, compiling the tokens first if none is given.
+        Produces the same output and registers as interpret().
+
+        Adjacent instructions are fused into superinstructions unless fuse is
+        False. A profile from profilePairs() limits fusing to the pairs that
+        ran, most executed first.
+
+        A snapshot of the program continues its run from where it was taken,
+        and checkpoints take snapshots while running.
+        """
+        ops = self._lower(program, resumed=resume is not None)
+        fuser = None
+        pc = 0
+
+        if fuse:
+            fuser = Fuser(self, self._program, ops, profile)
+            ops = fuser.fuse()
+
+        if resume is not None:
+            pc = self._restore(resume, ops)
+
+        try:
+            if checkpoints is not None:
+                self._executeCheckpointed(ops, fuser, pc, checkpoints)
+            elif self._guard is not None:
+                self._executeGuarded(ops, fuser, pc)
+            else:
+                self._execute(ops, fuser, pc)
+        finally:
+            self._output.flush()
+
+    def debug(self, program: Program | None = None) -> Debugger:
+        """
+        Returns a debugger for a compiled program, compiling the tokens first
+        if none is given. The program runs as the debugger steps and
+        continues it, runs without a debugger aren't instrumented at all.
+        """
+        return Debugger(self, program)
+
+    def snapshot(self, pc: int | None = None) -> Snapshot:
+        """
+        Returns a snapshot of the compiled program's run, which continues at
+        the instruction pc, by default where the run stopped.
+        """
+        return self._snapshot(
+            self._lineNum if pc is None else pc, programHash(self._program)
+        )
+
+    def _snapshot(self, pc: int, hash: str) -> Snapshot:
+        return Snapshot(
+            hash,
+            pc,
+            {
+                register: str(value) if type(value) is Rope else value
+                for register, value in self._registers.items()
+            },
+            dict(self._jumpPoints),
+            self._output.pending(),
+        )
+
+    def runTranspiled(self, program: Program | None = None) -> None:
+        """
+        Runs a compiled program by transpiling it into a Python function
+        first (the pyexec backend). Produces the same output and registers
+        as interpret().
+        """
+        transpiler = self._transpile(program)
+        function = transpiler.compile()
+
+        try:
+            function(
+                self._registers.slots,
+                self._jumpPoints,
+                self._output.write,
+                self.raiseErrorAt,
+            )
+        except PROGRAM_ERRORS + (LimitExceeded,) as exception:
+            self._raiseTranspiled(transpiler, exception)
+        finally:
+            self._output.flush()
+
+        self._lineNum = len(self._program.instructions)
+
+    async def runAsync(
+        self,
+        program: Program | None = None,
+        sliceSize: int = SLICE_SIZE,
+        fuse: bool = True,
+    ) -> None:
+        """
+        Runs a compiled program like run(), as a coroutine which lets other
+        tasks run after every slice of about sliceSize instructions. Slices
+        end on jumps back, so straight code runs to its next jump back.
+        Output written to an AsyncSink is drained between slices.
+        """
+        ops = self._lower(program)
+        fuser = None
+
+        if fuse:
+            fuser = Fuser(self, self._program, ops)
+            ops = fuser.fuse()
+
+        try:
+            await self._executeAsync(ops, fuser, sliceSize)
+        finally:
+            self._output.flush()
+
+        await self._output.drain()
+
+    async def runTranspiledAsync(
+        self, program: Program | None = None, sliceSize: int = SLICE_SIZE
+    ) -> None:
+        """
+        Runs a compiled program like runTranspiled(), transpiled into a
+        coroutine which pauses like runAsync().
+        """
+        transpiler = self._transpile(program, sliceSize)
+        function = transpiler.compile()
+
+        try:
+            await function(
+                self._registers.slots,
+                self._jumpPoints,
+                self._output.write,
+                self.raiseErrorAt,
+            )
+        except PROGRAM_ERRORS + (LimitExceeded,) as exception:
+            self._raiseTranspiled(transpiler, exception)
+        finally:
+            self._output.flush()
+
+        await self._output.drain()
+        self._lineNum = len(self._program.instructions)
+
+    def profilePairs(
+        self, program: Program | None = None, profile: PairProfile | None = None
+    ) -> PairProfile:
+        """
+        Runs a compiled program without superinstructions, counting how often
+        each pair of adjacent instructions is executed. Counts go into the
+        given profile if there is one, so they are kept if the run stops with
+        an error.
+        """
+        ops = self._lower(program)
+
+        if profile is None:
+            profile = PairProfile(self._program)
+
+        try:
+            self._executeProfiled(ops, profile.counts)
+        finally:
+            self._output.flush()
+
+        return profile
+
+    def profileLines(
+        self, program: Program | None = None, profile: LineProfile | None = None
+    ) -> LineProfile:
+        """
+        Runs a compiled program without superinstructions, counting how often
+        each instruction is executed, the time it takes and the trips around
+        each loop. Counts go into the given profile if there is one, so they
+        are kept if the run stops with an error.
+
+        The timing is done by a dispatch loop of its own, so runs without a
+        profile don't pay for it.
+        """
+        ops = self._lower(program)
+
+        if profile is None:
+            profile = LineProfile(self._program)
+
+        try:
+            self._executeTimed(ops, profile)
+        finally:
+            self._output.flush()
+
+        return profile
+
+    def _lower(self, program: Program | None, resumed: bool = False) -> list[Op]:
+        if program is None:
+            program = self.compile()
+
+        self._program = program
+        self._registers = self._registerFile(program)
+        self._jumpPoints = dict(program.jumpPoints)
+        self._guard = self._newGuard()
+
+        self._lowerer = Lowerer(self, program, self._inferTypes(program, resumed))
+        return self._lowerer.lower()
+
+    def _transpile(
+        self, program: Program | None, sliceSize: int | None = None
+    ) -> Transpiler:
+        if program is None:
+            program = self.compile()
+
+        self._program = program
+        self._registers = self._registerFile(program)
+        self._jumpPoints = dict(program.jumpPoints)
+        self._guard = self._newGuard()
+
+        types = self._inferTypes(program)
+
+        if sliceSize is not None:
+            return Transpiler(
+                program,
+                self._sliceRefuel(sliceSize),
+                self._pause,
+                types,
+                self._limits.maxDigits,
+            )
+
+        refuel = self._guard.refuel if self._guard is not None else None
+        return Transpiler(
+            program, refuel, types=types, maxDigits=self._limits.maxDigits
+        )
+
+    def _inferTypes(
+        self, program: Program, resumed: bool = False
+    ) -> ProgramTypes | None:
+        if not worthInferring(program):
+            return None
+
+        # A resumed run starts with registers of any type.
+        return TypeInference(program, None if resumed else self._inputs).infer()
+
+    def _raiseTranspiled(self, transpiler: Transpiler, exception: Exception) -> None:
+        lineNum = transpiler.lineNumOf(exception)
+
+        if isinstance(exception, LimitExceeded):
+            self.raiseErrorAt(lineNum, str(exception), exception.limit)
+
+        self.raiseErrorAt(lineNum, describe(exception))
+
+    def _sliceRefuel(self, sliceSize: int) -> Callable[[int], int]:
+        # Async runs refuel a slice at a time, checking the limits if any.
+        guard = self._guard
+
+        if guard is None:
+            return lambda fuel: sliceSize
+
+        return lambda fuel: guard.refuel(fuel, sliceSize)
+
+    async def _pause(self) -> None:
+        await self._output.drain()
+        await asyncio.sleep(0)
+
+    def _newGuard(self) -> LimitGuard | None:
+        # The time limit starts with the run.
+        if not self._limits.guardsBackEdges():
+            return None
+
+        return LimitGuard(self._limits)
+
+    def _registerFile(self, program: Program) -> RegisterFile:
+        registers = RegisterFile(program.registerNames, zero(program.legacyFloats))
+
+        for register, value in self._inputs.items():
+            registers[register] = value
+
+        return registers
+
+    def _execute(self, ops: list[Op], fuser: Fuser | None = None, pc: int = 0) -> None:
+        end = len(ops)
+
+        try:
+            while pc < end:
+                target = ops[pc]()
+
+                if target is None:
+                    pc += 1
+                else:
+                    pc = target
+        except PROGRAM_ERRORS + (LimitExceeded,) as exception:
+            self._raiseFrom(pc, exception, fuser)
+
+        self._lineNum = pc
+
+    def _executeGuarded(
+        self, ops: list[Op], fuser: Fuser | None = None, pc: int = 0
+    ) -> None:
+        """
+        Runs the ops like _execute(), checking the limits on back-edges.
+        """
+        guard = self._guard
+        fuel = guard.refuel(0)
+        lasts = self._lastInstructions(ops, fuser)
+        end = len(ops)
+
+        try:
+            while pc < end:
+                target = ops[pc]()
+
+                if target is None:
+                    pc += 1
+                else:
+                    if target <= pc:
+                        fuel -= lasts[pc] + 1 - target
+
+                        if fuel < 0:
+                            fuel = guard.refuel(fuel)
+
+                    pc = target
+        except PROGRAM_ERRORS + (LimitExceeded,) as exception:
+            self._raiseFrom(pc, exception, fuser)
+
+        self._lineNum = pc
+
+    async def _executeAsync(
+        self, ops: list[Op], fuser: Fuser | None, sliceSize: int
+    ) -> None:
+        """
+        Runs the ops like _executeGuarded(), with fuel for a slice at most,
+        and pauses whenever it runs out.
+        """
+        refuel = self._sliceRefuel(sliceSize)
+        fuel = refuel(0)
+        lasts = self._lastInstructions(ops, fuser)
+        pc = 0
+        end = len(ops)
+
+        try:
+            while pc < end:
+                target = ops[pc]()
+
+                if target is None:
+                    pc += 1
+                else:
+                    if target <= pc:
+                        fuel -= lasts[pc] + 1 - target
+
+                        if fuel < 0:
+                            fuel = refuel(fuel)
+                            await self._pause()
+
+                    pc = target
+        except PROGRAM_ERRORS + (LimitExceeded,) as exception:
+            self._raiseFrom(pc, exception, fuser)
+
+        self._lineNum = pc
+
+    def _executeCheckpointed(
+        self, ops: list[Op], fuser: Fuser | None, pc: int, checkpoints: Checkpoints
+    ) -> None:
+        """
+        Runs the ops like _executeGuarded(), with fuel for a checkpoint at
+        most, and takes a snapshot at the jump target whenever it runs out.
+        """
+        refuel = self._sliceRefuel(checkpoints.every)
+        fuel = refuel(0)
+        lasts = self._lastInstructions(ops, fuser)
+        hash = programHash(self._program)
+        end = len(ops)
+
+        try:
+            while pc < end:
+                target = ops[pc]()
+
+                if target is None:
+                    pc += 1
+                else:
+                    if target <= pc:
+                        fuel -= lasts[pc] + 1 - target
+
+                        if fuel < 0:
+                            fuel = refuel(fuel)
+                            self._output.flush()
+
+                            checkpoints.save(self._snapshot(target, hash))
+
+                    pc = target
+        except PROGRAM_ERRORS + (LimitExceeded,) as exception:
+            self._raiseFrom(pc, exception, fuser)
+
+        self._lineNum = pc
+
+    def _restore(self, snapshot: Snapshot, ops: list[Op]) -> int:
+        """
+        Restores the state of a snapshot and returns the op to continue at.
+        """
+        if snapshot.programHash != programHash(self._program):
+            raise CnstrSnapshotError("Snapshot was taken of a different program.")
+
+        # The ops inside a superinstruction stay in place, so any is fine.
+        if not 0 <= snapshot.pc <= len(ops):
+            raise CnstrSnapshotError(f"Snapshot has an invalid position {snapshot.pc}.")
+
+        for register, value in snapshot.registers.items():
+            self._registers[register] = value
+
+        # The lowered ops hold on to the jump points.
+        self._jumpPoints.clear()
+        self._jumpPoints.update(snapshot.jumpPoints)
+        self._lowerer.restoreJumpPoints()
+        self._output.write(snapshot.output)
+
+        return snapshot.pc
+
+    def _lastInstructions(self, ops: list[Op], fuser: Fuser | None) -> list[int]:
+        # The last instruction of each op, where its jumps are taken from.
+        lasts = list(range(len(ops)))
+
+        if fuser is not None:
+            for start, run in fuser.runs.items():
+                lasts[start] = run[-1] if run else start
+
+        return lasts
+
+    def _executeProfiled(self, ops: list[Op], counts: list[int]) -> None:
+        guard = self._guard
+        fuel = guard.refuel(0) if guard is not None else 0
+        pc = 0
+        end = len(ops)
+
+        try:
+            while pc < end:
+                target = ops[pc]()
+
+                if target is None:
+                    counts[pc] += 1
+                    pc += 1
+                else:
+                    if target <= pc and guard is not None:
+                        fuel -= pc + 1 - target
+
+                        if fuel < 0:
+                            fuel = guard.refuel(fuel)
+
+                    pc = target
+        except PROGRAM_ERRORS + (LimitExceeded,) as exception:
+            self._raiseFrom(pc, exception)
+
+        self._lineNum = pc
+
+    def _executeTimed(self, ops: list[Op], profile: LineProfile) -> None:
+        counts = profile.counts
+        times = profile.times
+        trips = profile.trips
+        clock = time.perf_counter_ns
+        guard = self._guard
+        fuel = guard.refuel(0) if guard is not None else 0
+        pc = 0
+        end = len(ops)
+
+        try:
+            while pc < end:
+                start = clock()
+                target = ops[pc]()
+                times[pc] += clock() - start
+                counts[pc] += 1
+
+                if target is None:
+                    pc += 1
+                else:
+                    if target <= pc:
+                        trips[pc, target] += 1
+
+                        if guard is not None:
+                            fuel -= pc + 1 - target
+
+                            if fuel < 0:
+                                fuel = guard.refuel(fuel)
+
+                    pc = target
+        except PROGRAM_ERRORS + (LimitExceeded,) as exception:
+            self._raiseFrom(pc, exception)
+
+        self._lineNum = pc
+
+    def _raiseFrom(
+        self, pc: int, exception: Exception, fuser: Fuser | None = None
+    ) -> None:
+        """
+        Raises the error for an exception in the op at pc.
+        """
+        if fuser is not None:
+            pc = fuser.failingInstruction(pc, exception)
+
+        lineNum = self._program.instructions[pc].lineNum
+
+        if isinstance(exception, LimitExceeded):
+            self.raiseErrorAt(lineNum, str(exception), exception.limit)
+
+        self.raiseErrorAt(lineNum, describe(exception))
+
+    def _splitLines(self) -> list[list[Token]]:
         lines: list[list[Token]] = []
         currentLine: list[Token] = []
 
@@ -21,42 +695,41 @@ class Interpreter:
             else:
                 currentLine.append(token)
 
-        self._presetJumpPoints(lines)
-
-        while self._lineNum < len(lines):
-            self._currentLine = lines[self._lineNum]
-
-            self.interpretLine(self._currentLine)
-
-            self._lineNum += 1
+        return lines
 
     def _formatTokenList(self, tokens: list[Token]) -> str:
-        string = ""
-        for token in tokens:
-            string += token.tokenType.name
-            if token.tokenValue is not None:
-                string += f"<{token.tokenValue.name.removeprefix(token.tokenType.name + '_')}>"
-            string += " "
-        return string.rstrip()
+        return formatTokenList(tokens)
 
     def _recreateLine(self, tokens: list[Token]) -> str:
-        string = ""
-        for token in tokens:
-            if token.tokenType == TokenType.ENDLINE:
-                string += "\n"
-                continue
+        return recreateLine(tokens)
 
-            if token.tokenType == TokenType.LITERAL:
-                if token.tokenValue == TokenValue.LITERAL_STRING:
-                    string += f"'{token.value}'"
-                else:
-                    string += str(token.value)
-            else:
-                string += token.value
+    def _link(self, lines: list[list[Token]]) -> None:
+        """
+        Presets the jump points and reports jumps to undefined ones, like the
+        compiler does, before any line runs.
+        """
+        self._presetJumpPoints(lines)
+        jumps = (TokenValue.COMMAND_JMP, TokenValue.COMMAND_JMPIF)
+        errors = []
 
-            string += " "
+        for i, line in enumerate(lines):
+            if (
+                len(line) > 1
+                and line[0].tokenValue in jumps
+                and line[1].tokenValue == TokenValue.LITERAL_STRING
+                and line[1].value not in self._jumpPoints
+            ):
+                errors.append(
+                    ErrorDetail(
+                        i,
+                        f"Jump point '{line[1].value}' does not exist.",
+                        self._recreateLine(line),
+                        self._formatTokenList(line),
+                    )
+                )
 
-        return string.rstrip()
+        if errors:
+            raise CnstrSyntaxError("linking", errors)
 
     def _presetJumpPoints(self, lines: list[list[Token]]) -> None:
         for i, line in enumerate(lines):
@@ -135,7 +808,7 @@ class Interpreter:
         command, register1, register2 = line
 
         self._registers[register2.value] = self.getRegister(register1.value)
-        self._registers[register1.value] = 0.0
+        self._registers[register1.value] = self._zero
 
     def interpretSet(self, line: list[Token]) -> None:
         result = self._expectTypes(
@@ -150,7 +823,7 @@ class Interpreter:
         command, register, literal = line
 
         if literal.tokenValue == TokenValue.LITERAL_NUMBER:
-            self._registers[register.value] = float(literal.value)
+            self._registers[register.value] = literal.value
         elif literal.tokenValue == TokenValue.LITERAL_STRING:
             self._registers[register.value] = literal.value
         else:
@@ -217,43 +890,42 @@ class Interpreter:
         elif operation == TokenValue.COMMAND_SUB:
             self.setRegister(register3.value, valueA - valueB)
         elif operation == TokenValue.COMMAND_MUL:
-            self.setRegister(register3.value, valueA * valueB)
+            self.setRegister(register3.value, self._multiply(valueA, valueB))
         elif operation == TokenValue.COMMAND_DIV:
-            self.setRegister(register3.value, valueA / valueB)
+            self.setRegister(register3.value, self._divide(valueA, valueB))
         elif operation == TokenValue.COMMAND_MOD:
             self.setRegister(register3.value, valueA % valueB)
         elif operation == TokenValue.COMMAND_POW:
-            self.setRegister(register3.value, valueA**valueB)
+            self.setRegister(register3.value, self._power(valueA, valueB))
         else:
             raise NotImplementedError("Invalid operation.")
 
     def interpretStdout(self, line: list[Token]) -> None:
         # Don't expect any arguments, just print everything in the line
         if len(line) == 1:
-            print()
+            self._output.write("\n")
             return
 
-        string = ""
+        pieces: list[str] = []
         for token in line[1:]:
             if token.tokenType == TokenType.REGISTER:
-                string += str(self.getRegister(token.value))
+                pieces.append(str(self.getRegister(token.value)))
             elif token.tokenType == TokenType.LITERAL:
-                string += str(token.value)
+                pieces.append(str(token.value))
             elif token.tokenType == TokenType.COMMAND:
                 if token.tokenValue == TokenValue.COMMAND_ENDL:
-                    string += "\n"
+                    pieces.append("\n")
                 elif token.tokenValue == TokenValue.COMMAND_SPACE:
-                    print("hisisidhisd")
-                    string += " "
+                    pieces.append(" ")
                 else:
-                    string += token.value
+                    pieces.append(token.value)
 
             elif token.tokenType == TokenType.COMPARE:
-                string += token.value
+                pieces.append(token.value)
             else:
                 raise NotImplementedError("Invalid token type.")
 
-        print(string, end="")
+        self._output.write("".join(pieces))
 
     def interpretSetJumpPoint(self, line: list[Token]) -> None:
         result = self._expectTypes(line, [TokenType.COMMAND, TokenType.LITERAL])
@@ -308,9 +980,7 @@ class Interpreter:
                 f"Invalid command usage for 'jmp'. Expected literal string, got '{literal.tokenValue}'"
             )
 
-        if literal.value not in self._jumpPoints.keys():
-            self.raiseError(f"Jump point '{literal.value}' does not exist.")
-
+        # Jump points were checked by _link() and are never removed.
         self._lineNum = self._jumpPoints[literal.value]
 
     def interpretJmpIf(self, line: list[Token]) -> None:
@@ -338,7 +1008,7 @@ class Interpreter:
             arg2Value = self.getRegister(arg2.value)
         elif arg2.tokenType == TokenType.LITERAL:
             if arg2.tokenValue == TokenValue.LITERAL_NUMBER:
-                arg2Value = float(arg2.value)
+                arg2Value = arg2.value
             else:
                 self.raiseError(
                     f"Invalid command usage for 'jmpif'. Expected literal number, got '{arg2.tokenValue}'."
@@ -351,29 +1021,8 @@ class Interpreter:
                 f"Invalid command usage for 'jmpif'. Expected literal string, got '{jumpPoint.tokenValue}'"
             )
 
-        if jumpPoint.value not in self._jumpPoints.keys():
-            self.raiseError(f"Jump point '{jumpPoint.value}' does not exist.")
-
-        if compare.tokenValue == TokenValue.COMPARE_EQ:
-            if arg1Value == arg2Value:
-                self._lineNum = self._jumpPoints[jumpPoint.value]
-        elif compare.tokenValue == TokenValue.COMPARE_NEQ:
-            if arg1Value != arg2Value:
-                self._lineNum = self._jumpPoints[jumpPoint.value]
-        elif compare.tokenValue == TokenValue.COMPARE_GT:
-            if arg1Value > arg2Value:
-                self._lineNum = self._jumpPoints[jumpPoint.value]
-        elif compare.tokenValue == TokenValue.COMPARE_LT:
-            if arg1Value < arg2Value:
-                self._lineNum = self._jumpPoints[jumpPoint.value]
-        elif compare.tokenValue == TokenValue.COMPARE_GTE:
-            if arg1Value >= arg2Value:
-                self._lineNum = self._jumpPoints[jumpPoint.value]
-        elif compare.tokenValue == TokenValue.COMPARE_LTE:
-            if arg1Value <= arg2Value:
-                self._lineNum = self._jumpPoints[jumpPoint.value]
-        else:
-            raise NotImplementedError("Invalid comparison.")
+        if COMPARE_OPERATORS[compare.tokenValue](arg1Value, arg2Value):
+            self._lineNum = self._jumpPoints[jumpPoint.value]
 
     def interpretStrlen(self, line: list[Token]) -> None:
         result = self._expectTypes(
@@ -389,7 +1038,7 @@ class Interpreter:
 
         value = self.getRegister(arg1.value)
 
-        if not isinstance(value, str):
+        if not isString(value):
             self.raiseError(
                 f"Invalid command usage for 'strlen'. Expected string, got '{type(value)}'"
             )
@@ -416,7 +1065,7 @@ class Interpreter:
 
         value1 = self.getRegister(arg1.value)
 
-        if not isinstance(value1, str):
+        if not isString(value1):
             self.raiseError(
                 f"Invalid command usage for 'strapp'. Expected string, got '{type(value1)}'"
             )
@@ -433,12 +1082,12 @@ class Interpreter:
         else:
             raise NotImplementedError("Invalid argument type.")
 
-        if not isinstance(value2, str):
+        if not isString(value2):
             self.raiseError(
                 f"Invalid command usage for 'strapp'. Expected string, got '{type(value2)}'"
             )
 
-        self.setRegister(arg3.value, value1 + value2)
+        self.setRegister(arg3.value, concat(value1, value2))
 
     def interpretCharAt(self, line: list[Token]) -> None:
         result = self._expectTypes(
@@ -460,7 +1109,7 @@ class Interpreter:
 
         value1 = self.getRegister(arg1.value)
 
-        if not isinstance(value1, str):
+        if not isString(value1):
             self.raiseError(
                 f"Invalid command usage for 'charat'. Expected string, got '{type(value1)}'"
             )
@@ -469,7 +1118,7 @@ class Interpreter:
             value2 = self.getRegister(arg2.value)
         elif arg2.tokenType == TokenType.LITERAL:
             if arg2.tokenValue == TokenValue.LITERAL_NUMBER:
-                value2 = int(arg2.value)
+                value2 = indexLiteral(arg2.value)
             else:
                 self.raiseError(
                     f"Invalid command usage for 'charat'. Expected number literal, got '{arg2.tokenValue}'"
@@ -477,17 +1126,15 @@ class Interpreter:
         else:
             raise NotImplementedError("Invalid argument type.")
 
-        if not isinstance(value2, float):
+        if not isIndex(value2, self._legacyFloats):
             self.raiseError(
                 f"Invalid command usage for 'charat'. Expected number, got '{type(value2)}'"
             )
 
-        value2 = int(value2)
-
-        if value2 < 0 or value2 >= len(value1):
+        if not -1 < value2 < len(value1):
             self.raiseError(f"Invalid command usage for 'charat'. Index out of bounds.")
 
-        char = value1[value2]
+        char = value1[int(value2)]
 
         self.setRegister(arg3.value, char)
 
@@ -508,17 +1155,36 @@ class Interpreter:
 
         return True
 
-    def raiseError(self, message: str) -> None:
-        print(f"Error on line {self._lineNum}:")
-        print(f" - {message}")
-        print(f' - LINE: "{self._recreateLine(self._currentLine)}"')
-        print(f" - TOKENS: {self._formatTokenList(self._currentLine)}")
-        exit(1)
+    def raiseError(self, message: str, limit: str | None = None) -> None:
+        """
+        Raises a runtime error for the current line, or a limit error if the
+        name of the exceeded limit is given.
+        """
+        # Output produced before the error is written before the message.
+        self._output.flush()
+
+        line = self._recreateLine(self._currentLine)
+        tokens = self._formatTokenList(self._currentLine)
+
+        if limit is not None:
+            raise CnstrLimitError(self._lineNum, message, line, tokens, limit)
+
+        raise CnstrRuntimeError(self._lineNum, message, line, tokens)
+
+    def raiseErrorAt(
+        self, lineNum: int, message: str, limit: str | None = None
+    ) -> None:
+        """
+        Raises an error for a line of a compiled program.
+        """
+        self._lineNum = lineNum
+        self._currentLine = self._program.line(lineNum)
+        self.raiseError(message, limit)
 
     def getRegister(self, register: str) -> float:
         if register not in self._registers:
             # Create register
-            self._registers[register] = 0.0
+            self._registers[register] = self._zero
 
         return self._registers[register]
 
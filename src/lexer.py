@@ -1,16 +1,70 @@
+from mmap import mmap
+import re
+from typing import Iterator, TextIO
+
 from common import TokenType, TokenValue, Token, COMMAND_MAP, COMPARE_MAP
 from config import COMMENT_PREFIX
+from errors import ErrorDetail, CnstrSyntaxError
+from numerics import parseNumber
 import utils
 
 
+# Matches the words utils.smart_split() produces in a single scan. Quoted
+# strings and plain words are matched by their own groups, words with quotes
+# inside them or unterminated quotes only match "other".
+SCANNER = re.compile(
+    r"""
+    \ *(?:
+        (?P<string>'[^']*'|"[^"]*")
+        |(?P<word>[^\ '"]+)(?=\ |\Z)
+        |(?P<other>[^\ '"]*(?:'[^']*(?:'|\Z)|"[^"]*(?:"|\Z)))
+    )
+    """,
+    re.VERBOSE,
+)
+
+# Plain words the lexer classifies without falling back to _classify().
+REGISTER_PATTERN = re.compile(r"r[a-z0-9]{1,2}")
+NUMBER_PATTERN = re.compile(
+    r"[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?"
+)
+
+# Token of every command and comparison.
+NAME_TOKENS: dict[str, Token] = {}
+for name, value in COMMAND_MAP.items():
+    NAME_TOKENS[name] = Token(TokenType.COMMAND, value, name)
+for name, value in COMPARE_MAP.items():
+    NAME_TOKENS[name] = Token(TokenType.COMPARE, value, name)
+
+ENDLINE_TOKEN = Token(TokenType.ENDLINE, None, "\n")
+
+# Most words the lexer keeps tokens of. The table starts over once it's
+# full, so long sources of distinct literals and lexers kept for many
+# edits take bounded memory.
+MAX_WORDS = 4096
+
+
 class Lexer:
     """Tokenizes the input source code"""
 
-    def __init__(self, source: str) -> None:
+    def __init__(
+        self, source: str | TextIO | mmap, legacyFloats: bool = False
+    ) -> None:
+        """
+        :param source: The source code, an open text file or a memory map of
+            a UTF-8 encoded file. Files and memory maps can only be lexed
+            with iterLines().
+        :param legacyFloats: Whether integer literals are floats too
+        """
         self._source = source
+        self._legacyFloats = legacyFloats
         self._tokens: list[Token] = []
         self._lineNum = 0
-        self._errors: list[str] = []
+        self._errors: list[ErrorDetail] = []
+
+        # Token of every plain word and quoted string seen so far, shared by
+        # all of their occurrences.
+        self._words: dict[str, Token] = dict(NAME_TOKENS)
 
     def tokenize(self) -> list[Token]:
         """
@@ -25,23 +79,137 @@ class Lexer:
 
             self._tokens.extend(tokens)
 
-        if len(self._errors) > 0:
-            print(f"Encountered {len(self._errors)} errors while tokenizing:")
-            print("\n".join(self._errors))
-            exit(1)
+        self._reportErrors()
 
         return self._tokens
 
+    def iterLines(self) -> Iterator[list[Token]]:
+        """
+        Lazily tokenizes the source and yields the tokens of each line,
+        without ENDLINE tokens. Unlike tokenize(), neither the lines nor the
+        tokens of the whole source are kept in memory.
+        """
+        for i, line in enumerate(self._readLines()):
+            self._lineNum = i
+
+            yield self._tokenizeLine(line)
+
+        self._reportErrors()
+
+    def _readLines(self) -> Iterator[str]:
+        # Lines are read up to each "\n" and split further like tokenize()
+        # splits them, with str.splitlines(), which also breaks at "\r",
+        # "\x0b", "\x1c" and the other line boundaries.
+        source = self._source
+
+        if isinstance(source, mmap):
+            source.seek(0)
+            for line in iter(source.readline, b""):
+                yield from line.decode().splitlines()
+
+        elif isinstance(source, str):
+            start = 0
+            while start < len(source):
+                end = source.find("\n", start)
+                if end == -1:
+                    end = len(source)
+
+                yield from source[start : end + 1].splitlines()
+                start = end + 1
+
+        else:
+            for line in source:
+                yield from line.splitlines()
+
+    def _reportErrors(self) -> None:
+        if len(self._errors) > 0:
+            raise CnstrSyntaxError("tokenizing", self._errors)
+
     def tokenizeLine(self, line: str) -> list[Token]:
         """
         Tokenizes a given line of text into a list of tokens.
         """
+        tokens = self._tokenizeLine(line)
+        tokens.append(ENDLINE_TOKEN)
+
+        return tokens
+
+    def lexLine(self, line: str) -> tuple[list[Token], list[str]]:
+        """
+        Tokenizes a single line, without an ENDLINE token, and returns its
+        tokens and the messages of its errors instead of raising them. For
+        callers which lex lines one at a time.
+        """
+        errors = len(self._errors)
+        tokens = self._tokenizeLine(line)
+        messages = [error.message for error in self._errors[errors:]]
+        del self._errors[errors:]
+
+        return tokens, messages
+
+    def _tokenizeLine(self, line: str) -> list[Token]:
+        tokens: list[Token] = []
+
+        # Check if the line is a comment.
+        if line.startswith(COMMENT_PREFIX):
+            tokens.append(Token(TokenType.COMMENT, None, line.rstrip("\n")))
+            return tokens
+
+        # Words are split by a single scan over the line, and plain words are
+        # classified through a table of the words seen so far.
+        if len(self._words) > MAX_WORDS:
+            self._words = dict(NAME_TOKENS)
+
+        words = self._words
+
+        for string, word, other in SCANNER.findall(line.removesuffix("\n")):
+            if word:
+                if word not in words and not self._addWord(word):
+                    self._classify(word, tokens)
+                    continue
+
+                tokens.append(words[word])
+            elif string:
+                if string not in words:
+                    words[string] = Token(
+                        TokenType.LITERAL, TokenValue.LITERAL_STRING, string[1:-1]
+                    )
+
+                tokens.append(words[string])
+            else:
+                self._classify(other, tokens)
+
+        return tokens
+
+    def _addWord(self, word: str) -> bool:
+        if REGISTER_PATTERN.fullmatch(word):
+            self._words[word] = Token(TokenType.REGISTER, None, word)
+        elif NUMBER_PATTERN.fullmatch(word):
+            try:
+                value = parseNumber(word, self._legacyFloats)
+            except ValueError:
+                # Reported by _classify().
+                return False
+
+            self._words[word] = Token(
+                TokenType.LITERAL, TokenValue.LITERAL_NUMBER, value
+            )
+        else:
+            # Invalid words and unusual registers are left to _classify().
+            return False
+
+        return True
+
+    def _tokenizeLineReference(self, line: str) -> list[Token]:
+        """
+        Tokenizes a line word by word with utils.smart_split. The scanner in
+        _tokenizeLine() must produce the same tokens and errors.
+        """
         tokens: list[Token] = []
 
         # Check if the line is a comment.
         if line.startswith(COMMENT_PREFIX):
             tokens.append(Token(TokenType.COMMENT, None, line.rstrip("\n")))
-            tokens.append(Token(TokenType.ENDLINE, None, "\n"))
             return tokens
 
         splitted = line.removesuffix("\n")
@@ -51,28 +219,29 @@ class Lexer:
             if rawToken == "":
                 continue
 
-            # Try for register -> literal -> label -> command.
-            if rawToken.startswith("r"):
-                self._parseRegister(rawToken, tokens)
-            elif utils.is_number(rawToken):
-                self._parseLiteralNumber(rawToken, tokens)
-            elif (rawToken.startswith("'") and rawToken.endswith("'")) or (
-                rawToken.startswith('"') and rawToken.endswith('"')
-            ):
-                self._parseLiteralString(rawToken, tokens)
-            elif rawToken in COMMAND_MAP.keys():
-                self._parseCommand(rawToken, tokens)
-            elif rawToken in COMPARE_MAP.keys():
-                self._parseComparison(rawToken, tokens)
-            else:
-                self.error(f"Invalid token: {rawToken}")
-
-        tokens.append(Token(TokenType.ENDLINE, None, "\n"))
+            self._classify(rawToken, tokens)
 
         return tokens
 
+    def _classify(self, rawToken: str, tokens: list[Token]) -> None:
+        # Try for register -> literal -> label -> command.
+        if rawToken.startswith("r"):
+            self._parseRegister(rawToken, tokens)
+        elif utils.is_number(rawToken):
+            self._parseLiteralNumber(rawToken, tokens)
+        elif (rawToken.startswith("'") and rawToken.endswith("'")) or (
+            rawToken.startswith('"') and rawToken.endswith('"')
+        ):
+            self._parseLiteralString(rawToken, tokens)
+        elif rawToken in COMMAND_MAP.keys():
+            self._parseCommand(rawToken, tokens)
+        elif rawToken in COMPARE_MAP.keys():
+            self._parseComparison(rawToken, tokens)
+        else:
+            self.error(f"Invalid token: {rawToken}")
+
     def error(self, message: str) -> None:
-        self._errors.append(f"Error on line {self._lineNum}\n - {message}")
+        self._errors.append(ErrorDetail(self._lineNum, message))
 
     def _parseRegister(self, rawToken: str, tokens: list[Token]) -> None:
         if len(rawToken) not in (2, 3):
@@ -92,9 +261,13 @@ class Lexer:
         tokens.append(Token(TokenType.REGISTER, None, rawToken))
 
     def _parseLiteralNumber(self, rawToken: str, tokens: list[Token]) -> None:
-        tokens.append(
-            Token(TokenType.LITERAL, TokenValue.LITERAL_NUMBER, float(rawToken))
-        )
+        try:
+            value = parseNumber(rawToken, self._legacyFloats)
+        except ValueError as error:
+            self.error(str(error))
+            return
+
+        tokens.append(Token(TokenType.LITERAL, TokenValue.LITERAL_NUMBER, value))
 
     def _parseLiteralString(self, rawToken: str, tokens: list[Token]) -> None:
         tokens.append(
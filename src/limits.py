@@ -0,0 +1,207 @@
+import argparse
+import math
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from output import OutputSink
+
+
+# Most instructions run between two checks of the limits.
+FUEL_INTERVAL = 10_000
+
+
+@dataclass
+class Limits:
+    """
+    Bounds on a run, None means unlimited. Instructions and time are
+    checked on back-edges only, jumps to an earlier instruction, since a
+    program can't run long without taking one. Instructions are counted per
+    back-edge as the length of the jumped over span, so the count is
+    approximate: it doesn't see branches inside the span, or the straight
+    code outside of loops.
+
+    Digits bound the integers 'mul' and 'pow' produce, checked before they
+    are computed, since a single huge one takes longer than any limit.
+    """
+
+    maxInstructions: int | None = None
+    maxSeconds: float | None = None
+    maxOutputBytes: int | None = None
+    maxDigits: int | None = None
+
+    def guardsBackEdges(self) -> bool:
+        """
+        Returns whether back-edges need to be checked.
+        """
+        return self.maxInstructions is not None or self.maxSeconds is not None
+
+
+class LimitExceeded(Exception):
+    """
+    Raised by a LimitGuard or a LimitedSink in the middle of a run, the
+    interpreter turns it into a CnstrLimitError on the right line.
+    """
+
+    def __init__(self, limit: str, message: str) -> None:
+        super().__init__(message)
+        self.limit = limit
+
+
+class LimitGuard:
+    """
+    Enforces the instruction and time limits of a run. The run keeps the
+    fuel it was given in a local variable, takes the span of every back-edge
+    from it and only calls refuel() once it runs out, so the limits are
+    checked every few thousand instructions.
+    """
+
+    def __init__(self, limits: Limits) -> None:
+        self.instructions = 0
+        self._limits = limits
+        self._fuel = 0
+        self._maxInstructions = (
+            limits.maxInstructions
+            if limits.maxInstructions is not None
+            else float("inf")
+        )
+        self._deadline = (
+            time.monotonic() + limits.maxSeconds
+            if limits.maxSeconds is not None
+            else None
+        )
+
+    def refuel(self, fuel: int, most: int = FUEL_INTERVAL) -> int:
+        """
+        Called with the fuel left, negative once it ran out and 0 at the
+        start. Checks the limits and returns the fuel until the next check,
+        at most 'most'.
+        """
+        self.instructions += self._fuel - fuel
+
+        if self.instructions > self._maxInstructions:
+            raise LimitExceeded(
+                "instructions",
+                f"Instruction limit of {self._limits.maxInstructions} exceeded.",
+            )
+
+        if self._deadline is not None and time.monotonic() > self._deadline:
+            raise LimitExceeded(
+                "time", f"Time limit of {self._limits.maxSeconds} s exceeded."
+            )
+
+        self._fuel = int(min(most, self._maxInstructions - self.instructions))
+        return self._fuel
+
+
+def boundedMultiply(maxDigits: int) -> Callable[[object, object], object]:
+    """
+    Returns 'mul' raising LimitExceeded for int products of more than about
+    maxDigits digits.
+    """
+    maxBits = math.ceil(maxDigits * math.log2(10))
+
+    def multiply(a, b):
+        if (
+            type(a) is int
+            and type(b) is int
+            and a.bit_length() + b.bit_length() - 1 > maxBits
+        ):
+            raise LimitExceeded(
+                "digits", f"Integer limit of {maxDigits} digits exceeded."
+            )
+
+        return a * b
+
+    return multiply
+
+
+def boundedPower(maxDigits: int) -> Callable[[object, object], object]:
+    """
+    Returns 'pow' raising LimitExceeded for int powers of more than about
+    maxDigits digits.
+    """
+    maxBits = math.ceil(maxDigits * math.log2(10))
+
+    def power(a, b):
+        if (
+            type(a) is int
+            and type(b) is int
+            and b > 0
+            and (abs(a).bit_length() - 1) * b >= maxBits
+        ):
+            raise LimitExceeded(
+                "digits", f"Integer limit of {maxDigits} digits exceeded."
+            )
+
+        return a**b
+
+    return power
+
+
+class LimitedSink(OutputSink):
+    """
+    Passes output on to another sink until the output limit is reached.
+    The write which would exceed it is dropped.
+    """
+
+    def __init__(self, sink: OutputSink, maxBytes: int) -> None:
+        self._sink = sink
+        self._maxBytes = maxBytes
+        self.size = 0
+
+    def write(self, string: str) -> None:
+        size = len(string) if string.isascii() else len(string.encode())
+
+        if self.size + size > self._maxBytes:
+            raise LimitExceeded(
+                "output", f"Output limit of {self._maxBytes} bytes exceeded."
+            )
+
+        self.size += size
+        self._sink.write(string)
+
+    def flush(self) -> None:
+        self._sink.flush()
+
+    def pending(self) -> str:
+        return self._sink.pending()
+
+    async def drain(self) -> None:
+        await self._sink.drain()
+
+
+def addLimitArguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Adds the command line options of the limits.
+    """
+    parser.add_argument(
+        "--max-instructions",
+        type=int,
+        default=None,
+        help="stop programs after about this many instructions",
+    )
+    parser.add_argument(
+        "--max-seconds",
+        type=float,
+        default=None,
+        help="stop programs after running this long",
+    )
+    parser.add_argument(
+        "--max-digits",
+        type=int,
+        default=None,
+        help="stop programs whose 'mul' or 'pow' give an integer of more digits",
+    )
+    parser.add_argument(
+        "--max-output",
+        type=int,
+        default=None,
+        help="stop programs which write more than this many bytes",
+    )
+
+
+def limitsFromArguments(args: argparse.Namespace) -> Limits:
+    return Limits(
+        args.max_instructions, args.max_seconds, args.max_output, args.max_digits
+    )
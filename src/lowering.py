@@ -0,0 +1,442 @@
+from typing import Callable, TYPE_CHECKING
+import operator
+
+from common import TokenValue
+from compiler import Opcode, OperandKind, Instruction, Program
+from numerics import zero, divide, divideInts, isIndex, indexLiteral
+from limits import boundedMultiply, boundedPower
+from rope import isString, concat
+from typeinference import ValueType, ProgramTypes
+
+if TYPE_CHECKING:
+    from interpreter import Interpreter
+
+
+Op = Callable[[], int | None]
+
+
+MATH_OPERATORS = {
+    Opcode.ADD: operator.add,
+    Opcode.SUB: operator.sub,
+    Opcode.MUL: operator.mul,
+    Opcode.DIV: divide,
+    Opcode.MOD: operator.mod,
+    Opcode.POW: operator.pow,
+}
+
+# Dividing two ints always gives a float with legacy floats.
+LEGACY_MATH_OPERATORS = {**MATH_OPERATORS, Opcode.DIV: operator.truediv}
+
+COMPARE_OPERATORS = {
+    TokenValue.COMPARE_EQ: operator.eq,
+    TokenValue.COMPARE_NEQ: operator.ne,
+    TokenValue.COMPARE_GT: operator.gt,
+    TokenValue.COMPARE_LT: operator.lt,
+    TokenValue.COMPARE_GTE: operator.ge,
+    TokenValue.COMPARE_LTE: operator.le,
+}
+
+
+def mathOperators(
+    program: Program, maxDigits: int | None = None
+) -> dict[Opcode, Callable]:
+    """
+    Returns the functions of the math opcodes under the program's numerics,
+    with 'mul' and 'pow' bounded to maxDigits if given.
+    """
+    operators = LEGACY_MATH_OPERATORS if program.legacyFloats else MATH_OPERATORS
+
+    if maxDigits is None:
+        return operators
+
+    return {
+        **operators,
+        Opcode.MUL: boundedMultiply(maxDigits),
+        Opcode.POW: boundedPower(maxDigits),
+    }
+
+
+class Lowerer:
+    """
+    Lowers compiled instructions into specialized Python callables.
+
+    Every op takes no arguments and returns either None, to continue with the
+    next instruction, or the index of the instruction to continue at. With
+    the types of the program, operands whose type is proven aren't checked.
+    """
+
+    def __init__(
+        self,
+        interpreter: "Interpreter",
+        program: Program,
+        types: ProgramTypes | None = None,
+    ) -> None:
+        self._interpreter = interpreter
+        self._program = program
+        self._types = types
+        self._math = mathOperators(program, interpreter._limits.maxDigits)
+
+        # Instruction to continue at for each duplicated jump point, updated
+        # whenever one of its definitions is executed.
+        self._targets = {
+            label: program.target(program.jumpPoints[label])
+            for label in program.duplicateJumpPoints
+        }
+
+    def restoreJumpPoints(self) -> None:
+        """
+        Points the jumps to duplicated jump points at the definitions in the
+        interpreter's jump points, after they were restored from a snapshot.
+        """
+        jumpPoints = self._interpreter._jumpPoints
+
+        for label in self._targets:
+            self._targets[label] = self._program.target(jumpPoints[label])
+
+    def lower(self) -> list[Op]:
+        """
+        Lowers every instruction of the program and returns the ops.
+        """
+        return [self.lowerInstruction(i) for i in self._program.instructions]
+
+    def lowerInstruction(self, instruction: Instruction) -> Op:
+        opcode = instruction.opcode
+
+        if opcode in (Opcode.NOP, Opcode.SETJMPP):
+            return self.lowerNop(instruction)
+        elif opcode == Opcode.MOV:
+            return self.lowerMov(instruction)
+        elif opcode == Opcode.CPY:
+            return self.lowerCpy(instruction)
+        elif opcode == Opcode.SET:
+            return self.lowerSet(instruction)
+        elif opcode in MATH_OPERATORS:
+            return self.lowerMath(instruction)
+        elif opcode == Opcode.STDOUT:
+            return self.lowerStdout(instruction)
+        elif opcode == Opcode.JMP:
+            return self.lowerJmp(instruction)
+        elif opcode == Opcode.JMPIF:
+            return self.lowerJmpIf(instruction)
+        elif opcode == Opcode.STRLEN:
+            return self.lowerStrlen(instruction)
+        elif opcode == Opcode.STRAPP:
+            return self.lowerStrapp(instruction)
+        elif opcode == Opcode.CHARAT:
+            return self.lowerCharAt(instruction)
+        else:
+            raise NotImplementedError("Invalid opcode.")
+
+    def lowerNop(self, instruction: Instruction) -> Op:
+        if instruction.opcode == Opcode.SETJMPP:
+            (_, label), = instruction.operands
+
+            if label in self._program.duplicateJumpPoints:
+                # The target of a duplicated label depends on which definition
+                # was executed last.
+                jumpPoints = self._interpreter._jumpPoints
+                targets = self._targets
+                lineNum = instruction.lineNum
+                target = self._program.target(lineNum)
+
+                def op() -> None:
+                    jumpPoints[label] = lineNum
+                    targets[label] = target
+
+                return op
+
+        def op() -> None:
+            pass
+
+        return op
+
+    def lowerMov(self, instruction: Instruction) -> Op:
+        regs = self._interpreter._registers.slots
+        (_, source), (_, dest) = instruction.operands
+        cleared = zero(self._program.legacyFloats)
+
+        def op() -> None:
+            value = regs[source]
+            regs[dest] = value
+            regs[source] = cleared
+
+        return op
+
+    def lowerCpy(self, instruction: Instruction) -> Op:
+        regs = self._interpreter._registers.slots
+        (_, source), (_, dest) = instruction.operands
+
+        def op() -> None:
+            regs[dest] = regs[source]
+
+        return op
+
+    def lowerSet(self, instruction: Instruction) -> Op:
+        regs = self._interpreter._registers.slots
+        (_, dest), (_, value) = instruction.operands
+
+        def op() -> None:
+            regs[dest] = value
+
+        return op
+
+    def lowerMath(self, instruction: Instruction) -> Op:
+        regs = self._interpreter._registers.slots
+        function = self._math[instruction.opcode]
+        (kindA, a), (kindB, b), (_, dest) = instruction.operands
+
+        if function is divide and self._proven(instruction, ValueType.INT, 0, 1):
+            function = divideInts
+
+        if kindA == OperandKind.REGISTER and kindB == OperandKind.REGISTER:
+
+            def op() -> None:
+                regs[dest] = function(regs[a], regs[b])
+
+        elif kindA == OperandKind.REGISTER:
+
+            def op() -> None:
+                regs[dest] = function(regs[a], b)
+
+        elif kindB == OperandKind.REGISTER:
+
+            def op() -> None:
+                regs[dest] = function(a, regs[b])
+
+        else:
+
+            def op() -> None:
+                regs[dest] = function(a, b)
+
+        return op
+
+    def lowerStdout(self, instruction: Instruction) -> Op:
+        regs = self._interpreter._registers.slots
+        write = self._interpreter._output.write
+        pieces = instruction.operands
+
+        if all(kind == OperandKind.CONSTANT for kind, _ in pieces):
+            string = "".join(value for _, value in pieces)
+
+            def op() -> None:
+                write(string)
+
+            return op
+
+        if len(pieces) == 1:
+            (_, register), = pieces
+
+            def op() -> None:
+                write(str(regs[register]))
+
+            return op
+
+        def op() -> None:
+            write(
+                "".join(
+                    [
+                        str(regs[value]) if kind == OperandKind.REGISTER else value
+                        for kind, value in pieces
+                    ]
+                )
+            )
+
+        return op
+
+    def lowerJmp(self, instruction: Instruction) -> Op:
+        (_, label), = instruction.operands
+        return self._jumpTo(instruction, label)
+
+    def lowerJmpIf(self, instruction: Instruction) -> Op:
+        regs = self._interpreter._registers.slots
+        (_, label), (_, a), (_, compare), (kindB, b) = instruction.operands
+        function = COMPARE_OPERATORS[compare]
+
+        if (
+            label not in self._program.jumpPoints
+            or label in self._program.duplicateJumpPoints
+        ):
+            jump = self._jumpTo(instruction, label)
+            exists = label in self._program.jumpPoints
+
+            def op() -> int | None:
+                valueA = regs[a]
+                valueB = regs[b] if kindB == OperandKind.REGISTER else b
+
+                # The jump point is checked whether or not the jump is taken.
+                if not exists or function(valueA, valueB):
+                    return jump()
+
+            return op
+
+        target = self._program.target(self._program.jumpPoints[label])
+
+        if kindB == OperandKind.REGISTER:
+
+            def op() -> int | None:
+                if function(regs[a], regs[b]):
+                    return target
+
+        else:
+
+            def op() -> int | None:
+                if function(regs[a], b):
+                    return target
+
+        return op
+
+    def _jumpTo(self, instruction: Instruction, label: str) -> Op:
+        targets = self._targets
+
+        if label not in self._program.jumpPoints:
+
+            def op() -> None:
+                self._error(
+                    instruction, f"Jump point '{label}' does not exist."
+                )
+
+        elif label in self._program.duplicateJumpPoints:
+
+            def op() -> int:
+                return targets[label]
+
+        else:
+            # Execution continues on the line after the jump point.
+            target = self._program.target(self._program.jumpPoints[label])
+
+            def op() -> int:
+                return target
+
+        return op
+
+    def lowerStrlen(self, instruction: Instruction) -> Op:
+        regs = self._interpreter._registers.slots
+        (_, source), (_, dest) = instruction.operands
+
+        if self._proven(instruction, ValueType.STRING, 0):
+
+            def op() -> None:
+                regs[dest] = len(regs[source])
+
+            return op
+
+        def op() -> None:
+            value = regs[source]
+
+            if not isString(value):
+                self._error(
+                    instruction,
+                    f"Invalid command usage for 'strlen'. Expected string, got '{type(value)}'",
+                )
+
+            regs[dest] = len(value)
+
+        return op
+
+    def lowerStrapp(self, instruction: Instruction) -> Op:
+        regs = self._interpreter._registers.slots
+        (_, a), (kindB, b), (_, dest) = instruction.operands
+        isRegister = kindB == OperandKind.REGISTER
+
+        # Constants are always strings.
+        if self._proven(instruction, ValueType.STRING, 0, 1):
+            if isRegister:
+
+                def op() -> None:
+                    regs[dest] = concat(regs[a], regs[b])
+
+            else:
+
+                def op() -> None:
+                    regs[dest] = concat(regs[a], b)
+
+            return op
+
+        def op() -> None:
+            value1 = regs[a]
+
+            if not isString(value1):
+                self._error(
+                    instruction,
+                    f"Invalid command usage for 'strapp'. Expected string, got '{type(value1)}'",
+                )
+
+            value2 = regs[b] if isRegister else b
+
+            if not isString(value2):
+                self._error(
+                    instruction,
+                    f"Invalid command usage for 'strapp'. Expected string, got '{type(value2)}'",
+                )
+
+            regs[dest] = concat(value1, value2)
+
+        return op
+
+    def lowerCharAt(self, instruction: Instruction) -> Op:
+        regs = self._interpreter._registers.slots
+        (_, a), (kindB, b), (_, dest) = instruction.operands
+        isRegister = kindB == OperandKind.REGISTER
+        legacyFloats = self._program.legacyFloats
+
+        if isRegister:
+            index = ValueType.FLOAT if legacyFloats else ValueType.NUMBER
+            isIndexProven = self._proven(instruction, index, 1)
+        else:
+            b = indexLiteral(b)
+            isIndexProven = isIndex(b, legacyFloats)
+
+        # Only the bounds are left to check.
+        if isIndexProven and self._proven(instruction, ValueType.STRING, 0):
+
+            def op() -> None:
+                string = regs[a]
+                position = regs[b] if isRegister else b
+
+                if not -1 < position < len(string):
+                    self._error(
+                        instruction,
+                        f"Invalid command usage for 'charat'. Index out of bounds.",
+                    )
+
+                regs[dest] = string[int(position)]
+
+            return op
+
+        def op() -> None:
+            value1 = regs[a]
+
+            if not isString(value1):
+                self._error(
+                    instruction,
+                    f"Invalid command usage for 'charat'. Expected string, got '{type(value1)}'",
+                )
+
+            value2 = regs[b] if isRegister else b
+
+            if not isIndex(value2, legacyFloats):
+                self._error(
+                    instruction,
+                    f"Invalid command usage for 'charat'. Expected number, got '{type(value2)}'",
+                )
+
+            if not -1 < value2 < len(value1):
+                self._error(
+                    instruction,
+                    f"Invalid command usage for 'charat'. Index out of bounds.",
+                )
+
+            regs[dest] = value1[int(value2)]
+
+        return op
+
+    def _proven(
+        self, instruction: Instruction, types: ValueType, *operands: int
+    ) -> bool:
+        # Whether the operands of the instruction are always of the types.
+        return self._types is not None and all(
+            self._types.proven(instruction, operand, types) for operand in operands
+        )
+
+    def _error(self, instruction: Instruction, message: str) -> None:
+        self._interpreter.raiseErrorAt(instruction.lineNum, message)
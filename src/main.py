@@ -4,26 +4,333 @@ Assembly but worse.
 
 """
 
+import argparse
+import json
+import os
+import sys
+import time
+
 from lexer import Lexer
 from interpreter import Interpreter
+from compiler import Compiler, Program
+from bytecode import Bytecode, BytecodeCache
+from optimizer import Optimizer
+from output import BufferedSink, LineBufferedSink
+from errors import CnstrError, CnstrSnapshotError
+from limits import addLimitArguments, limitsFromArguments
+from snapshot import Snapshot, Checkpoints
+from incremental import IncrementalCompiler
+from typeinference import TypeInference
+
+# Seconds between two checks of the source file in watch mode.
+WATCH_INTERVAL = 0.2
 
 
 def main() -> None:
-    with open("source.txt", "r") as f:
+    try:
+        runMain()
+    except CnstrError as error:
+        print(error)
+        exit(1)
+
+
+def runMain() -> None:
+    parser = argparse.ArgumentParser(description="Run a cnstr program.")
+    parser.add_argument("source", nargs="?", default="source.txt")
+    parser.add_argument(
+        "--reference",
+        action="store_true",
+        help="interpret line by line instead of compiling first",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="don't read or write the bytecode cache",
+    )
+    parser.add_argument(
+        "--emit-bytecode",
+        action="store_true",
+        help="compile to the bytecode cache and print the bytecode instead of running",
+    )
+    parser.add_argument(
+        "--line-buffered",
+        action="store_true",
+        help="write output after every line instead of in batches",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=("closures", "pyexec"),
+        default="closures",
+        help="run compiled programs as lowered closures, or transpiled to Python",
+    )
+    parser.add_argument(
+        "--no-fuse",
+        action="store_true",
+        help="don't fuse adjacent instructions into superinstructions",
+    )
+    parser.add_argument(
+        "--profile-pairs",
+        action="store_true",
+        help="count which adjacent instruction pairs run most and print them",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="time every line, opcode and loop and print the hottest ones",
+    )
+    parser.add_argument(
+        "--profile-output",
+        metavar="FILE",
+        default=None,
+        help="also write the profile to a file, as JSON if it ends in .json "
+        "and as collapsed stacks for flame graphs otherwise",
+    )
+    parser.add_argument(
+        "--legacy-floats",
+        action="store_true",
+        help="make every number a float, like the original interpreter",
+    )
+    parser.add_argument(
+        "-O",
+        dest="optimize",
+        type=int,
+        choices=(0, 1),
+        default=0,
+        help="optimization level, 1 folds constants and removes dead stores",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        metavar="FILE",
+        default=None,
+        help="save a snapshot of the run to this file every so often",
+    )
+    parser.add_argument(
+        "--checkpoint-every",
+        metavar="N",
+        type=int,
+        default=10_000_000,
+        help="instructions between two checkpoints",
+    )
+    parser.add_argument(
+        "--resume",
+        metavar="FILE",
+        default=None,
+        help="continue the run saved in a snapshot file",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="re-run the program every time the source file is saved",
+    )
+    addLimitArguments(parser)
+    args = parser.parse_args()
+
+    if args.watch and (
+        args.reference
+        or args.emit_bytecode
+        or args.checkpoint
+        or args.resume
+        or args.profile
+        or args.profile_output
+        or args.profile_pairs
+    ):
+        parser.error("--watch only runs compiled programs")
+
+    if (args.checkpoint or args.resume) and (
+        args.reference
+        or args.backend != "closures"
+        or args.profile
+        or args.profile_output
+        or args.profile_pairs
+    ):
+        parser.error("--checkpoint and --resume need the closures backend")
+
+    if args.reference and (args.profile or args.profile_output):
+        parser.error("--profile needs a compiled program, not --reference")
+
+    if args.watch:
+        watch(args)
+        return
+
+    with open(args.source, "r") as f:
         source = f.read()
 
-    lexer = Lexer(source)
-    tokens = lexer.tokenize()
+    output = LineBufferedSink() if args.line_buffered else BufferedSink()
+    limits = limitsFromArguments(args)
+    cache = BytecodeCache(
+        args.source, args.optimize, args.legacy_floats, limits.maxDigits
+    )
+    program = None
+
+    if not (args.reference or args.no_cache or args.emit_bytecode):
+        program = cache.load(source)
+
+    if args.reference:
+        lexer = Lexer(source, args.legacy_floats)
+        tokens = lexer.tokenize()
+        interpreter = Interpreter(tokens, output, args.legacy_floats, limits=limits)
+    else:
+        interpreter = Interpreter([], output, args.legacy_floats, limits=limits)
+
+    if program is None and not args.reference:
+        # Compile straight from the lexer, without a flat token list.
+        lexer = Lexer(source, args.legacy_floats)
+        program = Compiler(
+            lexer.iterLines(), keepLines=False, legacyFloats=args.legacy_floats
+        ).compile()
+        program.source = source
+
+        if args.optimize:
+            optimizer = Optimizer(program, limits.maxDigits)
+            program = optimizer.optimize()
+            print(f"-O{args.optimize}: {optimizer.report}", file=sys.stderr)
+
+        if not args.no_cache:
+            cache.store(source, program)
+
+    if program is not None:
+        program.sourcePath = args.source
+
+    if args.emit_bytecode:
+        print(Bytecode.fromProgram(program).disassemble())
+        if not args.no_cache:
+            print(f"wrote {cache.path}")
+        return
+
+    resume = None
+    checkpoints = None
+
+    if args.resume:
+        try:
+            resume = Snapshot.load(args.resume)
+        except OSError as exception:
+            raise CnstrSnapshotError(f"Can't read snapshot: {exception}") from None
+
+    if args.checkpoint:
+        checkpoints = Checkpoints.toFile(args.checkpoint, args.checkpoint_every)
+
+    if not args.reference:
+        # Resumed runs start with registers of any type.
+        reportTypeErrors(program, None if args.resume else {})
 
     print("*" * 20)
 
-    interpreter = Interpreter(tokens)
-    interpreter.interpret()
+    profile = None
+    lineProfile = None
+
+    if args.reference:
+        interpreter.interpret()
+    elif args.profile or args.profile_output:
+        lineProfile = interpreter.profileLines(program)
+    elif args.profile_pairs:
+        profile = interpreter.profilePairs(program)
+    elif args.backend == "pyexec":
+        interpreter.runTranspiled(program)
+    else:
+        interpreter.run(
+            program,
+            fuse=not args.no_fuse,
+            resume=resume,
+            checkpoints=checkpoints,
+        )
 
     print("*" * 20)
     print(f"registers: {interpreter._registers}")
     print(f"jmp points: {interpreter._jumpPoints}")
 
+    if profile is not None:
+        print("most executed instruction pairs:")
+        print(profile.format())
+
+    if lineProfile is not None:
+        print(lineProfile.format())
+
+        if args.profile_output:
+            with open(args.profile_output, "w") as f:
+                if args.profile_output.endswith(".json"):
+                    json.dump(lineProfile.toJson(), f, indent=2)
+                else:
+                    f.write(lineProfile.collapsed())
+
+            print(f"wrote {args.profile_output}")
+
+
+def reportTypeErrors(
+    program: Program, inputs: dict[str, int | float | str] | None
+) -> None:
+    """
+    Prints the type errors the program raises when it reaches their line.
+    """
+    errors = TypeInference(program, inputs).infer().errors()
+
+    if errors:
+        print(
+            f"Found {len(errors)} type errors, "
+            "the run stops at the first one it reaches:"
+        )
+        for error in errors:
+            print(error)
+
+
+def watch(args: argparse.Namespace) -> None:
+    """
+    Runs the program every time its source file is saved, until
+    interrupted. Only the lines which changed are lexed and compiled again.
+    """
+    compiler = IncrementalCompiler(args.legacy_floats)
+    limits = limitsFromArguments(args)
+    modified = None
+
+    try:
+        while True:
+            try:
+                mtime = os.stat(args.source).st_mtime_ns
+            except FileNotFoundError:
+                # Some editors save by replacing the file.
+                mtime = modified
+
+            if mtime == modified:
+                time.sleep(WATCH_INTERVAL)
+                continue
+
+            modified = mtime
+
+            with open(args.source, "r") as f:
+                source = f.read()
+
+            try:
+                try:
+                    program = compiler.compile(source)
+                finally:
+                    print(compiler.stats.format())
+
+                program.sourcePath = args.source
+
+                if args.optimize:
+                    optimizer = Optimizer(program, limits.maxDigits)
+                    program = optimizer.optimize()
+                    print(f"-O{args.optimize}: {optimizer.report}", file=sys.stderr)
+
+                reportTypeErrors(program, {})
+
+                output = LineBufferedSink() if args.line_buffered else BufferedSink()
+                interpreter = Interpreter([], output, args.legacy_floats, limits=limits)
+
+                print("*" * 20)
+
+                if args.backend == "pyexec":
+                    interpreter.runTranspiled(program)
+                else:
+                    interpreter.run(program, fuse=not args.no_fuse)
+
+                print("*" * 20)
+            except CnstrError as error:
+                print(error)
+
+            print(f"watching {args.source} for changes, Ctrl+C to stop")
+    except KeyboardInterrupt:
+        pass
+
 
 if __name__ == "__main__":
     main()
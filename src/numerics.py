@@ -0,0 +1,87 @@
+"""
+Numeric semantics of cnstr.
+
+Integer literals are ints and arithmetic on two ints stays exact; 'div'
+only gives a float if the quotient is fractional. With legacy floats every
+literal and fresh register is a float, like the original interpreter.
+"""
+
+import math
+import re
+import sys
+
+
+INTEGER_PATTERN = re.compile(r"[+-]?[0-9]+")
+
+
+def parseNumber(text: str, legacyFloats: bool = False) -> int | float:
+    """
+    Returns the value of a number literal. Raises ValueError for integers
+    too long to convert.
+    """
+    if not legacyFloats and INTEGER_PATTERN.fullmatch(text):
+        try:
+            return int(text)
+        except ValueError:
+            raise ValueError(
+                f"Number literal has more than {sys.get_int_max_str_digits()} digits."
+            ) from None
+
+    return float(text)
+
+
+def zero(legacyFloats: bool = False) -> int | float:
+    """
+    Returns the value of registers which haven't been set.
+    """
+    return 0.0 if legacyFloats else 0
+
+
+def divide(a: int | float, b: int | float) -> int | float:
+    """
+    Divides, keeping the quotient of two ints an int if it is whole.
+    """
+    if type(a) is int and type(b) is int:
+        quotient, remainder = divmod(a, b)
+
+        if remainder == 0:
+            return quotient
+
+    return a / b
+
+
+def divideInts(a: int, b: int) -> int | float:
+    """
+    Divides like divide(), for operands which are known to be ints.
+    """
+    quotient, remainder = divmod(a, b)
+
+    if remainder == 0:
+        return quotient
+
+    return a / b
+
+
+def indexLiteral(value: int | float) -> int | float:
+    """
+    Returns the index a number literal gives 'charat'. It's converted with
+    int() like in the original interpreter, except infinite and NaN literals,
+    which are out of bounds.
+
+    Indices are checked with '-1 < index < len(string)' before converting,
+    which holds exactly when int(index) is a position of the string, and
+    never for infinite and NaN ones.
+    """
+    return int(value) if math.isfinite(value) else value
+
+
+def isIndex(value: object, legacyFloats: bool = False) -> bool:
+    """
+    Returns whether the value can be used as a 'charat' index. Legacy floats
+    only accept floats, so literal indices (converted with int()) and
+    'strlen' results are rejected.
+    """
+    if legacyFloats:
+        return isinstance(value, float)
+
+    return type(value) in (int, float)
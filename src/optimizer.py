@@ -0,0 +1,407 @@
+from dataclasses import dataclass, replace
+
+from compiler import Opcode, OperandKind, Operand, Instruction, Program
+from controlflow import EXIT, buildBlocks
+from lowering import MATH_OPERATORS, COMPARE_OPERATORS, mathOperators
+from numerics import zero, isIndex
+from limits import LimitExceeded
+
+
+MAX_PASSES = 10
+
+# Larger integers are left for the run to compute, under its limits.
+FOLD_MAX_DIGITS = 1000
+
+
+@dataclass
+class OptimizationReport:
+    """Counts of what the optimizer changed"""
+
+    instructionsBefore: int = 0
+    instructionsAfter: int = 0
+    nops: int = 0
+    deadStores: int = 0
+    branchesResolved: int = 0
+    folded: int = 0
+    propagated: int = 0
+
+    @property
+    def removed(self) -> int:
+        return self.instructionsBefore - self.instructionsAfter
+
+    def __str__(self) -> str:
+        return (
+            f"removed {self.removed} of {self.instructionsBefore} instructions "
+            f"({self.nops} no-ops, {self.deadStores} dead stores, "
+            f"{self.branchesResolved} resolved branches), "
+            f"folded {self.folded}, propagated {self.propagated} constants"
+        )
+
+
+def isNumber(value: object) -> bool:
+    return type(value) in (int, float)
+
+
+def isSame(a: object, b: object) -> bool:
+    # 1 == 1.0, but they print differently. NaN is never the same.
+    return type(a) is type(b) and a == b
+
+
+class Optimizer:
+    """
+    Optimizes a compiled program (-O1). Splits it into basic blocks at jumps
+    and jump targets, propagates and folds constants over the control flow
+    graph, removes stores that are overwritten before being read, and drops
+    instructions that do nothing.
+
+    Registers are not assumed to start out as zero, so optimized programs stay
+    valid when they are run with initial register values. Neither are 'mul'
+    and 'pow' folded into integers of more than maxDigits digits, which the
+    run would stop at.
+    """
+
+    def __init__(self, program: Program, maxDigits: int | None = None) -> None:
+        self._program = program
+        self._instructions = list(program.instructions)
+        self._math = mathOperators(
+            program,
+            FOLD_MAX_DIGITS if maxDigits is None else min(maxDigits, FOLD_MAX_DIGITS),
+        )
+        self.report = OptimizationReport(len(program.instructions))
+
+    def optimize(self) -> Program:
+        """
+        Optimizes the program and returns the optimized copy.
+        """
+        for _ in range(MAX_PASSES):
+            self._removeNops()
+
+            changed = self._propagateConstants()
+            changed = self._eliminateDeadStores() or changed
+
+            if not changed:
+                break
+
+        self._removeNops()
+
+        self.report.instructionsAfter = len(self._instructions)
+
+        return replace(self._program, instructions=self._instructions)
+
+    def _removeNops(self) -> None:
+        instructions: list[Instruction] = []
+
+        for instruction in self._instructions:
+            if instruction.opcode == Opcode.NOP or (
+                instruction.opcode == Opcode.SETJMPP
+                and instruction.operands[0][1]
+                not in self._program.duplicateJumpPoints
+            ):
+                # Jump targets are found by line number, the jump point itself
+                # doesn't have to stay.
+                self.report.nops += 1
+                continue
+
+            instructions.append(instruction)
+
+        self._instructions = instructions
+
+    def _propagateConstants(self) -> bool:
+        blocks, successors = buildBlocks(self._program, self._instructions)
+
+        # Known register values at the start of each block, None if the block
+        # hasn't been reached yet.
+        entryStates: list[dict[int, object] | None] = [None] * len(blocks)
+        if blocks:
+            entryStates[0] = {}
+
+        worklist = [0] if blocks else []
+        while worklist:
+            b = worklist.pop()
+            state = dict(entryStates[b])
+
+            for i in blocks[b]:
+                self._transfer(self._instructions[i], state)
+
+            for successor in successors[b]:
+                if successor == EXIT:
+                    continue
+
+                previous = entryStates[successor]
+                if previous is None:
+                    entryStates[successor] = dict(state)
+                    worklist.append(successor)
+                    continue
+
+                merged = {
+                    slot: value
+                    for slot, value in previous.items()
+                    if slot in state and isSame(state[slot], value)
+                }
+                if len(merged) < len(previous):
+                    entryStates[successor] = merged
+                    worklist.append(successor)
+
+        changed = False
+        for b, block in enumerate(blocks):
+            state = entryStates[b]
+            if state is None:
+                continue
+
+            state = dict(state)
+            for i in block:
+                instruction = self._rewrite(self._instructions[i], state)
+
+                if instruction is not self._instructions[i]:
+                    self._instructions[i] = instruction
+                    changed = True
+
+                self._transfer(instruction, state)
+
+        return changed
+
+    def _transfer(self, instruction: Instruction, state: dict[int, object]) -> None:
+        opcode = instruction.opcode
+        operands = instruction.operands
+
+        if opcode == Opcode.SET:
+            (_, dest), (_, value) = operands
+            state[dest] = value
+        elif opcode == Opcode.CPY:
+            (_, source), (_, dest) = operands
+            if source in state:
+                state[dest] = state[source]
+            else:
+                state.pop(dest, None)
+        elif opcode == Opcode.MOV:
+            (_, source), (_, dest) = operands
+            if source in state:
+                state[dest] = state[source]
+            else:
+                state.pop(dest, None)
+            state[source] = zero(self._program.legacyFloats)
+        elif opcode in MATH_OPERATORS or opcode in (
+            Opcode.STRLEN,
+            Opcode.STRAPP,
+            Opcode.CHARAT,
+        ):
+            (_, dest) = operands[-1]
+            state.pop(dest, None)
+
+    def _rewrite(
+        self, instruction: Instruction, state: dict[int, object]
+    ) -> Instruction:
+        """
+        Returns the instruction with known register values substituted, or a
+        simpler instruction with the same effect.
+        """
+        opcode = instruction.opcode
+        operands = instruction.operands
+
+        def known(operand: Operand) -> bool:
+            kind, value = operand
+            return kind == OperandKind.REGISTER and value in state
+
+        def constant(operand: Operand) -> Operand:
+            self.report.propagated += 1
+            return (OperandKind.CONSTANT, state[operand[1]])
+
+        def setTo(dest: Operand, value: object) -> Instruction:
+            self.report.folded += 1
+            return Instruction(
+                Opcode.SET, (dest, (OperandKind.CONSTANT, value)), instruction.lineNum
+            )
+
+        if opcode == Opcode.CPY:
+            source, dest = operands
+            if known(source):
+                self.report.propagated += 1
+                return Instruction(
+                    Opcode.SET,
+                    (dest, (OperandKind.CONSTANT, state[source[1]])),
+                    instruction.lineNum,
+                )
+
+        elif opcode in MATH_OPERATORS:
+            a, b, dest = operands
+
+            if known(a) and isNumber(state[a[1]]):
+                a = constant(a)
+            if known(b) and isNumber(state[b[1]]):
+                b = constant(b)
+
+            if a[0] == OperandKind.CONSTANT and b[0] == OperandKind.CONSTANT:
+                try:
+                    value = self._math[opcode](a[1], b[1])
+                except (ArithmeticError, TypeError, ValueError, LimitExceeded):
+                    value = None
+
+                if isNumber(value):
+                    return setTo(dest, value)
+
+            if (a, b) != operands[:2]:
+                return Instruction(opcode, (a, b, dest), instruction.lineNum)
+
+        elif opcode == Opcode.STDOUT:
+            if any(known(piece) for piece in operands):
+                pieces = tuple(
+                    (OperandKind.CONSTANT, str(state[piece[1]]))
+                    if known(piece)
+                    else piece
+                    for piece in operands
+                )
+                self.report.propagated += sum(map(known, operands))
+                return Instruction(opcode, pieces, instruction.lineNum)
+
+        elif opcode == Opcode.JMPIF:
+            label, a, compare, b = operands
+
+            if known(b) and isNumber(state[b[1]]):
+                b = constant(b)
+
+            if (
+                known(a)
+                and b[0] == OperandKind.CONSTANT
+                and label[1] in self._program.jumpPoints
+            ):
+                try:
+                    taken = COMPARE_OPERATORS[compare[1]](state[a[1]], b[1])
+                except TypeError:
+                    taken = None
+
+                if taken is not None:
+                    self.report.branchesResolved += 1
+
+                    if taken:
+                        return Instruction(Opcode.JMP, (label,), instruction.lineNum)
+
+                    return Instruction(Opcode.NOP, (), instruction.lineNum)
+
+            if b != operands[3]:
+                return Instruction(opcode, (label, a, compare, b), instruction.lineNum)
+
+        elif opcode == Opcode.STRLEN:
+            source, dest = operands
+            if known(source) and isinstance(state[source[1]], str):
+                return setTo(dest, len(state[source[1]]))
+
+        elif opcode == Opcode.STRAPP:
+            a, b, dest = operands
+
+            if known(b) and isinstance(state[b[1]], str):
+                b = constant(b)
+
+            if (
+                known(a)
+                and isinstance(state[a[1]], str)
+                and b[0] == OperandKind.CONSTANT
+            ):
+                return setTo(dest, state[a[1]] + b[1])
+
+            if b != operands[1]:
+                return Instruction(opcode, (a, b, dest), instruction.lineNum)
+
+        elif opcode == Opcode.CHARAT:
+            # Only registers are valid indices, so the index isn't substituted.
+            a, b, dest = operands
+
+            if known(a) and known(b):
+                string, index = state[a[1]], state[b[1]]
+
+                if (
+                    isinstance(string, str)
+                    and isIndex(index, self._program.legacyFloats)
+                    and -1 < index < len(string)
+                ):
+                    return setTo(dest, string[int(index)])
+
+        return instruction
+
+    def _eliminateDeadStores(self) -> bool:
+        blocks, successors = buildBlocks(self._program, self._instructions)
+        allRegisters = set(range(len(self._program.registerNames)))
+
+        # Registers are visible once the program ends or stops with an error.
+        def liveOut(b: int) -> set[int]:
+            if not successors[b] or EXIT in successors[b]:
+                return set(allRegisters)
+
+            live: set[int] = set()
+            for successor in successors[b]:
+                live |= liveIn[successor]
+            return live
+
+        liveIn: list[set[int]] = [set() for _ in blocks]
+        changed = True
+        while changed:
+            changed = False
+
+            for b in reversed(range(len(blocks))):
+                live = liveOut(b)
+                for i in reversed(blocks[b]):
+                    self._liveBefore(self._instructions[i], live)
+
+                if live != liveIn[b]:
+                    liveIn[b] = live
+                    changed = True
+
+        removed = False
+        for b, block in enumerate(blocks):
+            live = liveOut(b)
+
+            for i in reversed(block):
+                instruction = self._instructions[i]
+
+                if instruction.opcode in (Opcode.SET, Opcode.CPY):
+                    (_, dest) = instruction.operands[0 if instruction.opcode == Opcode.SET else 1]
+                    isCopyToSelf = (
+                        instruction.opcode == Opcode.CPY
+                        and instruction.operands[0][1] == dest
+                    )
+
+                    if dest not in live or isCopyToSelf:
+                        self._instructions[i] = Instruction(
+                            Opcode.NOP, (), instruction.lineNum
+                        )
+                        self.report.deadStores += 1
+                        removed = True
+                        continue
+
+                self._liveBefore(instruction, live)
+
+        return removed
+
+    def _liveBefore(self, instruction: Instruction, live: set[int]) -> None:
+        """
+        Updates the registers live after the instruction to those live
+        before it.
+        """
+        opcode = instruction.opcode
+        operands = instruction.operands
+
+        if opcode == Opcode.SET:
+            live.discard(operands[0][1])
+            return
+
+        if opcode in (Opcode.CPY, Opcode.STRLEN):
+            live.discard(operands[1][1])
+        elif opcode == Opcode.MOV:
+            live.discard(operands[0][1])
+            live.discard(operands[1][1])
+        elif opcode in MATH_OPERATORS or opcode in (Opcode.STRAPP, Opcode.CHARAT):
+            live.discard(operands[2][1])
+
+        if opcode == Opcode.STDOUT:
+            uses = operands
+        elif opcode in (Opcode.CPY, Opcode.MOV, Opcode.STRLEN):
+            uses = operands[:1]
+        elif opcode in MATH_OPERATORS or opcode in (Opcode.STRAPP, Opcode.CHARAT):
+            uses = operands[:2]
+        elif opcode == Opcode.JMPIF:
+            uses = (operands[1], operands[3])
+        else:
+            uses = ()
+
+        for kind, value in uses:
+            if kind == OperandKind.REGISTER:
+                live.add(value)
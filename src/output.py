@@ -0,0 +1,129 @@
+import sys
+from typing import Protocol, TextIO
+
+
+DEFAULT_THRESHOLD = 64 * 1024
+
+
+class OutputSink:
+    """Receives the output of the 'stdout' command"""
+
+    def write(self, string: str) -> None:
+        raise NotImplementedError()
+
+    def flush(self) -> None:
+        pass
+
+    def pending(self) -> str:
+        """
+        Returns the output written but not passed on yet, for snapshots.
+        """
+        return ""
+
+    async def drain(self) -> None:
+        """
+        Called between the slices of an async run. Sinks which write
+        synchronously have nothing to wait for.
+        """
+
+
+class StreamWriter(Protocol):
+    """The part of asyncio.StreamWriter used by AsyncSink"""
+
+    def write(self, data: bytes) -> None: ...
+
+    async def drain(self) -> None: ...
+
+
+class BufferedSink(OutputSink):
+    """
+    Accumulates output and writes it to the stream in batches, once the
+    buffered size reaches the threshold (in characters) or on flush().
+    """
+
+    def __init__(
+        self, stream: TextIO | None = None, threshold: int = DEFAULT_THRESHOLD
+    ) -> None:
+        # None means sys.stdout at the time of flushing, so redirects apply.
+        self._stream = stream
+        self._threshold = threshold
+        self._chunks: list[str] = []
+        self._size = 0
+
+    def write(self, string: str) -> None:
+        self._chunks.append(string)
+        self._size += len(string)
+
+        if self._size >= self._threshold:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._chunks:
+            return
+
+        stream = self._stream or sys.stdout
+        stream.write("".join(self._chunks))
+        stream.flush()
+
+        self._chunks = []
+        self._size = 0
+
+    def pending(self) -> str:
+        return "".join(self._chunks)
+
+
+class LineBufferedSink(BufferedSink):
+    """Writes output to the stream whenever a line is completed"""
+
+    def write(self, string: str) -> None:
+        self._chunks.append(string)
+        self._size += len(string)
+
+        if "\n" in string or self._size >= self._threshold:
+            self.flush()
+
+
+class CaptureSink(OutputSink):
+    """Captures output in memory instead of writing it anywhere"""
+
+    def __init__(self) -> None:
+        self._chunks: list[str] = []
+
+    def write(self, string: str) -> None:
+        self._chunks.append(string)
+
+    def getvalue(self) -> bytes:
+        """
+        Returns everything written so far, UTF-8 encoded.
+        """
+        return "".join(self._chunks).encode()
+
+
+class AsyncSink(OutputSink):
+    """
+    Output sink of async runs. Writes are collected in memory and handed to
+    an asyncio stream on flush(), which doesn't block. drain() also waits
+    until the stream has taken the data, so a slow reader holds back the
+    program writing to it and not the event loop.
+    """
+
+    def __init__(self, writer: StreamWriter) -> None:
+        self._writer = writer
+        self._chunks: list[str] = []
+
+    def write(self, string: str) -> None:
+        self._chunks.append(string)
+
+    def flush(self) -> None:
+        if not self._chunks:
+            return
+
+        self._writer.write("".join(self._chunks).encode())
+        self._chunks = []
+
+    def pending(self) -> str:
+        return "".join(self._chunks)
+
+    async def drain(self) -> None:
+        self.flush()
+        await self._writer.drain()
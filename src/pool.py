@@ -0,0 +1,189 @@
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+from lexer import Lexer
+from interpreter import Interpreter
+from compiler import Compiler
+from bytecode import Bytecode, sourceHash
+from output import CaptureSink
+from errors import CnstrSyntaxError, CnstrRuntimeError
+from limits import Limits
+from rope import Rope
+
+
+@dataclass
+class CompileResult:
+    """Bytecode of a source, or the errors it failed to compile with"""
+
+    bytecode: bytes | None
+    error: str | None
+    compileTime: float
+
+
+@dataclass
+class ProgramResult:
+    """
+    Outcome of running one program file. 'stage' is "compile" or "run" if
+    the program failed, and 'error' holds the messages it failed with.
+    """
+
+    path: str
+    output: str = ""
+    registers: dict[str, int | float | str] = field(default_factory=dict)
+    error: str | None = None
+    stage: str | None = None
+    compileTime: float = 0.0
+    wallTime: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def findPrograms(patterns: list[str]) -> list[str]:
+    """
+    Returns the .cnstr files in the directories or matching the globs.
+    """
+    paths: list[str] = []
+
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(pattern, "*.cnstr"))
+        else:
+            matches = glob.glob(pattern)
+
+        paths.extend(sorted(match for match in matches if os.path.isfile(match)))
+
+    # Keep the first occurrence of files matched more than once.
+    return list(dict.fromkeys(paths))
+
+
+def compileSource(source: str, legacyFloats: bool = False) -> CompileResult:
+    """
+    Compiles a source into bytecode. Errors are returned instead of raised.
+    """
+    start = time.perf_counter()
+
+    try:
+        program = Compiler(
+            Lexer(source, legacyFloats).iterLines(),
+            keepLines=False,
+            legacyFloats=legacyFloats,
+        ).compile()
+    except CnstrSyntaxError as error:
+        return CompileResult(None, f"{error}\n", time.perf_counter() - start)
+
+    bytecode = Bytecode.fromProgram(program).dumps(sourceHash(source))
+    return CompileResult(bytecode, None, time.perf_counter() - start)
+
+
+def runCompiled(
+    path: str,
+    source: str,
+    bytecode: bytes,
+    backend: str = "closures",
+    limits: Limits | None = None,
+) -> ProgramResult:
+    """
+    Runs compiled bytecode, capturing its output and final registers.
+    Errors are returned instead of raised.
+    """
+    program = Bytecode.loads(bytecode).toProgram(source)
+    program.sourcePath = path
+
+    sink = CaptureSink()
+    interpreter = Interpreter([], sink, program.legacyFloats, limits=limits)
+    error = None
+
+    start = time.perf_counter()
+
+    try:
+        if backend == "pyexec":
+            interpreter.runTranspiled(program)
+        else:
+            interpreter.run(program)
+    except CnstrRuntimeError as exception:
+        error = f"{exception}\n"
+    except Exception as exception:
+        # Any other error ends this program only, not the whole batch.
+        error = f"{type(exception).__name__}: {exception}\n"
+
+    wallTime = time.perf_counter() - start
+
+    registers = {
+        name: str(value) if type(value) is Rope else value
+        for name, value in interpreter._registers.items()
+    }
+
+    return ProgramResult(
+        path,
+        sink.getvalue().decode(),
+        registers,
+        error,
+        None if error is None else "run",
+        wallTime=wallTime,
+    )
+
+
+def runPrograms(
+    paths: list[str],
+    workers: int | None = None,
+    backend: str = "closures",
+    legacyFloats: bool = False,
+    limits: Limits | None = None,
+) -> list[ProgramResult]:
+    """
+    Runs the program files in a process pool, in the order of the paths.
+    Files with the same source are compiled once. Limits apply to each run.
+    """
+    sources: dict[str, str] = {}
+    unreadable: dict[str, str] = {}
+
+    for path in paths:
+        try:
+            with open(path, "r") as f:
+                sources[path] = f.read()
+        except OSError as exception:
+            unreadable[path] = f"{exception}\n"
+
+    results: dict[str, ProgramResult] = {
+        path: ProgramResult(path, error=message, stage="read")
+        for path, message in unreadable.items()
+    }
+
+    with ProcessPoolExecutor(workers) as executor:
+        hashes = {path: sourceHash(source) for path, source in sources.items()}
+        compiling = {}
+
+        for path, source in sources.items():
+            if hashes[path] not in compiling:
+                compiling[hashes[path]] = executor.submit(
+                    compileSource, source, legacyFloats
+                )
+
+        compiled = {hash: future.result() for hash, future in compiling.items()}
+        running = {}
+
+        for path, source in sources.items():
+            result = compiled[hashes[path]]
+
+            if result.bytecode is None:
+                results[path] = ProgramResult(
+                    path,
+                    error=result.error,
+                    stage="compile",
+                    compileTime=result.compileTime,
+                )
+            else:
+                running[path] = executor.submit(
+                    runCompiled, path, source, result.bytecode, backend, limits
+                )
+
+        for path, future in running.items():
+            results[path] = future.result()
+            results[path].compileTime = compiled[hashes[path]].compileTime
+
+    return [results[path] for path in paths]
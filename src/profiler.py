@@ -0,0 +1,185 @@
+from collections import Counter
+from dataclasses import dataclass, asdict
+import os
+
+from common import recreateLine
+from compiler import Opcode, Program
+
+
+@dataclass
+class LineStats:
+    """Executions and time (in nanoseconds) of one source line"""
+
+    lineNum: int
+    text: str
+    count: int
+    time: int
+
+
+@dataclass
+class OpcodeStats:
+    """Executions and time of every instruction with one opcode"""
+
+    opcode: str
+    count: int
+    time: int
+
+
+@dataclass
+class LoopStats:
+    """
+    Trips around a loop, a jump back from the line 'lineNum' to the jump
+    point 'label', and the time spent in its body.
+    """
+
+    label: str
+    lineNum: int
+    trips: int
+    time: int
+
+
+class LineProfile:
+    """
+    Counts how often each instruction of a program was executed during a
+    run and how long it took, and how often each jump back was taken.
+    """
+
+    def __init__(self, program: Program) -> None:
+        self._program = program
+        self.counts = [0] * len(program.instructions)
+        self.times = [0] * len(program.instructions)
+        # Jumps back by the instruction they were taken from and their target.
+        self.trips: Counter[tuple[int, int]] = Counter()
+
+    @property
+    def totalTime(self) -> int:
+        return sum(self.times)
+
+    def lines(self) -> list[LineStats]:
+        """
+        Returns the lines which ran, most time first.
+        """
+        stats = [
+            LineStats(instruction.lineNum, self._text(instruction.lineNum), count, time)
+            for instruction, count, time in zip(
+                self._program.instructions, self.counts, self.times
+            )
+            if count
+        ]
+
+        return sorted(stats, key=lambda line: (-line.time, line.lineNum))
+
+    def opcodes(self) -> list[OpcodeStats]:
+        """
+        Returns the opcodes which ran, most time first.
+        """
+        counts: Counter[Opcode] = Counter()
+        times: Counter[Opcode] = Counter()
+
+        for instruction, count, time in zip(
+            self._program.instructions, self.counts, self.times
+        ):
+            counts[instruction.opcode] += count
+            times[instruction.opcode] += time
+
+        stats = [
+            OpcodeStats(opcode.name.lower(), counts[opcode], times[opcode])
+            for opcode in counts
+            if counts[opcode]
+        ]
+
+        return sorted(stats, key=lambda opcode: -opcode.time)
+
+    def loops(self) -> list[LoopStats]:
+        """
+        Returns the loops which were taken, most trips first.
+        """
+        instructions = self._program.instructions
+        stats = [
+            LoopStats(
+                instructions[last].operands[0][1],
+                instructions[last].lineNum,
+                trips,
+                sum(self.times[start : last + 1]),
+            )
+            for (last, start), trips in self.trips.items()
+        ]
+
+        return sorted(stats, key=lambda loop: (-loop.trips, loop.lineNum))
+
+    def format(self, n: int = 10) -> str:
+        """
+        Returns a text report of the n hottest lines, opcodes and loops.
+        """
+        total = self.totalTime or 1
+        report = ["hottest lines:"]
+
+        for line in self.lines()[:n]:
+            report.append(
+                f"{line.time / 1e6:>10.3f} ms {line.time / total:>6.1%} "
+                f"{line.count:>10}x  line {line.lineNum}: {line.text}"
+            )
+
+        report.append("hottest opcodes:")
+
+        for opcode in self.opcodes()[:n]:
+            report.append(
+                f"{opcode.time / 1e6:>10.3f} ms {opcode.time / total:>6.1%} "
+                f"{opcode.count:>10}x  {opcode.opcode}"
+            )
+
+        report.append("loop trips:")
+
+        for loop in self.loops()[:n]:
+            report.append(
+                f"{loop.time / 1e6:>10.3f} ms {loop.time / total:>6.1%} "
+                f"{loop.trips:>10}x  '{loop.label}' from line {loop.lineNum}"
+            )
+
+        return "\n".join(report)
+
+    def toJson(self) -> dict:
+        """
+        Returns the profile as a JSON serializable dict, times in nanoseconds.
+        """
+        return {
+            "program": self._program.sourcePath,
+            "totalTime": self.totalTime,
+            "lines": [asdict(line) for line in self.lines()],
+            "opcodes": [asdict(opcode) for opcode in self.opcodes()],
+            "loops": [asdict(loop) for loop in self.loops()],
+        }
+
+    def collapsed(self) -> str:
+        """
+        Returns the profile as collapsed stacks for flame graph tools, one
+        line of semicolon separated frames and nanoseconds per instruction
+        which ran. The frames are the program, the loops around the
+        instruction from the outermost in, and the instruction's line.
+        """
+        instructions = self._program.instructions
+        root = os.path.basename(self._program.sourcePath) or "<cnstr>"
+        loops = sorted(self.trips, key=lambda loop: loop[1] - loop[0])
+        stacks = []
+
+        for i, (instruction, time) in enumerate(zip(instructions, self.times)):
+            if not self.counts[i]:
+                continue
+
+            frames = [root]
+            frames.extend(
+                f"loop '{instructions[last].operands[0][1]}' "
+                f"line {instructions[last].lineNum}"
+                for last, start in loops
+                if start <= i <= last
+            )
+            frames.append(
+                f"line {instruction.lineNum}: {self._text(instruction.lineNum)}"
+            )
+
+            stacks.append(f"{';'.join(frame.replace(';', ',') for frame in frames)} {time}")
+
+        return "\n".join(stacks) + "\n"
+
+    def _text(self, lineNum: int) -> str:
+        return recreateLine(self._program.line(lineNum)).strip()
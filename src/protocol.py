@@ -0,0 +1,105 @@
+"""
+Messages between the daemon and its clients. Every message is a JSON
+object preceded by its length in bytes, as a 4 byte big-endian integer.
+Clients only import this module, so they start without loading the
+interpreter.
+
+"""
+
+import json
+import os
+import socket
+import struct
+import tempfile
+
+from errors import CnstrProtocolError
+
+
+HEADER = struct.Struct(">I")
+
+# Longest message either side accepts.
+MAX_MESSAGE_SIZE = 64 * 1024 * 1024
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), f"cnstr-{os.getuid()}.sock")
+
+
+def encodeMessage(message: dict) -> bytes:
+    """
+    Returns the framed message.
+    """
+    data = json.dumps(message, separators=(",", ":")).encode()
+
+    if len(data) > MAX_MESSAGE_SIZE:
+        raise CnstrProtocolError(f"Message of {len(data)} bytes is too long.")
+
+    return HEADER.pack(len(data)) + data
+
+
+def decodeMessage(data: bytes) -> dict:
+    """
+    Returns the message encoded in the data after the header.
+    """
+    try:
+        message = json.loads(data)
+    except (UnicodeDecodeError, ValueError):
+        raise CnstrProtocolError("Message is not valid JSON.") from None
+
+    if not isinstance(message, dict):
+        raise CnstrProtocolError("Message is not a JSON object.")
+
+    return message
+
+
+def messageSize(header: bytes) -> int:
+    """
+    Returns the length of the message the header belongs to.
+    """
+    (size,) = HEADER.unpack(header)
+
+    if size > MAX_MESSAGE_SIZE:
+        raise CnstrProtocolError(f"Message of {size} bytes is too long.")
+
+    return size
+
+
+def sendMessage(connection: socket.socket, message: dict) -> None:
+    connection.sendall(encodeMessage(message))
+
+
+def receiveMessage(connection: socket.socket) -> dict | None:
+    """
+    Reads the next message from a blocking socket, None if the other side
+    closed the connection between two messages.
+    """
+    header = _receiveExactly(connection, HEADER.size)
+
+    if header is None:
+        return None
+
+    data = _receiveExactly(connection, messageSize(header))
+
+    if data is None:
+        raise CnstrProtocolError("Connection closed in the middle of a message.")
+
+    return decodeMessage(data)
+
+
+def _receiveExactly(connection: socket.socket, size: int) -> bytes | None:
+    chunks = []
+    remaining = size
+
+    while remaining:
+        chunk = connection.recv(min(remaining, 1 << 20))
+
+        if not chunk:
+            if remaining != size:
+                raise CnstrProtocolError(
+                    "Connection closed in the middle of a message."
+                )
+
+            return None
+
+        chunks.append(chunk)
+        remaining -= len(chunk)
+
+    return b"".join(chunks)
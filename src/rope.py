@@ -0,0 +1,155 @@
+import operator
+from typing import Callable, Union
+
+
+# Shorter strings are appended as plain str, copying them is cheaper than a
+# rope.
+MIN_ROPE_LENGTH = 256
+
+
+class Rope:
+    """
+    String value built by 'strapp', which makes appending amortised O(1).
+
+    Ropes are immutable values, but share a list of chunks: a rope that ends
+    at the end of its list appends in place and hands the longer list to the
+    new rope, since every other rope sharing it only sees a shorter prefix.
+    The chunks are joined into a str only when the contents are needed, the
+    length is always known.
+    """
+
+    __slots__ = ("_chunks", "_count", "_length", "_string")
+
+    def __init__(self, string: str) -> None:
+        self._chunks = [string]
+        self._count = 1
+        self._length = len(string)
+        self._string: str | None = string
+
+    def append(self, string: str) -> "Rope":
+        """
+        Returns a rope of this rope followed by the string.
+        """
+        chunks = self._chunks
+
+        if self._count != len(chunks):
+            # Another rope has already appended to the shared chunks.
+            chunks = chunks[: self._count]
+
+        chunks.append(string)
+
+        rope = Rope.__new__(Rope)
+        rope._chunks = chunks
+        rope._count = len(chunks)
+        rope._length = self._length + len(string)
+        rope._string = None
+        return rope
+
+    def __str__(self) -> str:
+        if self._string is None:
+            self._string = "".join(self._chunks[: self._count])
+
+            # Later appends continue from the joined string, so it isn't
+            # joined again.
+            self._chunks = [self._string]
+            self._count = 1
+
+        return self._string
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index: int | slice) -> str:
+        return str(self)[index]
+
+    def __repr__(self) -> str:
+        return repr(str(self))
+
+    def __hash__(self) -> int:
+        return hash(str(self))
+
+    def __eq__(self, other: object) -> bool:
+        if not isString(other):
+            return NotImplemented
+        return str(self) == str(other)
+
+    def __ne__(self, other: object) -> bool:
+        if not isString(other):
+            return NotImplemented
+        return str(self) != str(other)
+
+    def __lt__(self, other: object) -> bool:
+        if not isString(other):
+            return NotImplemented
+        return str(self) < str(other)
+
+    def __le__(self, other: object) -> bool:
+        if not isString(other):
+            return NotImplemented
+        return str(self) <= str(other)
+
+    def __gt__(self, other: object) -> bool:
+        if not isString(other):
+            return NotImplemented
+        return str(self) > str(other)
+
+    def __ge__(self, other: object) -> bool:
+        if not isString(other):
+            return NotImplemented
+        return str(self) >= str(other)
+
+
+def _forward(function: Callable[[object, object], object]) -> Callable:
+    def method(self: Rope, other: object) -> object:
+        return function(str(self), other)
+
+    return method
+
+
+def _reflected(function: Callable[[object, object], object]) -> Callable:
+    def method(self: Rope, other: object) -> object:
+        return function(other, str(self))
+
+    return method
+
+
+# The math operators apply to ropes like to their str, so 'add' and 'mul'
+# of strings work and the other operators raise the same errors, whatever
+# the length of the string.
+for _name, _function in (
+    ("add", operator.add),
+    ("sub", operator.sub),
+    ("mul", operator.mul),
+    ("truediv", operator.truediv),
+    ("mod", operator.mod),
+    ("divmod", divmod),
+    ("pow", operator.pow),
+):
+    setattr(Rope, f"__{_name}__", _forward(_function))
+    setattr(Rope, f"__r{_name}__", _reflected(_function))
+
+
+String = Union[str, Rope]
+
+
+def isString(value: object) -> bool:
+    """
+    Returns whether a register value is a string, flat or not.
+    """
+    return type(value) is str or type(value) is Rope
+
+
+def concat(a: String, b: String) -> String:
+    """
+    Appends two strings, building a rope once they get long.
+    """
+    if type(b) is Rope:
+        b = str(b)
+
+    if type(a) is Rope:
+        return a.append(b)
+
+    if len(a) + len(b) < MIN_ROPE_LENGTH:
+        return a + b
+
+    return Rope(a).append(b)
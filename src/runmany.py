@@ -0,0 +1,94 @@
+"""
+Runs many cnstr programs in parallel, each in a worker process, and
+reports their output, registers and wall time.
+
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from pool import findPrograms, runPrograms
+from limits import addLimitArguments, limitsFromArguments
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run many cnstr programs in parallel.")
+    parser.add_argument(
+        "programs",
+        nargs="+",
+        help="directories of .cnstr files, or globs matching program files",
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=None,
+        help="number of worker processes, defaults to the number of CPUs",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=("closures", "pyexec"),
+        default="closures",
+        help="run compiled programs as lowered closures, or transpiled to Python",
+    )
+    parser.add_argument(
+        "--legacy-floats",
+        action="store_true",
+        help="make every number a float, like the original interpreter",
+    )
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        help="only report the status and time of each program",
+    )
+    addLimitArguments(parser)
+    args = parser.parse_args()
+
+    paths = findPrograms(args.programs)
+
+    if not paths:
+        print("No programs found.")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    results = runPrograms(
+        paths,
+        args.workers,
+        args.backend,
+        args.legacy_floats,
+        limitsFromArguments(args),
+    )
+    elapsed = time.perf_counter() - start
+
+    for result in results:
+        status = "ok" if result.ok else f"failed ({result.stage})"
+        print(
+            f"{os.path.relpath(result.path)}: {status}, "
+            f"compile {result.compileTime * 1000:.2f} ms, "
+            f"run {result.wallTime * 1000:.2f} ms"
+        )
+
+        if args.quiet:
+            continue
+
+        if result.output:
+            print("*" * 20)
+            print(result.output, end="" if result.output.endswith("\n") else "\n")
+            print("*" * 20)
+
+        if result.error is not None:
+            print(result.error, end="")
+        else:
+            print(f"registers: {result.registers}")
+
+    failed = sum(not result.ok for result in results)
+    print(f"{len(results)} programs, {failed} failed, {elapsed:.2f} s")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+from dataclasses import dataclass
+from typing import Callable
+import marshal
+import os
+import zlib
+
+from errors import CnstrSnapshotError
+
+
+SNAPSHOT_MAGIC = b"CNSTRSN"
+SNAPSHOT_VERSION = 1
+
+
+@dataclass
+class Snapshot:
+    """
+    State of a compiled program's run between two instructions: the index
+    of the next instruction, the registers, the jump points and the output
+    written but not passed on by the sink yet. 'programHash' is the
+    bytecode.programHash() of the program, which resuming checks.
+    """
+
+    programHash: str
+    pc: int
+    registers: dict[str, int | float | str]
+    jumpPoints: dict[str, int]
+    output: str = ""
+
+    def dumps(self) -> bytes:
+        """
+        Serializes the snapshot, compressed.
+        """
+        return SNAPSHOT_MAGIC + zlib.compress(
+            marshal.dumps(
+                (
+                    SNAPSHOT_VERSION,
+                    self.programHash,
+                    self.pc,
+                    tuple(self.registers),
+                    tuple(self.registers.values()),
+                    tuple(self.jumpPoints.items()),
+                    self.output,
+                )
+            ),
+            1,
+        )
+
+    @classmethod
+    def loads(cls, data: bytes) -> "Snapshot":
+        """
+        Deserializes a snapshot. Raises CnstrSnapshotError if the data isn't
+        a snapshot of this version.
+        """
+        if not data.startswith(SNAPSHOT_MAGIC):
+            raise CnstrSnapshotError("Not a snapshot.")
+
+        try:
+            fields = marshal.loads(zlib.decompress(data[len(SNAPSHOT_MAGIC) :]))
+        except (zlib.error, EOFError, ValueError, TypeError):
+            raise CnstrSnapshotError("Snapshot is corrupted.") from None
+
+        if not isinstance(fields, tuple) or len(fields) != 7:
+            raise CnstrSnapshotError("Snapshot is corrupted.")
+
+        version, hash, pc, names, values, jumpPoints, output = fields
+
+        if version != SNAPSHOT_VERSION:
+            raise CnstrSnapshotError(
+                f"Snapshot version {version} is not supported, "
+                f"expected {SNAPSHOT_VERSION}."
+            )
+
+        return cls(hash, pc, dict(zip(names, values)), dict(jumpPoints), output)
+
+    def save(self, path: str) -> None:
+        """
+        Writes the snapshot to a file. The file is replaced at once, so a
+        crash while saving leaves the previous snapshot intact.
+        """
+        temporaryPath = f"{path}.{os.getpid()}.tmp"
+
+        with open(temporaryPath, "wb") as f:
+            f.write(self.dumps())
+
+        os.replace(temporaryPath, path)
+
+    @classmethod
+    def load(cls, path: str) -> "Snapshot":
+        with open(path, "rb") as f:
+            return cls.loads(f.read())
+
+
+@dataclass
+class Checkpoints:
+    """
+    Snapshots a run on the first jump back after every 'every'
+    instructions and passes them to 'save'. Output is flushed before each
+    snapshot, so a run resumed from one doesn't repeat any.
+    """
+
+    every: int
+    save: Callable[[Snapshot], None]
+
+    @classmethod
+    def toFile(cls, path: str, every: int) -> "Checkpoints":
+        """
+        Returns checkpoints which overwrite the snapshot file at the path.
+        """
+        return cls(every, lambda snapshot: snapshot.save(path))
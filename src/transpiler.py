@@ -0,0 +1,499 @@
+from typing import Awaitable, Callable
+import math
+import re
+
+from common import TokenValue
+from compiler import Opcode, OperandKind, Operand, Instruction, Program
+from numerics import zero, divide, divideInts, isIndex, indexLiteral
+from limits import boundedMultiply, boundedPower
+from rope import Rope, concat
+from typeinference import ValueType, ProgramTypes
+
+
+MATH_SYMBOLS = {
+    Opcode.ADD: "+",
+    Opcode.SUB: "-",
+    Opcode.MUL: "*",
+    Opcode.DIV: "/",
+    Opcode.MOD: "%",
+    Opcode.POW: "**",
+}
+
+COMPARE_SYMBOLS = {
+    TokenValue.COMPARE_EQ: "==",
+    TokenValue.COMPARE_NEQ: "!=",
+    TokenValue.COMPARE_GT: ">",
+    TokenValue.COMPARE_LT: "<",
+    TokenValue.COMPARE_GTE: ">=",
+    TokenValue.COMPARE_LTE: "<=",
+}
+
+FUNCTION_NAME = "cnstrProgram"
+
+# Most blocks dispatched by a chain of comparisons, larger programs first
+# bisect the block index down to a chain of at most this many.
+CHAIN_LENGTH = 8
+
+# Generated lines end in a comment with the line of the instruction they
+# come from, to report Python errors on the right line.
+LINE_COMMENT = re.compile(r"  # line (\d+)$")
+
+# The generated function is called with the register slots, the jump point
+# table, the output sink's write and Interpreter.raiseErrorAt.
+ProgramFunction = Callable[
+    [list, dict[str, int], Callable[[str], None], Callable[[int, str], None]],
+    None,
+]
+
+
+class Transpiler:
+    """
+    Transpiles a compiled program into the source of a single Python
+    function, for the pyexec backend.
+
+    Registers become local variables and the control flow becomes a state
+    machine over the basic blocks, a 'while True' loop which runs the block
+    whose index is in 'block'. Blocks which only jump back to themselves
+    become an inner loop.
+
+    The loop bisects the block index with nested ifs down to a short chain
+    of consecutive blocks, so a jump costs O(log blocks) comparisons, and
+    falling through to the next block of the chain costs one.
+    """
+
+    def __init__(
+        self,
+        program: Program,
+        refuel: Callable[[int], int] | None = None,
+        pause: Callable[[], Awaitable[None]] | None = None,
+        types: ProgramTypes | None = None,
+        maxDigits: int | None = None,
+    ) -> None:
+        """
+        :param program: The program to transpile
+        :param refuel: LimitGuard.refuel of the run if it has limits, jumps
+            back then take their span from the fuel
+        :param pause: Makes the function a coroutine which awaits pause()
+            whenever the fuel runs out, refuel is then required
+        :param types: The types of the program, operands whose type is
+            proven aren't checked
+        :param maxDigits: Bound on the ints 'mul' and 'pow' produce
+        """
+        self._program = program
+        self._refuel = refuel
+        self._pause = pause
+        self._types = types
+        self._maxDigits = maxDigits
+        self._constants: list[object] = []
+        self._source = ""
+        self._filename = f"{program.sourcePath or '<cnstr>'} (pyexec)"
+
+        instructions = program.instructions
+        end = len(instructions)
+
+        leaders = {0} | program.jumpTargets()
+        for i, instruction in enumerate(instructions):
+            if instruction.opcode in (Opcode.JMP, Opcode.JMPIF):
+                leaders.add(i + 1)
+
+        starts = sorted(leader for leader in leaders if leader < end)
+        self._blocks = [
+            range(start, stop) for start, stop in zip(starts, starts[1:] + [end])
+        ]
+
+        # Past the last block means the end of the program.
+        self._blockAt = {block.start: b for b, block in enumerate(self._blocks)}
+        self._blockAt[end] = len(self._blocks)
+        self._block = range(0)
+
+        # Duplicated jump points keep their current target in a variable.
+        self._targetNames = {
+            label: f"target{i}"
+            for i, label in enumerate(sorted(program.duplicateJumpPoints))
+        }
+
+    def transpile(self) -> str:
+        """
+        Returns the source of the Python function.
+        """
+        registers = [f"r{slot}" for slot in range(len(self._program.registerNames))]
+        header = f"def {FUNCTION_NAME}(regs, jumpPoints, write, error):"
+        lines = ["async " + header if self._pause is not None else header]
+
+        # Inputs the program doesn't use have slots after its own.
+        n = len(registers)
+
+        if registers:
+            lines.append(f"    {', '.join(registers)}, = regs[:{n}]")
+
+        for label, name in self._targetNames.items():
+            lines.append(f"    {name} = {self._blockOfLabel(label)}")
+
+        if self._refuel is not None:
+            lines.append("    fuel = refuel(0)")
+
+        lines.append("    block = 0")
+        lines.append("    try:")
+        lines.append("        while True:")
+        lines.extend(" " * 12 + line for line in self._dispatch(0, len(self._blocks)))
+        lines.append(f"            if block == {len(self._blocks)}:")
+        lines.append("                break")
+        lines.append("    finally:")
+        lines.append(f"        regs[:{n}] = [{', '.join(registers)}]")
+
+        return "\n".join(lines) + "\n"
+
+    def compile(self) -> ProgramFunction:
+        """
+        Transpiles the program and compiles it into a function.
+        """
+        source = self.transpile()
+        namespace = {
+            "constants": self._constants,
+            "divide": divide,
+            "divideInts": divideInts,
+            "concat": concat,
+            "Rope": Rope,
+            "refuel": self._refuel,
+            "pause": self._pause,
+            "blockStarts": [block.start for block in self._blocks],
+        }
+
+        if self._maxDigits is not None:
+            namespace["multiply"] = boundedMultiply(self._maxDigits)
+            namespace["power"] = boundedPower(self._maxDigits)
+
+        self._source = source
+        exec(compile(source, self._filename, "exec"), namespace)
+
+        return namespace[FUNCTION_NAME]
+
+    def lineNumOf(self, exception: BaseException) -> int:
+        """
+        Returns the line of the program a Python error was raised on, by the
+        compiled function.
+        """
+        lineNum = 0
+        lines = self._source.splitlines()
+        traceback = exception.__traceback__
+
+        while traceback is not None:
+            if traceback.tb_frame.f_code.co_filename == self._filename:
+                match = LINE_COMMENT.search(lines[traceback.tb_lineno - 1])
+                if match:
+                    lineNum = int(match.group(1))
+
+            traceback = traceback.tb_next
+
+        return lineNum
+
+    def _dispatch(self, start: int, stop: int) -> list[str]:
+        # Runs the block of the index among blocks start to stop.
+        if stop - start <= CHAIN_LENGTH:
+            lines = []
+
+            for b in range(start, stop):
+                lines.append(f"if block == {b}:")
+                lines.extend(
+                    "    " + line for line in self.transpileBlock(b, self._blocks[b])
+                )
+
+            return lines
+
+        middle = (start + stop) // 2
+
+        return [
+            f"if block < {middle}:",
+            *("    " + line for line in self._dispatch(start, middle)),
+            "else:",
+            *("    " + line for line in self._dispatch(middle, stop)),
+        ]
+
+    def transpileBlock(self, b: int, block: range) -> list[str]:
+        self._block = block
+        instructions = [self._program.instructions[i] for i in block]
+        last = instructions[-1]
+
+        if (
+            last.opcode in (Opcode.JMP, Opcode.JMPIF)
+            and self._isPlainJump(last)
+            and self._blockOfLabel(last.operands[0][1]) == b
+        ):
+            # Loop which jumps back to its own start.
+            body = self._transpileInstructions(instructions[:-1])
+
+            comment = f"  # line {last.lineNum}"
+
+            if last.opcode == Opcode.JMPIF:
+                body.append(f"if not ({self._condition(last)}):{comment}")
+                body.append("    break")
+
+            if self._refuel is not None:
+                body.extend(line + comment for line in self._burn(str(len(block))))
+
+            lines = ["while True:"]
+            lines.extend("    " + line for line in body)
+            lines.append(f"block = {b + 1}")
+            return lines
+
+        lines = self._transpileInstructions(instructions)
+
+        if last.opcode != Opcode.JMP:
+            lines.append(f"block = {b + 1}")
+
+        return lines
+
+    def _transpileInstructions(self, instructions: list[Instruction]) -> list[str]:
+        lines: list[str] = []
+
+        for instruction in instructions:
+            comment = f"  # line {instruction.lineNum}"
+            lines.extend(
+                line + comment for line in self.transpileInstruction(instruction)
+            )
+
+        return lines or ["pass"]
+
+    def transpileInstruction(self, instruction: Instruction) -> list[str]:
+        opcode = instruction.opcode
+        operands = instruction.operands
+        lineNum = instruction.lineNum
+
+        if opcode == Opcode.NOP:
+            return []
+        elif opcode == Opcode.SETJMPP:
+            (_, label), = operands
+
+            if label not in self._targetNames:
+                return []
+
+            # The target of a duplicated label depends on which definition
+            # was executed last.
+            return [
+                f"jumpPoints[{label!r}] = {lineNum}",
+                f"{self._targetNames[label]} = "
+                f"{self._blockAt[self._program.target(lineNum)]}",
+            ]
+        elif opcode == Opcode.MOV:
+            source, dest = operands
+            return [
+                f"{self._value(dest)} = {self._value(source)}",
+                f"{self._value(source)} = {zero(self._program.legacyFloats)!r}",
+            ]
+        elif opcode in (Opcode.CPY, Opcode.SET):
+            source, dest = operands if opcode == Opcode.CPY else operands[::-1]
+            return [f"{self._value(dest)} = {self._value(source)}"]
+        elif opcode == Opcode.DIV and not self._program.legacyFloats:
+            a, b, dest = operands
+            function = (
+                "divideInts"
+                if self._proven(instruction, ValueType.INT, 0, 1)
+                else "divide"
+            )
+            return [
+                f"{self._value(dest)} = "
+                f"{function}({self._value(a)}, {self._value(b)})"
+            ]
+        elif opcode in (Opcode.MUL, Opcode.POW) and self._maxDigits is not None:
+            a, b, dest = operands
+            function = "multiply" if opcode == Opcode.MUL else "power"
+            return [
+                f"{self._value(dest)} = "
+                f"{function}({self._value(a)}, {self._value(b)})"
+            ]
+        elif opcode in MATH_SYMBOLS:
+            a, b, dest = operands
+            return [
+                f"{self._value(dest)} = "
+                f"{self._value(a)} {MATH_SYMBOLS[opcode]} {self._value(b)}"
+            ]
+        elif opcode == Opcode.STDOUT:
+            pieces = [
+                self._value(piece)
+                if piece[0] == OperandKind.CONSTANT
+                else f"str({self._value(piece)})"
+                for piece in operands
+            ]
+            return [f"write({' + '.join(pieces)})"]
+        elif opcode == Opcode.JMP:
+            (_, label), = operands
+            return self._jump(instruction, label)
+        elif opcode == Opcode.JMPIF:
+            (_, label) = operands[0]
+
+            # The jump point is checked whether or not the jump is taken.
+            if label not in self._program.jumpPoints:
+                return self._jump(instruction, label)
+
+            lines = [f"if {self._condition(instruction)}:"]
+            lines.extend("    " + line for line in self._jump(instruction, label))
+            return lines
+        elif opcode == Opcode.STRLEN:
+            source, dest = operands
+            return [
+                *self._expectString(instruction, "strlen", 0),
+                f"{self._value(dest)} = len({self._value(source)})",
+            ]
+        elif opcode == Opcode.STRAPP:
+            a, b, dest = operands
+            return [
+                *self._expectString(instruction, "strapp", 0),
+                *self._expectString(instruction, "strapp", 1),
+                f"{self._value(dest)} = concat({self._value(a)}, {self._value(b)})",
+            ]
+        elif opcode == Opcode.CHARAT:
+            return self._charAt(instruction)
+        else:
+            raise NotImplementedError("Invalid opcode.")
+
+    def _charAt(self, instruction: Instruction) -> list[str]:
+        a, b, dest = instruction.operands
+        lineNum = instruction.lineNum
+        legacyFloats = self._program.legacyFloats
+        string = self._value(a)
+        lines = self._expectString(instruction, "charat", 0)
+
+        if b[0] == OperandKind.CONSTANT:
+            literal = indexLiteral(b[1])
+            index = repr(literal)
+
+            # With legacy floats a literal index, converted to int, is never
+            # a number.
+            if not isIndex(literal, legacyFloats):
+                message = (
+                    "Invalid command usage for 'charat'. "
+                    f"Expected number, got '{type(literal)}'"
+                )
+                lines.append(f"error({lineNum}, {message!r})")
+                return lines
+
+            # Infinite and NaN literals, which have no Python literal.
+            if not math.isfinite(literal):
+                message = "Invalid command usage for 'charat'. Index out of bounds."
+                lines.append(f"error({lineNum}, {message!r})")
+                return lines
+        else:
+            index = self._value(b)
+            proven = ValueType.FLOAT if legacyFloats else ValueType.NUMBER
+
+            if not self._proven(instruction, proven, 1):
+                types = "(float,)" if legacyFloats else "(int, float)"
+                lines.extend(
+                    [
+                        f"if type({index}) not in {types}:",
+                        f"    error({lineNum}, f\"Invalid command usage for 'charat'. "
+                        f"Expected number, got '{{type({index})}}'\")",
+                    ]
+                )
+
+        lines.extend(
+            [
+                f"if not -1 < {index} < len({string}):",
+                f"    error({lineNum}, \"Invalid command usage for 'charat'. "
+                f"Index out of bounds.\")",
+                f"{self._value(dest)} = {string}[int({index})]",
+            ]
+        )
+        return lines
+
+    def _expectString(
+        self, instruction: Instruction, command: str, n: int
+    ) -> list[str]:
+        operand = instruction.operands[n]
+
+        if operand[0] == OperandKind.CONSTANT:
+            if isinstance(operand[1], str):
+                return []
+
+            message = (
+                f"Invalid command usage for '{command}'. "
+                f"Expected string, got '{type(operand[1])}'"
+            )
+            return [f"error({instruction.lineNum}, {message!r})"]
+
+        if self._proven(instruction, ValueType.STRING, n):
+            return []
+
+        value = self._value(operand)
+        return [
+            f"if type({value}) is not str and type({value}) is not Rope:",
+            f"    error({instruction.lineNum}, f\"Invalid command usage for "
+            f"'{command}'. Expected string, got '{{type({value})}}'\")",
+        ]
+
+    def _proven(
+        self, instruction: Instruction, types: ValueType, *operands: int
+    ) -> bool:
+        # Whether the operands of the instruction are always of the types.
+        return self._types is not None and all(
+            self._types.proven(instruction, operand, types) for operand in operands
+        )
+
+    def _condition(self, instruction: Instruction) -> str:
+        _, a, (_, compare), b = instruction.operands
+        return f"{self._value(a)} {COMPARE_SYMBOLS[compare]} {self._value(b)}"
+
+    def _jump(self, instruction: Instruction, label: str) -> list[str]:
+        if label not in self._program.jumpPoints:
+            message = f"Jump point '{label}' does not exist."
+            return [f"error({instruction.lineNum}, {message!r})"]
+
+        b = self._blockAt[self._block.start]
+        last = self._block.stop - 1
+
+        if label in self._targetNames:
+            name = self._targetNames[label]
+            lines = [f"block = {name}", "continue"]
+
+            if self._refuel is not None:
+                span = f"{last + 1} - blockStarts[{name}]"
+                lines[:0] = [
+                    f"if {name} <= {b}:",
+                    *("    " + line for line in self._burn(f"({span})")),
+                ]
+
+            return lines
+
+        target = self._blockOfLabel(label)
+        lines = [f"block = {target}", "continue"]
+
+        if self._refuel is not None and target <= b:
+            lines[:0] = self._burn(str(last + 1 - self._blocks[target].start))
+
+        return lines
+
+    def _burn(self, span: str) -> list[str]:
+        # Jumps back take their span from the fuel, see LimitGuard.
+        lines = [f"fuel -= {span}", "if fuel < 0:", "    fuel = refuel(fuel)"]
+
+        if self._pause is not None:
+            lines.append("    await pause()")
+
+        return lines
+
+    def _isPlainJump(self, instruction: Instruction) -> bool:
+        (_, label) = instruction.operands[0]
+        return (
+            label in self._program.jumpPoints
+            and label not in self._program.duplicateJumpPoints
+        )
+
+    def _blockOfLabel(self, label: str) -> int:
+        # Execution continues on the line after the jump point.
+        return self._blockAt[self._program.target(self._program.jumpPoints[label])]
+
+    def _value(self, operand: Operand) -> str:
+        kind, value = operand
+
+        if kind == OperandKind.REGISTER:
+            return f"r{value}"
+
+        if isinstance(value, str) or type(value) is int or (
+            type(value) is float and math.isfinite(value)
+        ):
+            literal = repr(value)
+            return f"({literal})" if literal.startswith("-") else literal
+
+        # inf and nan have no literal.
+        self._constants.append(value)
+        return f"constants[{len(self._constants) - 1}]"
@@ -0,0 +1,415 @@
+from enum import IntFlag
+from typing import Iterator, Mapping
+
+from common import TokenValue, formatTokenList, recreateLine
+from compiler import Opcode, OperandKind, Operand, Instruction, Program
+from controlflow import EXIT, buildBlocks
+from errors import ErrorDetail
+from numerics import zero, isIndex, indexLiteral
+from rope import isString
+
+
+class ValueType(IntFlag):
+    """
+    The types a register can hold at a point of a program, as a set.
+    Strings include ropes.
+    """
+
+    INT = 1
+    FLOAT = 2
+    STRING = 4
+    NUMBER = INT | FLOAT
+    ANY = INT | FLOAT | STRING
+
+
+# The types as plain ints for the analysis, operations on flags are slow.
+INT, FLOAT, STRING, NUMBER, ANY = map(
+    int,
+    (ValueType.INT, ValueType.FLOAT, ValueType.STRING, ValueType.NUMBER, ValueType.ANY),
+)
+
+MATH_OPCODES = (
+    Opcode.ADD,
+    Opcode.SUB,
+    Opcode.MUL,
+    Opcode.DIV,
+    Opcode.MOD,
+    Opcode.POW,
+)
+
+# Opcodes whose checks the backends leave out when the types are proven.
+CHECKED_OPCODES = (Opcode.DIV, Opcode.STRLEN, Opcode.STRAPP, Opcode.CHARAT)
+
+ORDERING_COMPARES = (
+    TokenValue.COMPARE_GT,
+    TokenValue.COMPARE_LT,
+    TokenValue.COMPARE_GTE,
+    TokenValue.COMPARE_LTE,
+)
+
+State = list[int]
+
+
+def worthInferring(program: Program) -> bool:
+    """
+    Returns whether the backends gain from the types of the program: it has
+    instructions with checks inside a loop. Without jumps back every
+    instruction runs once at most, and checking it is cheaper than
+    inferring the types.
+    """
+    instructions = program.instructions
+
+    if not any(instruction.opcode in CHECKED_OPCODES for instruction in instructions):
+        return False
+
+    for i, instruction in enumerate(instructions):
+        if instruction.opcode in (Opcode.JMP, Opcode.JMPIF):
+            label = instruction.operands[0][1]
+
+            if label in program.duplicateJumpPoints or (
+                label in program.jumpPoints
+                and program.target(program.jumpPoints[label]) <= i
+            ):
+                return True
+
+    return False
+
+
+def typeOf(value: object) -> int:
+    if type(value) is int:
+        return INT
+    if type(value) is float:
+        return FLOAT
+    if isString(value):
+        return STRING
+
+    return ANY
+
+
+def mathResult(opcode: Opcode, a: int, b: int, legacyFloats: bool) -> int:
+    """
+    Returns the type of the result of a math instruction on the operand
+    types, if it doesn't fail.
+    """
+    # Strings, ropes included, can be added to strings, multiplied by ints
+    # and formatted with 'mod', which all give strings. Complex numbers come
+    # from fractional powers of negative floats.
+    if (a | b) & STRING:
+        if opcode == Opcode.ADD and a == b == STRING:
+            return STRING
+        if opcode == Opcode.MUL and {a, b} == {STRING, INT}:
+            return STRING
+        if opcode == Opcode.MOD and a == STRING:
+            return STRING
+
+        return ANY
+    if opcode == Opcode.POW:
+        return NUMBER if a == b == INT else ANY
+    if opcode == Opcode.DIV and legacyFloats:
+        return FLOAT
+    if a == FLOAT or b == FLOAT:
+        return FLOAT
+    if a == b == INT and opcode != Opcode.DIV:
+        return INT
+
+    return NUMBER
+
+
+def transfer(program: Program, instruction: Instruction, state: State) -> None:
+    """
+    Updates the register types before the instruction to those after it.
+    """
+    opcode = instruction.opcode
+    operands = instruction.operands
+
+    if opcode == Opcode.SET:
+        (_, dest), (_, value) = operands
+        state[dest] = typeOf(value)
+    elif opcode == Opcode.CPY:
+        (_, source), (_, dest) = operands
+        state[dest] = state[source]
+    elif opcode == Opcode.MOV:
+        (_, source), (_, dest) = operands
+        state[dest] = state[source]
+        state[source] = typeOf(zero(program.legacyFloats))
+    elif opcode in MATH_OPCODES:
+        a, b, (_, dest) = operands
+        state[dest] = mathResult(
+            opcode,
+            operandType(a, state),
+            operandType(b, state),
+            program.legacyFloats,
+        )
+    elif opcode == Opcode.STRLEN:
+        state[operands[1][1]] = INT
+    elif opcode in (Opcode.STRAPP, Opcode.CHARAT):
+        state[operands[2][1]] = STRING
+
+
+def operandType(operand: Operand, state: State) -> int:
+    kind, value = operand
+
+    if kind == OperandKind.REGISTER:
+        return state[value]
+
+    return typeOf(value)
+
+
+class ProgramTypes:
+    """
+    Types of the registers at every reachable instruction of a program,
+    from TypeInference.
+    """
+
+    def __init__(
+        self, program: Program, blocks: list[range], entryStates: list[State | None]
+    ) -> None:
+        self._program = program
+        self._blocks = blocks
+        self._entryStates = entryStates
+
+        # Operand types of the instructions with checks, by line number.
+        self._operandTypes: dict[int, tuple[int, ...]] = {}
+
+        for instruction, types in self._walk(CHECKED_OPCODES):
+            self._operandTypes[instruction.lineNum] = types
+
+    def proven(self, instruction: Instruction, operand: int, types: ValueType) -> bool:
+        """
+        Returns whether an operand of a 'div', 'strlen', 'strapp' or 'charat'
+        instruction is always of the types when it runs.
+        """
+        operandTypes = self._operandTypes.get(instruction.lineNum)
+
+        return operandTypes is not None and operandTypes[operand] & ~types == 0
+
+    def registerTypes(self, index: int) -> dict[str, ValueType] | None:
+        """
+        Returns the types of the registers before the instruction at the
+        index runs, None if it is never reached.
+        """
+        for b, block in enumerate(self._blocks):
+            if index in block:
+                break
+        else:
+            return None
+
+        if self._entryStates[b] is None:
+            return None
+
+        state = list(self._entryStates[b])
+        for i in range(block.start, index):
+            transfer(self._program, self._program.instructions[i], state)
+
+        return {
+            name: ValueType(types)
+            for name, types in zip(self._program.registerNames, state)
+        }
+
+    def errors(self) -> list[ErrorDetail]:
+        """
+        Returns the type errors which happen whenever their instruction is
+        reached, in line order.
+        """
+        errors = []
+
+        for instruction, types in self._walk():
+            message = typeError(self._program, instruction, types)
+
+            if message is not None:
+                line = self._program.line(instruction.lineNum)
+                errors.append(
+                    ErrorDetail(
+                        instruction.lineNum,
+                        message,
+                        recreateLine(line),
+                        formatTokenList(line),
+                    )
+                )
+
+        errors.sort(key=lambda error: error.lineNum)
+        return errors
+
+    def _walk(
+        self, opcodes: tuple[Opcode, ...] | None = None
+    ) -> Iterator[tuple[Instruction, tuple[int, ...]]]:
+        # Yields the reachable instructions with the opcodes and the types of
+        # their operands.
+        instructions = self._program.instructions
+
+        for b, block in enumerate(self._blocks):
+            if self._entryStates[b] is None:
+                continue
+
+            state = list(self._entryStates[b])
+            for i in block:
+                instruction = instructions[i]
+
+                if opcodes is None or instruction.opcode in opcodes:
+                    yield instruction, tuple(
+                        operandType(operand, state) for operand in instruction.operands
+                    )
+
+                transfer(self._program, instruction, state)
+
+
+class TypeInference:
+    """
+    Infers the types of the registers at every instruction of a compiled
+    program, over the control flow graph of its jumps, so the backends can
+    leave out the type checks of operands whose type is proven.
+
+    Registers start out with the types of the inputs and zero otherwise.
+    Without inputs nothing is assumed about them, e.g. for a run resumed
+    from a snapshot.
+    """
+
+    def __init__(
+        self,
+        program: Program,
+        inputs: Mapping[str, int | float | str] | None = None,
+    ) -> None:
+        self._program = program
+        self._inputs = inputs
+
+    def infer(self) -> ProgramTypes:
+        program = self._program
+        instructions = program.instructions
+        blocks, successors = buildBlocks(program, instructions)
+
+        entryStates: list[State | None] = [None] * len(blocks)
+        if blocks:
+            entryStates[0] = self._entryState()
+
+        worklist = [0] if blocks else []
+        while worklist:
+            b = worklist.pop()
+            state = list(entryStates[b])
+
+            for i in blocks[b]:
+                transfer(program, instructions[i], state)
+
+            for successor in successors[b]:
+                if successor == EXIT:
+                    continue
+
+                previous = entryStates[successor]
+                if previous is None:
+                    entryStates[successor] = state
+                    worklist.append(successor)
+                    continue
+
+                merged = [x | y for x, y in zip(previous, state)]
+                if merged != previous:
+                    entryStates[successor] = merged
+                    worklist.append(successor)
+
+        return ProgramTypes(program, blocks, entryStates)
+
+    def _entryState(self) -> State:
+        if self._inputs is None:
+            return [ANY] * len(self._program.registerNames)
+
+        cleared = zero(self._program.legacyFloats)
+
+        return [
+            typeOf(self._inputs.get(name, cleared))
+            for name in self._program.registerNames
+        ]
+
+
+def typeError(
+    program: Program, instruction: Instruction, types: tuple[int, ...]
+) -> str | None:
+    """
+    Returns the message of the type error the instruction always raises
+    with operands of the types, if any.
+    """
+    opcode = instruction.opcode
+    operands = instruction.operands
+    command = opcode.name.lower()
+
+    def alwaysString(n: int) -> bool:
+        return types[n] == STRING
+
+    def neverString(n: int) -> bool:
+        return types[n] & STRING == 0
+
+    if opcode in (Opcode.STRLEN, Opcode.STRAPP, Opcode.CHARAT):
+        strings = (0, 1) if opcode == Opcode.STRAPP else (0,)
+
+        for n in strings:
+            if neverString(n):
+                return (
+                    f"'{command}' expects a string, but "
+                    f"{describe(program, operands[n])} is always a number here."
+                )
+
+    if opcode == Opcode.CHARAT:
+        kind, index = operands[1]
+        legacyFloats = program.legacyFloats
+
+        if kind == OperandKind.CONSTANT:
+            fails = not isIndex(indexLiteral(index), legacyFloats)
+        else:
+            allowed = FLOAT if legacyFloats else NUMBER
+            fails = types[1] & allowed == 0
+
+        if fails:
+            return (
+                f"'charat' expects a number, but "
+                f"{describe(program, operands[1])} is never one here."
+            )
+
+    elif opcode in MATH_OPCODES:
+        if opcode == Opcode.ADD:
+            fails = (
+                alwaysString(0) and neverString(1)
+                or neverString(0) and alwaysString(1)
+            )
+        elif opcode == Opcode.MUL:
+            fails = alwaysString(0) and alwaysString(1)
+        elif opcode == Opcode.MOD:
+            # Strings are formatted with %.
+            fails = neverString(0) and alwaysString(1)
+        else:
+            fails = alwaysString(0) or alwaysString(1)
+
+        if fails:
+            return (
+                f"'{command}' always fails here, with "
+                f"{describeTyped(program, operands[0], types[0])} and "
+                f"{describeTyped(program, operands[1], types[1])}."
+            )
+
+    elif opcode == Opcode.JMPIF:
+        compare = operands[2][1]
+
+        if compare in ORDERING_COMPARES and (
+            alwaysString(1) and neverString(3) or neverString(1) and alwaysString(3)
+        ):
+            return (
+                f"'jmpif' always fails here, comparing "
+                f"{describeTyped(program, operands[1], types[1])} and "
+                f"{describeTyped(program, operands[3], types[3])}."
+            )
+
+    return None
+
+
+def describe(program: Program, operand: Operand) -> str:
+    kind, value = operand
+
+    if kind == OperandKind.REGISTER:
+        return f"'{program.registerNames[value]}'"
+
+    return repr(value)
+
+
+def describeTyped(program: Program, operand: Operand, types: int) -> str:
+    kind = "string" if types == STRING else "number"
+
+    if operand[0] == OperandKind.REGISTER:
+        return f"the {kind} in {describe(program, operand)}"
+
+    return f"the {kind} {describe(program, operand)}"
@@ -0,0 +1,126 @@
+import unittest
+
+import api
+from api import compileProgram, run
+from errors import CnstrSyntaxError, CnstrRuntimeError
+from lexer import Lexer
+from interpreter import Interpreter
+
+BACKENDS = ("closures", "pyexec")
+
+
+class TestApi(unittest.TestCase):
+    def test_run(self):
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                result = run(
+                    "add ra rb rc\nstdout rc endl\n",
+                    {"ra": 2, "rb": 0.5},
+                    backend=backend,
+                )
+                self.assertEqual(result.output, "2.5\n")
+                self.assertEqual(result.registers, {"ra": 2, "rb": 0.5, "rc": 2.5})
+
+    def test_inputs_not_in_program(self):
+        result = run("stdout ra endl\n", {"ra": "x", "rz": 1})
+        self.assertEqual(result.output, "x\n")
+        self.assertEqual(result.registers["rz"], 1)
+
+        with self.assertRaises(TypeError):
+            run("stdout ra\n", {"ra": [1]})
+
+    def test_unused_inputs(self):
+        for backend in BACKENDS:
+            for source in ('stdout "x"\n', 'set ra 1\nstdout "x"\n'):
+                with self.subTest(backend=backend, source=source):
+                    result = run(source, {"rs": 3, "rt": "y"}, backend=backend)
+                    self.assertEqual(result.output, "x")
+                    self.assertEqual(result.registers["rs"], 3)
+                    self.assertEqual(result.registers["rt"], "y")
+
+    def test_compiled_programs_are_cached(self):
+        source = "set ra 1\nadd ra 1 ra\n"
+        program = compileProgram(source)
+        self.assertIs(compileProgram(source), program)
+        self.assertEqual(run(program).registers, {"ra": 2})
+
+    def test_syntax_error(self):
+        with self.assertRaises(CnstrSyntaxError) as context:
+            run("set ra 1\nbogus ra\nset rb\n")
+
+        error = context.exception
+        self.assertEqual(error.stage, "tokenizing")
+        self.assertEqual(error.lineNum, 1)
+        self.assertEqual(error.message, "Invalid token: bogus")
+
+        with self.assertRaises(CnstrSyntaxError) as context:
+            run("set ra 1\nset rb\nset rc\n")
+
+        error = context.exception
+        self.assertEqual(error.stage, "compiling")
+        self.assertEqual([detail.lineNum for detail in error.errors], [1, 2])
+        self.assertEqual(error.line, "set rb")
+        self.assertEqual(error.tokens, "COMMAND<SET> REGISTER")
+
+    def test_runtime_error(self):
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                with self.assertRaises(CnstrRuntimeError) as context:
+                    run('stdout "a" endl\nstrlen ra rb\n', backend=backend)
+
+                error = context.exception
+                self.assertEqual(error.lineNum, 1)
+                self.assertEqual(
+                    error.message,
+                    "Invalid command usage for 'strlen'. Expected string, got '<class 'int'>'",
+                )
+                self.assertEqual(error.line, "strlen ra rb")
+                self.assertEqual(error.tokens, "COMMAND<STRLEN> REGISTER REGISTER")
+                self.assertEqual(error.output, "a\n")
+
+    def test_undefined_jump_points(self):
+        # Reported before the program runs, by every backend.
+        source = 'stdout "a" endl\njmp "nowhere"\njmpif "gone" ra > 1\n'
+
+        with self.assertRaises(CnstrSyntaxError) as context:
+            run(source)
+
+        with self.assertRaises(CnstrSyntaxError) as reference:
+            Interpreter(Lexer(source).tokenize()).interpret()
+
+        for error in (context.exception, reference.exception):
+            self.assertEqual(error.stage, "linking")
+            self.assertEqual([detail.lineNum for detail in error.errors], [1, 2])
+            self.assertEqual(error.message, "Jump point 'nowhere' does not exist.")
+            self.assertEqual(error.line, "jmp 'nowhere'")
+            self.assertEqual(error.tokens, "COMMAND<JMP> LITERAL<STRING>")
+            self.assertEqual(error.errors[1].message, "Jump point 'gone' does not exist.")
+
+    def test_python_errors(self):
+        # Python errors are reported on the line which raised them, also
+        # inside superinstructions.
+        source = 'set ra 1\nstdout "a"\ndiv ra 0 rb\nset rc 2\n'
+
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                with self.assertRaises(CnstrRuntimeError) as context:
+                    run(source, backend=backend)
+
+                self.assertEqual(context.exception.lineNum, 2)
+                self.assertIn("ZeroDivisionError", context.exception.message)
+
+        with self.assertRaises(CnstrRuntimeError) as context:
+            Interpreter(Lexer(source).tokenize()).interpret()
+
+        self.assertEqual(context.exception.lineNum, 2)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            run("set ra 1\n", backend="native")
+
+    def tearDown(self):
+        api.compileProgram.cache_clear()
+
+
+if __name__ == "__main__":
+    unittest.main()
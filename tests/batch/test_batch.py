@@ -0,0 +1,172 @@
+import unittest
+
+from lexer import Lexer
+from compiler import Program
+from interpreter import Interpreter
+from errors import CnstrSyntaxError
+from tests.helpers import run
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+if numpy is not None:
+    from batch import BatchRunner
+
+
+def compileSource(source: str, legacyFloats: bool = False) -> Program:
+    return Interpreter(Lexer(source, legacyFloats).tokenize(), legacyFloats=legacyFloats).compile()
+
+
+def runLane(source: str, registers: dict, legacyFloats: bool = False) -> tuple[str, dict, bool]:
+    """
+    Runs a single lane with the closures backend, setting its registers first.
+    """
+    setup = "".join(f"set {name} {value!r}\n" for name, value in registers.items())
+    output, interpreter, error = run(setup + source, "closures", legacyFloats)
+
+    return output, dict(interpreter._registers), error is not None
+
+
+@unittest.skipUnless(numpy, "numpy is not installed")
+class TestBatch(unittest.TestCase):
+    def assertSameAsLanes(self, source: str, inputs: dict, legacyFloats: bool = False):
+        result = BatchRunner(compileSource(source, legacyFloats), inputs).run()
+        lanes = len(next(iter(inputs.values())))
+
+        for lane in range(lanes):
+            registers = {name: values[lane] for name, values in inputs.items()}
+            output, expectedRegisters, failed = runLane(source, registers, legacyFloats)
+
+            with self.subTest(lane=lane, registers=registers):
+                self.assertEqual(result.outputs[lane], output)
+                self.assertEqual(result.errors[lane] is not None, failed)
+
+                if not failed:
+                    for name, value in result.lane(lane).items():
+                        self.assertEqual(value, expectedRegisters[name])
+                        self.assertIs(type(value), type(expectedRegisters[name]))
+
+        return result
+
+    def test_straight_line_math(self):
+        self.assertSameAsLanes(
+            "add ra rb rc\n"
+            "mul rc 2 rd\n"
+            "div rd 4 re\n"
+            "pow ra 2 rf\n"
+            "mod rb 3 rg\n"
+            "stdout rc ' ' re ' ' rf ' ' rg\n",
+            {"ra": [1, 2, 3.5, -4], "rb": [2, -7, 0.25, 8]},
+        )
+
+    def test_divergent_loops(self):
+        # Every lane loops a different number of times, then joins up again.
+        self.assertSameAsLanes(
+            'setjmpp "loop"\n'
+            "add rc ra rc\n"
+            "sub rn 1 rn\n"
+            'jmpif "loop" rn > 0\n'
+            "stdout 'sum ' rc\n",
+            {"ra": [1, 2, 3, 4, 5], "rn": [1, 5, 0, 3, 10]},
+        )
+
+    def test_branches(self):
+        self.assertSameAsLanes(
+            "mod ra 2 rm\n"
+            'jmpif "odd" rm = 1\n'
+            "stdout 'even'\n"
+            'jmp "done"\n'
+            'setjmpp "odd"\n'
+            "stdout 'odd'\n"
+            'setjmpp "done"\n'
+            "stdout ' ' ra\n",
+            {"ra": [0, 1, 2, 3, 4, 7]},
+        )
+
+    def test_errors_stop_single_lanes(self):
+        result = self.assertSameAsLanes(
+            "stdout 'a'\n"
+            "charat ra rb rc\n"
+            "stdout rc\n",
+            {"ra": ["hello", "hi", "hey"], "rb": [1, 5, 2]},
+        )
+        self.assertIsNone(result.errors[0])
+        self.assertIn("Index out of bounds", result.errors[1])
+        self.assertEqual(result.outputs, ["ae", "a", "ay"])
+
+    def test_division_by_zero(self):
+        result = BatchRunner(
+            compileSource("div ra rb rc\nstdout rc\n"), {"ra": [1, 2], "rb": [0, 4]}
+        ).run()
+        self.assertIn("ZeroDivisionError", result.errors[0])
+        self.assertEqual(result.outputs, ["", "0.5"])
+
+    def test_strings(self):
+        self.assertSameAsLanes(
+            "strlen ra rl\n"
+            "strapp ra '!' rb\n"
+            "cpy rl rc\n"
+            "stdout rb ' ' rc\n"
+            'jmpif "long" rl > 3\n'
+            "set rc 'short'\n"
+            'setjmpp "long"\n'
+            "stdout ' ' rc\n",
+            {"ra": ["ab", "abcd", "", "hello"]},
+        )
+
+    def test_legacy_floats(self):
+        self.assertSameAsLanes(
+            "add ra 1 rb\n"
+            "div rb 2 rc\n"
+            "stdout rb ' ' rc ' ' rd\n",
+            {"ra": [1.0, 2.5, -3.0]},
+            legacyFloats=True,
+        )
+
+    def test_duplicate_jump_points(self):
+        self.assertSameAsLanes(
+            'jmpif "second" ra > 0\n'
+            'setjmpp "target"\n'
+            "stdout 'first '\n"
+            'jmpif "end" rb = 1\n'
+            "set rb 1\n"
+            'jmp "target"\n'
+            'setjmpp "second"\n'
+            'setjmpp "target"\n'
+            "stdout 'second '\n"
+            'jmpif "end" rb = 1\n'
+            "set rb 1\n"
+            'jmp "target"\n'
+            'setjmpp "end"\n',
+            {"ra": [0, 1], "rb": [0, 0]},
+        )
+
+    def test_missing_jump_point(self):
+        # Programs with undefined jump points don't get to run any lanes.
+        with self.assertRaises(CnstrSyntaxError) as context:
+            compileSource("jmpif \"nowhere\" ra > 1\nstdout 'ok'\n")
+
+        self.assertEqual(context.exception.stage, "linking")
+
+    def test_numpy_inputs(self):
+        result = BatchRunner(
+            compileSource("mul ra 3 rb\n"), {"ra": numpy.arange(5)}
+        ).run()
+        self.assertEqual(result.column("rb"), [0, 3, 6, 9, 12])
+        self.assertIs(type(result.column("rb")[1]), int)
+
+    def test_lane_count(self):
+        result = BatchRunner(compileSource("stdout 'x'\n"), {}, lanes=3).run()
+        self.assertEqual(result.outputs, ["x", "x", "x"])
+
+        with self.assertRaises(ValueError):
+            BatchRunner(compileSource("stdout ra\n"), {"ra": [1], "rb": [1, 2]})
+
+        with self.assertRaises(ValueError):
+            BatchRunner(compileSource("stdout ra\n"), {"rz": [1]})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+# The runner imports the synthetic programs from its own directory.
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "benchmarks"))
+import run_benchmarks
+
+BASELINE = {"lexer/tokenize": 1e-3, "opcode/add": 1e-7, "opcode/mul": 2e-7}
+
+
+class TestRunBenchmarks(unittest.TestCase):
+    def compare(self, results: dict, threshold: float = 0.25) -> tuple[list, str]:
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            regressions = run_benchmarks.compare(results, BASELINE, threshold)
+
+        return regressions, output.getvalue()
+
+    def main(self, *arguments: str) -> str:
+        argv = ["run_benchmarks.py", "--repeat", "1", "--retries", "1", *arguments]
+
+        with mock.patch.object(sys, "argv", argv):
+            with contextlib.redirect_stdout(io.StringIO()) as output:
+                run_benchmarks.main()
+
+        return output.getvalue()
+
+    def test_compare(self):
+        results = {"lexer/tokenize": 1.2e-3, "opcode/add": 0.5e-7, "opcode/set": 1e-7}
+        regressions, output = self.compare(results)
+
+        self.assertEqual(regressions, [])
+        self.assertIn("+20.0%", output)
+        self.assertIn("-50.0%", output)
+        self.assertIn("(new)", output)
+        self.assertNotIn("REGRESSION", output)
+
+        results = {"lexer/tokenize": 1.3e-3, "opcode/add": 1e-7, "opcode/mul": 6e-7}
+        regressions, output = self.compare(results)
+
+        self.assertEqual(regressions, ["lexer/tokenize", "opcode/mul"])
+        self.assertEqual(output.count("REGRESSION"), 2)
+        self.assertEqual(self.compare(results, threshold=2.5)[0], [])
+
+    def test_saved_baseline(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        saved = os.path.join(directory.name, "saved.json")
+        baseline = os.path.join(directory.name, "baseline.json")
+
+        self.main("-k", "opcode/set", "--save-baseline", saved)
+
+        with open(saved, "r") as f:
+            data = json.load(f)
+
+        self.assertEqual(list(data["results"]), ["opcode/set"])
+
+        # A baseline ten times as slow passes.
+        data["results"]["opcode/set"] *= 10
+
+        with open(baseline, "w") as f:
+            json.dump(data, f)
+
+        output = self.main("-k", "opcode/set", "--baseline", baseline)
+        self.assertNotIn("REGRESSION", output)
+
+        # A baseline ten times as fast fails, even after timing again.
+        data["results"]["opcode/set"] /= 100
+
+        with open(baseline, "w") as f:
+            json.dump(data, f)
+
+        with self.assertRaises(SystemExit) as context:
+            self.main("-k", "opcode/set", "--baseline", baseline)
+
+        self.assertEqual(context.exception.code, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+
+from lexer import Lexer
+from interpreter import Interpreter
+from bytecode import Bytecode, BytecodeCache, sourceHash
+
+SOURCE = (
+    "// comment\n"
+    'set rs "hi"\n'
+    "set ra 1\n"
+    'setjmpp "loop"\n'
+    "add ra 1 ra\n"
+    "stdout rs ra endl\n"
+    'jmpif "loop" ra < 3\n'
+)
+
+
+def compileSource(source: str):
+    return Interpreter(Lexer(source).tokenize()).compile()
+
+
+class TestBytecode(unittest.TestCase):
+    def test_round_trip(self):
+        program = compileSource(SOURCE)
+        data = Bytecode.fromProgram(program).dumps(sourceHash(SOURCE))
+        loaded = Bytecode.loads(data, sourceHash(SOURCE)).toProgram(SOURCE)
+
+        self.assertEqual(loaded.instructions, program.instructions)
+        self.assertEqual(loaded.jumpPoints, program.jumpPoints)
+        self.assertEqual(loaded.line(4), program.lines[4])
+
+    def test_hash_mismatch(self):
+        data = Bytecode.fromProgram(compileSource(SOURCE)).dumps(sourceHash(SOURCE))
+
+        self.assertIsNone(Bytecode.loads(data, sourceHash(SOURCE + "\n")))
+        self.assertIsNone(Bytecode.loads(b"garbage"))
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = BytecodeCache(os.path.join(directory, "program.cnstr"))
+
+            self.assertIsNone(cache.load(SOURCE))
+            self.assertTrue(cache.store(SOURCE, compileSource(SOURCE)))
+            self.assertIsNotNone(cache.load(SOURCE))
+            self.assertIsNone(cache.load(SOURCE.replace("3", "4")))
+
+            # Optimized programs depend on the digit limit they were folded under.
+            path = os.path.join(directory, "program.cnstr")
+            paths = {
+                BytecodeCache(path).path,
+                BytecodeCache(path, 1).path,
+                BytecodeCache(path, 1, maxDigits=100).path,
+                BytecodeCache(path, 1, maxDigits=200).path,
+            }
+            self.assertEqual(len(paths), 4)
+            self.assertEqual(
+                BytecodeCache(path, 0, maxDigits=100).path, BytecodeCache(path).path
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
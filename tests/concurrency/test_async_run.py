@@ -0,0 +1,147 @@
+import asyncio
+import unittest
+
+from lexer import Lexer
+from interpreter import Interpreter
+from errors import CnstrRuntimeError, CnstrLimitError
+from limits import Limits
+from output import CaptureSink, AsyncSink
+import api
+
+BACKENDS = ("closures", "unfused", "pyexec")
+
+PROGRAMS = (
+    'set rn 10\nsetjmpp "loop"\nstdout rn ,\nsub rn 1 rn\njmpif "loop" rn > 0\n',
+    'set rs "ab"\nsetjmpp "loop"\nstrapp rs "c" rs\nadd ri 1 ri\n'
+    'jmpif "loop" ri < 5\nstdout rs endl\n',
+    'set ra 3\nsetjmpp "a"\nsub ra 1 ra\nsetjmpp "a"\nadd rb 1 rb\n'
+    'jmpif "a" rb < 4\nstdout ra rb\n',
+)
+
+COUNTER = 'setjmpp "loop"\nstdout "{name}"\nadd ri 1 ri\njmpif "loop" ri < 50\n'
+
+FOREVER = 'setjmpp "loop"\nadd ra 1 ra\njmp "loop"\n'
+
+
+async def execute(
+    source: str,
+    backend: str,
+    sink=None,
+    limits: Limits | None = None,
+    sliceSize: int = 100,
+) -> Interpreter:
+    interpreter = Interpreter(
+        Lexer(source).tokenize(), sink or CaptureSink(), limits=limits
+    )
+
+    if backend == "closures":
+        await interpreter.runAsync(sliceSize=sliceSize)
+    elif backend == "unfused":
+        await interpreter.runAsync(sliceSize=sliceSize, fuse=False)
+    else:
+        await interpreter.runTranspiledAsync(sliceSize=sliceSize)
+
+    return interpreter
+
+
+class StreamRecorder:
+    """Stands in for an asyncio.StreamWriter"""
+
+    def __init__(self) -> None:
+        self.data = b""
+        self.drains = 0
+
+    def write(self, data: bytes) -> None:
+        self.data += data
+
+    async def drain(self) -> None:
+        self.drains += 1
+
+
+class TestAsyncRun(unittest.TestCase):
+    def test_same_as_run(self):
+        for source in PROGRAMS:
+            sink = CaptureSink()
+            expected = Interpreter(Lexer(source).tokenize(), sink)
+            expected.run()
+
+            for backend in BACKENDS:
+                with self.subTest(source=source, backend=backend):
+                    output = CaptureSink()
+                    interpreter = asyncio.run(execute(source, backend, output, sliceSize=1))
+
+                    self.assertEqual(output.getvalue(), sink.getvalue())
+                    self.assertEqual(
+                        dict(interpreter._registers), dict(expected._registers)
+                    )
+
+    def test_programs_take_turns(self):
+        async def both(backend: str, sink: CaptureSink) -> None:
+            await asyncio.gather(
+                execute(COUNTER.format(name="a"), backend, sink, sliceSize=10),
+                execute(COUNTER.format(name="b"), backend, sink, sliceSize=10),
+            )
+
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                sink = CaptureSink()
+                asyncio.run(both(backend, sink))
+                output = sink.getvalue().decode()
+
+                self.assertEqual(sorted(output), ["a"] * 50 + ["b"] * 50)
+                self.assertLess(output.index("b"), output.rindex("a"))
+
+    def test_endless_program_can_be_cancelled(self):
+        async def timeout(backend: str) -> None:
+            await asyncio.wait_for(execute(FOREVER, backend), 0.05)
+
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                with self.assertRaises(asyncio.TimeoutError):
+                    asyncio.run(timeout(backend))
+
+    def test_limits(self):
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                with self.assertRaises(CnstrLimitError) as context:
+                    asyncio.run(
+                        execute(FOREVER, backend, limits=Limits(maxInstructions=1000))
+                    )
+
+                self.assertEqual(context.exception.limit, "instructions")
+                self.assertEqual(context.exception.lineNum, 2)
+
+    def test_runtime_error(self):
+        source = 'set ra 5\nsetjmpp "loop"\nsub ra 1 ra\ndiv 1 ra rb\njmp "loop"\n'
+
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                with self.assertRaises(CnstrRuntimeError) as context:
+                    asyncio.run(execute(source, backend, sliceSize=1))
+
+                self.assertEqual(context.exception.lineNum, 3)
+                self.assertIn("ZeroDivisionError", context.exception.message)
+
+    def test_async_sink(self):
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                stream = StreamRecorder()
+                asyncio.run(
+                    execute(COUNTER.format(name="é"), backend, AsyncSink(stream), None, 10)
+                )
+
+                self.assertEqual(stream.data, "é".encode() * 50)
+                # Between slices and once at the end.
+                self.assertGreater(stream.drains, 1)
+
+    def test_api(self):
+        for backend in ("closures", "pyexec"):
+            with self.subTest(backend=backend):
+                result = asyncio.run(
+                    api.runAsync(PROGRAMS[0], {"rn": 3}, backend=backend, sliceSize=1)
+                )
+                self.assertEqual(result, api.run(PROGRAMS[0], {"rn": 3}, backend=backend))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The interpreter modules import each other by their flat module names.
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+# The test modules share helpers through the tests package.
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
@@ -0,0 +1,202 @@
+import os
+import socket
+import tempfile
+import threading
+import unittest
+
+import api
+from client import Client, parseInput
+from daemon import Daemon
+from errors import CnstrError, CnstrProtocolError
+from limits import Limits
+from protocol import HEADER, encodeMessage, decodeMessage, receiveMessage
+
+PROGRAM = (
+    'setjmpp "loop"\n'
+    "add rt rn rt\n"
+    "sub rn 1 rn\n"
+    'jmpif "loop" rn > 0\n'
+    "stdout rt endl\n"
+)
+
+
+class TestDaemon(unittest.TestCase):
+    def setUp(self):
+        api.compileProgram.cache_clear()
+        self.directory = tempfile.TemporaryDirectory()
+        self.socketPath = os.path.join(self.directory.name, "cnstr.sock")
+        self.startDaemon(Daemon(self.socketPath, limits=Limits(maxInstructions=10_000)))
+
+    def tearDown(self):
+        self.daemon.stop()
+        self.thread.join(5)
+        self.directory.cleanup()
+        api.compileProgram.cache_clear()
+
+    def startDaemon(self, daemon):
+        self.daemon = daemon
+        self.thread = threading.Thread(target=daemon.serveForever, daemon=True)
+        self.thread.start()
+        self.assertTrue(daemon.ready.wait(5))
+
+    def test_source(self):
+        with Client(self.socketPath) as client:
+            reply = client.run(PROGRAM, inputs={"rn": 10})
+
+        self.assertEqual(
+            reply,
+            {"ok": True, "output": "55\n", "registers": {"rt": 55, "rn": 0}},
+        )
+
+    def test_path(self):
+        path = os.path.join(self.directory.name, "sum.cnstr")
+        with open(path, "w") as f:
+            f.write(PROGRAM)
+
+        with Client(self.socketPath) as client:
+            for backend in ("closures", "pyexec"):
+                with self.subTest(backend=backend):
+                    reply = client.run(path=path, inputs={"rn": 4}, backend=backend)
+                    self.assertEqual(reply["output"], "10\n")
+
+            reply = client.run(path=path, legacyFloats=True)
+            self.assertEqual(reply["registers"], {"rt": 0.0, "rn": -1.0})
+
+            reply = client.run(path=os.path.join(self.directory.name, "missing"))
+            self.assertFalse(reply["ok"])
+            self.assertEqual(reply["stage"], "read")
+
+    def test_errors(self):
+        with Client(self.socketPath) as client:
+            reply = client.run("set ra 1\nbogus ra\n")
+            self.assertFalse(reply["ok"])
+            self.assertEqual(reply["stage"], "compile")
+            self.assertIn("bogus", reply["error"])
+
+            reply = client.run('stdout "before" endl\ndiv 1 0 ra\n')
+            self.assertEqual(reply["stage"], "run")
+            self.assertEqual(reply["output"], "before\n")
+
+            reply = client.run(
+                "set rs 'abc'\nset rf 1e999\nsub rf rf rn\ncharat rs rn ra\n"
+            )
+            self.assertEqual(reply["stage"], "run")
+            self.assertIn("out of bounds", reply["error"])
+
+            # The daemon's limits apply to every request.
+            reply = client.run(PROGRAM, inputs={"rn": 1_000_000})
+            self.assertEqual(reply["stage"], "run")
+            self.assertIn("limit", reply["error"])
+
+            for request in (
+                {"source": PROGRAM, "backend": "bogus"},
+                {"source": PROGRAM, "inputs": {"ra": [1]}},
+                {"source": PROGRAM, "inputs": [1]},
+                {"source": 1},
+                {},
+            ):
+                with self.subTest(request=request):
+                    client._socket.sendall(encodeMessage(request))
+                    reply = receiveMessage(client._socket)
+                    self.assertEqual(reply["stage"], "request")
+
+            # The connection is still usable after failed requests.
+            self.assertTrue(client.run("set ra 1\n")["ok"])
+
+    def test_internal_errors(self):
+        with Client(self.socketPath) as client:
+            # Registers too large for JSON can't be sent back.
+            reply = client.run("pow 10 5000 ra\n")
+            self.assertFalse(reply["ok"])
+            self.assertEqual(reply["stage"], "internal")
+
+            # Stands in for a bug of the daemon.
+            limits = self.daemon._limits
+            self.daemon._limits = object()
+            reply = client.run("set ra 1\n")
+            self.assertEqual(reply["stage"], "internal")
+            self.assertIn("AttributeError", reply["error"])
+
+            self.daemon._limits = limits
+            self.assertTrue(client.run("set ra 1\n")["ok"])
+
+    def test_compiled_programs_are_cached(self):
+        with Client(self.socketPath) as client:
+            for n in range(5):
+                self.assertEqual(client.run(PROGRAM, inputs={"rn": n})["ok"], True)
+
+        info = api.compileProgram.cache_info()
+        self.assertEqual((info.misses, info.hits), (1, 4))
+
+    def test_concurrent_connections(self):
+        replies = {}
+
+        def runClient(n):
+            with Client(self.socketPath) as client:
+                replies[n] = [client.run(PROGRAM, inputs={"rn": n}) for _ in range(3)]
+
+        threads = [threading.Thread(target=runClient, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+        for n in range(8):
+            self.assertEqual(
+                [reply["output"] for reply in replies[n]], [f"{n * (n + 1) // 2}\n"] * 3
+            )
+
+    def test_malformed_message(self):
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(self.socketPath)
+
+        with connection:
+            connection.sendall(HEADER.pack(3) + b"[1]")
+            reply = receiveMessage(connection)
+            self.assertEqual(reply["stage"], "request")
+
+            # The daemon closes the connection after a bad message.
+            self.assertIsNone(receiveMessage(connection))
+
+    def test_socket_in_use(self):
+        with self.assertRaises(CnstrError):
+            Daemon(self.socketPath).serveForever()
+
+        # Stale sockets of daemons which are gone are replaced.
+        self.daemon.stop()
+        self.thread.join(5)
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(self.socketPath)
+        stale.close()
+
+        self.startDaemon(Daemon(self.socketPath))
+        with Client(self.socketPath) as client:
+            self.assertTrue(client.run("set ra 1\n")["ok"])
+
+    def test_no_daemon(self):
+        with self.assertRaises(CnstrProtocolError):
+            Client(os.path.join(self.directory.name, "missing.sock"))
+
+
+class TestProtocol(unittest.TestCase):
+    def test_roundtrip(self):
+        message = {"source": "stdout ra endl\n", "inputs": {"ra": "é", "rb": 0.5}}
+        data = encodeMessage(message)
+
+        self.assertEqual(HEADER.unpack(data[: HEADER.size])[0], len(data) - HEADER.size)
+        self.assertEqual(decodeMessage(data[HEADER.size :]), message)
+
+    def test_invalid_messages(self):
+        for data in (b"{", b"[]", b"\xff"):
+            with self.subTest(data=data):
+                with self.assertRaises(CnstrProtocolError):
+                    decodeMessage(data)
+
+    def test_parse_input(self):
+        self.assertEqual(parseInput("ra=1"), ("ra", 1))
+        self.assertEqual(parseInput("ra=1.5"), ("ra", 1.5))
+        self.assertEqual(parseInput("ra=a=b"), ("ra", "a=b"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,268 @@
+import unittest
+
+from lexer import Lexer
+from interpreter import Interpreter
+from debugger import parseCondition
+from errors import CnstrRuntimeError, CnstrLimitError
+from limits import Limits
+from output import CaptureSink
+
+PROGRAM = (
+    "set rn 5\n"
+    'setjmpp "loop"\n'
+    "add rt rn rt\n"
+    "sub rn 1 rn\n"
+    'jmpif "loop" rn > 0\n'
+    "stdout rt endl\n"
+)
+
+
+def debug(source: str, **options):
+    sink = CaptureSink()
+    interpreter = Interpreter(Lexer(source).tokenize(), sink, **options)
+
+    return interpreter.debug(), sink
+
+
+def stops(debugger, advance) -> list:
+    found = []
+
+    while (stop := advance()) is not None:
+        found.append(stop)
+
+    return found
+
+
+class TestDebugger(unittest.TestCase):
+    def test_no_breakpoints(self):
+        debugger, sink = debug(PROGRAM)
+
+        self.assertIsNone(debugger.continueRun())
+        self.assertTrue(debugger.finished)
+        self.assertEqual(sink.getvalue(), b"15\n")
+        self.assertEqual(debugger.registers, {"rn": 0, "rt": 15})
+
+        # Nothing was instrumented.
+        self.assertIsNone(debugger._instrumented)
+
+    def test_breakpoints(self):
+        debugger, sink = debug(PROGRAM)
+        breakpoint = debugger.addBreakpoint(3)
+
+        found = stops(debugger, debugger.continueRun)
+        self.assertEqual([stop.lineNum for stop in found], [3] * 5)
+        self.assertEqual({stop.reason for stop in found}, {"breakpoint"})
+        self.assertEqual(breakpoint.hits, 5)
+        self.assertEqual(sink.getvalue(), b"15\n")
+
+    def test_breakpoint_before_first_line(self):
+        debugger, _ = debug(PROGRAM)
+        debugger.addBreakpoint(0)
+
+        stop = debugger.continueRun()
+        self.assertEqual((stop.reason, stop.lineNum), ("breakpoint", 0))
+        self.assertEqual(debugger.registers, {"rn": 0, "rt": 0})
+
+        debugger.removeBreakpoint(0)
+        self.assertIsNone(debugger.continueRun())
+
+    def test_conditional_breakpoints(self):
+        for condition in (
+            "rn < 3",
+            "rn <= 2",
+            lambda registers: registers["rn"] in (1, 2),
+        ):
+            with self.subTest(condition=condition):
+                debugger, _ = debug(PROGRAM)
+                debugger.addBreakpoint(3, condition)
+                registers = []
+
+                while debugger.continueRun() is not None:
+                    registers.append(debugger.registers["rn"])
+
+                self.assertEqual(registers, [2, 1])
+
+        debugger, _ = debug(PROGRAM)
+        for condition in ("rn", "rn > 1 2", "set rn 1", "1 > rn"):
+            with self.subTest(condition=condition):
+                with self.assertRaises(ValueError):
+                    debugger.addBreakpoint(3, condition)
+
+        with self.assertRaises(ValueError):
+            debugger.addBreakpoint(100)
+
+    def test_condition_which_fails_stops(self):
+        debugger, _ = debug(PROGRAM)
+        debugger.addBreakpoint(2, 'rn > "x"')
+
+        self.assertEqual(debugger.continueRun().lineNum, 2)
+
+    def test_watchpoints(self):
+        debugger, _ = debug(
+            "set ra 1\n"
+            "set ra 1\n"
+            "cpy ra rb\n"
+            "mov rb rc\n"
+            'set rs ""\n'
+            'strapp rs "x" rs\n'
+            'set rs "x"\n'
+            "add ra 1 ra\n"
+        )
+        debugger.watch("ra")
+        debugger.watch("rb")
+        debugger.watch("rs")
+
+        found = [
+            (stop.lineNum, stop.register, stop.old, stop.new)
+            for stop in stops(debugger, debugger.continueRun)
+        ]
+
+        # Writes of the same value don't stop, not even a string turning
+        # into a rope or back.
+        self.assertEqual(
+            found,
+            [
+                (0, "ra", 0, 1),
+                (2, "rb", 0, 1),
+                (3, "rb", 1, 0),
+                (4, "rs", 0, ""),
+                (5, "rs", "", "x"),
+                (7, "ra", 1, 2),
+            ],
+        )
+
+        with self.assertRaises(ValueError):
+            debugger.watch("rz")
+
+    def test_watchpoint_and_breakpoint(self):
+        debugger, _ = debug(PROGRAM)
+        debugger.watch("rt")
+        debugger.addBreakpoint(5)
+
+        found = stops(debugger, debugger.continueRun)
+        self.assertEqual(
+            [stop.reason for stop in found], ["watchpoint"] * 5 + ["breakpoint"]
+        )
+        self.assertEqual(found[-2].new, 15)
+
+        debugger, _ = debug(PROGRAM)
+        debugger.watch("rt")
+        debugger.unwatch("rt")
+        self.assertIsNone(debugger.continueRun())
+
+    def test_step(self):
+        debugger, _ = debug(
+            'set rn 2\nsetjmpp "loop"\nsub rn 1 rn\njmpif "loop" rn > 0\n'
+        )
+        debugger.watch("rn")
+
+        found = [(stop.reason, stop.lineNum) for stop in stops(debugger, debugger.step)]
+        self.assertEqual(
+            found,
+            [
+                ("watchpoint", 0),
+                ("step", 2),
+                ("watchpoint", 2),
+                ("step", 2),
+                ("watchpoint", 2),
+            ],
+        )
+        self.assertTrue(debugger.finished)
+        self.assertIsNone(debugger.lineNum)
+
+    def test_step_then_continue(self):
+        debugger, sink = debug(PROGRAM)
+        debugger.addBreakpoint(4)
+
+        self.assertEqual(debugger.continueRun().lineNum, 4)
+        self.assertEqual(debugger.step().lineNum, 2)
+        self.assertEqual(debugger.registers, {"rn": 4, "rt": 5})
+
+        self.assertEqual(debugger.continueRun().lineNum, 4)
+        self.assertEqual(debugger.registers, {"rn": 3, "rt": 9})
+
+        debugger.removeBreakpoint(4)
+        self.assertIsNone(debugger.continueRun())
+        self.assertEqual(sink.getvalue(), b"15\n")
+
+    def test_runtime_error(self):
+        source = 'stdout "before" endl\nset ra 0\ndiv 1 ra rb\n'
+
+        for setup in (lambda d: None, lambda d: d.watch("rb")):
+            debugger, sink = debug(source)
+            setup(debugger)
+
+            with self.assertRaises(CnstrRuntimeError) as context:
+                debugger.continueRun()
+
+            self.assertEqual(context.exception.lineNum, 2)
+            self.assertEqual(sink.getvalue(), b"before\n")
+
+        debugger, _ = debug(source)
+        debugger.step()
+        debugger.step()
+        with self.assertRaises(CnstrRuntimeError):
+            debugger.step()
+
+    def test_limits(self):
+        debugger, _ = debug(
+            'setjmpp "loop"\nadd ra 1 ra\njmp "loop"\n',
+            limits=Limits(maxInstructions=1000),
+        )
+        debugger.addBreakpoint(1, "ra = 10")
+
+        self.assertEqual(debugger.continueRun().lineNum, 1)
+        with self.assertRaises(CnstrLimitError):
+            debugger.continueRun()
+
+    def test_instruction_limit_across_continues(self):
+        # A normal run of the countdown takes 18 instructions.
+        source = 'set rn 10\nsetjmpp "loop"\nsub rn 1 rn\njmpif "loop" rn > 0\n'
+
+        for limit, finishes in ((18, True), (17, False)):
+            for advance in ("continueRun", "step"):
+                with self.subTest(limit=limit, advance=advance):
+                    debugger, _ = debug(source, limits=Limits(maxInstructions=limit))
+                    debugger.addBreakpoint(2)
+
+                    if finishes:
+                        stops(debugger, getattr(debugger, advance))
+                        self.assertEqual(debugger.registers["rn"], 0)
+                    else:
+                        with self.assertRaises(CnstrLimitError):
+                            stops(debugger, getattr(debugger, advance))
+
+    def test_fused_around_breakpoints(self):
+        debugger, sink = debug(
+            "set ra 1\n"
+            "set rb 2\n"
+            "add ra rb rc\n"
+            "mul rc 2 rd\n"
+            "sub rd 1 re\n"
+            "stdout re\n"
+            "stdout endl\n"
+        )
+        debugger.addBreakpoint(2)
+        debugger.watch("re")
+
+        self.assertEqual(debugger.continueRun().reason, "breakpoint")
+        self.assertEqual(debugger.continueRun().reason, "watchpoint")
+        self.assertIsNone(debugger.continueRun())
+        self.assertEqual(sink.getvalue(), b"5\n")
+
+        # The instrumented instructions of lines 2 and 4 keep their own ops,
+        # the lines after them are still fused.
+        _, fuser = debugger._instrumented
+        self.assertEqual(fuser.runs, {5: [5, 6]})
+
+    def test_parse_condition(self):
+        registers = {"ra": 2, "rs": "done"}
+
+        self.assertTrue(parseCondition("ra = 2")(registers))
+        self.assertFalse(parseCondition("ra != 2")(registers))
+        self.assertTrue(parseCondition('rs = "done"')(registers))
+        self.assertTrue(parseCondition("ra > 1.5")(registers))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import glob
+import os
+import unittest
+
+from lexer import Lexer
+from interpreter import Interpreter
+from errors import CnstrError
+from compiler import Opcode
+from fusion import Fuser
+from output import CaptureSink
+from tests.helpers import execute, profilePairs
+
+PROGRAMS = os.path.join(os.path.dirname(__file__), "..", "..", "programs")
+
+
+class TestFusion(unittest.TestCase):
+    def assertSameAsUnfused(self, source: str):
+        expected = execute(source, "unfused")
+
+        for mode in ("closures", "profiled"):
+            with self.subTest(mode):
+                self.assertEqual(execute(source, mode), expected)
+
+    def test_programs(self):
+        for name in sorted(glob.glob(os.path.join(PROGRAMS, "*.cnstr"))):
+            with open(name) as f:
+                source = f.read()
+            with self.subTest(name):
+                self.assertSameAsUnfused(source)
+
+    def test_loops(self):
+        self.assertSameAsUnfused(
+            'setjmpp "loop"\n'
+            "add ri 1 ri\n"
+            'jmpif "loop" ri < 5\n'
+            "set rn 2\n"
+            'setjmpp "shuffle"\n'
+            "cpy ra rt\n"
+            "cpy rb ra\n"
+            "add rb rt rb\n"
+            "mul rn 2 rn\n"
+            "sub rn 1 rn\n"
+            'jmpif "shuffle" rn < 100\n'
+            "stdout ri , ra , rb , rn endl\n"
+        )
+
+    def test_jump_into_run(self):
+        # 'b' is a jump target, runs must not cross it.
+        self.assertSameAsUnfused(
+            "set ra 1\n"
+            'setjmpp "b"\n'
+            "add ra 1 ra\n"
+            "cpy ra rb\n"
+            'jmpif "b" ra < 4\n'
+            'jmp "end"\n'
+            'setjmpp "end"\n'
+            "stdout ra , rb\n"
+        )
+
+    def test_duplicate_jump_points(self):
+        self.assertSameAsUnfused(
+            'jmp "x"\n'
+            'setjmpp "a"\n'
+            "add ri 1 ri\n"
+            'jmpif "b" ri > 2\n'
+            'jmp "a"\n'
+            'setjmpp "x"\n'
+            "add rj 1 rj\n"
+            'jmp "a"\n'
+            'setjmpp "a"\n'
+            'jmp "start"\n'
+            'setjmpp "b"\n'
+            "stdout ri , rj\n"
+        )
+
+    def test_runtime_errors(self):
+        for source in (
+            "set ra 1\nadd ra 1 ra\njmpif \"missing\" ra = 1\n",
+            "set ra 1\ncpy ra rb\nstrlen ra rb\n",
+        ):
+            with self.subTest(source):
+                self.assertSameAsUnfused(source)
+
+    def test_error_line_in_superinstruction(self):
+        for source, lineNum in (
+            ('set rt "x"\nadd rb 2.5 rs\nadd rt 1 rc\n', 2),
+            ('set rt "x"\nadd rb 2.5 rs\nadd rt 1 rc\nset ra 1\n', 2),
+            ('set rt "x"\nsetjmpp "l"\nadd ra 1 ra\nadd rt 1 rt\njmpif "l" ra < 3\n', 3),
+            ('set rt "x"\nsetjmpp "l"\nadd rt 1 ra\njmpif "l" ra < 3\n', 2),
+            ('set ra 1\nset rb 0\ndiv ra rb rc\nadd ra 1 ra\nstdout ra\n', 2),
+        ):
+            for fuse in (True, False):
+                with self.subTest(source=source, fuse=fuse):
+                    interpreter = Interpreter(Lexer(source).tokenize(), CaptureSink())
+
+                    with self.assertRaises(CnstrError) as context:
+                        interpreter.run(fuse=fuse)
+
+                    self.assertEqual(context.exception.lineNum, lineNum)
+
+    def test_profile_counts_pairs(self):
+        source = 'setjmpp "loop"\nadd ri 1 ri\njmpif "loop" ri < 10\n'
+        program = Interpreter(Lexer(source).tokenize()).compile()
+
+        profile = profilePairs(program)
+
+        self.assertEqual(profile.pairs()[Opcode.ADD, Opcode.JMPIF], 10)
+
+    def test_profile_skips_cold_pairs(self):
+        source = "set ra 1\nset rb 2\njmp \"end\"\nset rc 3\nset rd 4\nsetjmpp \"end\"\n"
+        interpreter = Interpreter(Lexer(source).tokenize())
+        program = interpreter.compile()
+        profile = profilePairs(program)
+
+        ops = interpreter._lower(program)
+        static = Fuser(interpreter, program, ops)
+        static.fuse()
+        profiled = Fuser(interpreter, program, ops, profile)
+        profiled.fuse()
+
+        self.assertEqual(static.fused, 2)
+        self.assertEqual(profiled.fused, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import contextlib
+import io
+
+from lexer import Lexer
+from interpreter import Interpreter
+from compiler import Program
+from errors import CnstrError
+from fusion import PairProfile
+from optimizer import Optimizer
+from output import CaptureSink
+
+# The reference interpreter, the closures with and without superinstructions,
+# the closures fused from a profile, and the transpiled function.
+BACKENDS = ("reference", "closures", "unfused", "profiled", "pyexec")
+
+
+def profilePairs(program: Program) -> PairProfile:
+    profile = PairProfile(program)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            Interpreter([], CaptureSink()).profilePairs(program, profile)
+        except CnstrError:
+            pass
+
+    return profile
+
+
+def runOn(interpreter: Interpreter, backend: str, program: Program | None = None) -> None:
+    """
+    Runs the program, or else the interpreter's tokens, with one of BACKENDS.
+    """
+    if backend == "reference":
+        interpreter.interpret()
+    elif backend == "closures":
+        interpreter.run(program)
+    elif backend == "unfused":
+        interpreter.run(program, fuse=False)
+    elif backend == "profiled":
+        program = program if program is not None else interpreter.compile()
+        interpreter.run(program, profile=profilePairs(program))
+    elif backend == "pyexec":
+        interpreter.runTranspiled(program)
+    else:
+        raise ValueError(f"Unknown backend '{backend}'.")
+
+
+def run(
+    source: str | Program,
+    backend: str,
+    legacyFloats: bool = False,
+    optimize: bool = False,
+    **options,
+) -> tuple[str, Interpreter, CnstrError | None]:
+    """
+    Runs a program, given as source or compiled, and returns its output, the
+    interpreter holding its registers and the error it stopped with, if any.
+    The program is optimized first if asked, the other options are passed on
+    to the Interpreter.
+    """
+    if isinstance(source, Program):
+        program, tokens = source, []
+    else:
+        program, tokens = None, Lexer(source, legacyFloats).tokenize()
+
+    sink = CaptureSink()
+    interpreter = Interpreter(tokens, sink, legacyFloats, **options)
+    error = None
+
+    try:
+        if optimize:
+            program = program if program is not None else interpreter.compile()
+            program = Optimizer(program).optimize()
+        runOn(interpreter, backend, program)
+    except CnstrError as exception:
+        error = exception
+
+    return sink.getvalue().decode(), interpreter, error
+
+
+def execute(
+    source: str | Program,
+    backend: str,
+    legacyFloats: bool = False,
+    optimize: bool = False,
+    **options,
+) -> tuple[str, dict, dict]:
+    """
+    Runs a program like run() and returns its output followed by the error it
+    stopped with, its registers and its jump points.
+    """
+    output, interpreter, error = run(source, backend, legacyFloats, optimize, **options)
+
+    if error is not None:
+        output += f"{error}\n"
+
+    return output, dict(interpreter._registers), interpreter._jumpPoints
@@ -0,0 +1,113 @@
+import glob
+import os
+import unittest
+
+from lexer import Lexer
+from compiler import Compiler
+from errors import CnstrSyntaxError
+from incremental import IncrementalCompiler
+from tests.helpers import execute
+
+PROGRAMS = os.path.join(os.path.dirname(__file__), "..", "..", "programs")
+
+PROGRAM = (
+    "set rn 3\n"
+    'setjmpp "loop"\n'
+    "stdout rn ,\n"
+    "sub rn 1 rn\n"
+    'jmpif "loop" rn > 0\n'
+    "set rx 1\n"
+    "stdout rx endl\n"
+)
+
+
+def compileFull(source: str, legacyFloats: bool = False):
+    try:
+        lexer = Lexer(source, legacyFloats)
+        return Compiler(lexer.iterLines(), legacyFloats=legacyFloats).compile()
+    except CnstrSyntaxError as error:
+        return error.stage, [str(detail) for detail in error.errors]
+
+
+def compileIncremental(compiler: IncrementalCompiler, source: str):
+    try:
+        return compiler.compile(source)
+    except CnstrSyntaxError as error:
+        return error.stage, [str(detail) for detail in error.errors]
+
+
+class TestIncremental(unittest.TestCase):
+    def test_same_as_compiler(self):
+        for path in sorted(glob.glob(os.path.join(PROGRAMS, "*.cnstr"))):
+            with open(path, "r") as f:
+                source = f.read()
+
+            for legacyFloats in (False, True):
+                with self.subTest(program=os.path.basename(path), legacy=legacyFloats):
+                    compiler = IncrementalCompiler(legacyFloats)
+                    expected = compileFull(source, legacyFloats)
+
+                    self.assertEqual(compileIncremental(compiler, source), expected)
+                    self.assertEqual(compileIncremental(compiler, source), expected)
+                    self.assertEqual(compiler.stats.relexed, 0)
+
+    def test_edit_relexes_changed_lines(self):
+        compiler = IncrementalCompiler()
+        compiler.compile(PROGRAM)
+        self.assertEqual(compiler.stats.relexed, 7)
+
+        source = PROGRAM.replace("set rn 3", "set rn 5")
+        program = compiler.compile(source)
+
+        self.assertEqual(compiler.stats.relexed, 1)
+        self.assertEqual(compiler.stats.reused, 6)
+        self.assertEqual(program, compileFull(source))
+        self.assertEqual(execute(program, "closures")[0], "5 4 3 2 1 1\n")
+
+    def test_registers_renumbered(self):
+        compiler = IncrementalCompiler()
+        compiler.compile(PROGRAM)
+
+        # The cached lines now use their registers in a different order.
+        source = "set rx 2\n" + PROGRAM
+        self.assertEqual(compiler.compile(source), compileFull(source))
+        self.assertEqual(compiler.stats.relexed, 1)
+
+    def test_moved_jump_points(self):
+        compiler = IncrementalCompiler()
+        compiler.compile(PROGRAM)
+
+        source = "// moved down\n" + PROGRAM
+        program = compiler.compile(source)
+        self.assertEqual(program.jumpPoints["loop"], 2)
+        self.assertEqual(compiler.stats.changedJumpPoints, ["loop"])
+        self.assertEqual(execute(program, "closures")[0], "3 2 1 1\n")
+
+        source = source.replace('"loop"', '"again"')
+        program = compiler.compile(source)
+        self.assertEqual(program, compileFull(source))
+        self.assertEqual(compiler.stats.changedJumpPoints, ["again", "loop"])
+        self.assertEqual(compiler.stats.relexed, 2)
+
+    def test_errors(self):
+        compiler = IncrementalCompiler()
+        compiler.compile(PROGRAM)
+
+        sources = (
+            PROGRAM.replace('setjmpp "loop"', 'setjmpp "other"'),
+            PROGRAM.replace("sub rn 1 rn", "sub rn"),
+            PROGRAM.replace("set rx 1", "set rx 1.2.3"),
+            PROGRAM + "sub rn\nset ra 1.2.3\n",
+        )
+
+        for source in sources:
+            with self.subTest(source=source):
+                self.assertEqual(compileIncremental(compiler, source), compileFull(source))
+
+        # Fixing the error only compiles the fixed line.
+        compiler.compile(PROGRAM)
+        self.assertEqual(compiler.stats.relexed, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+
+from lexer import Lexer
+from errors import CnstrError
+from numerics import parseNumber, divide
+from tests.helpers import execute
+
+BACKENDS = ("reference", "closures", "pyexec")
+
+
+class TestNumerics(unittest.TestCase):
+    def assertOutput(self, source: str, expected: str, legacyFloats: bool = False):
+        for backend in BACKENDS:
+            with self.subTest(backend=backend, legacyFloats=legacyFloats):
+                output, _, _ = execute(source, backend, legacyFloats)
+                self.assertEqual(output, expected)
+
+    def test_parse_number(self):
+        self.assertIs(type(parseNumber("12")), int)
+        self.assertIs(type(parseNumber("-3")), int)
+        self.assertIs(type(parseNumber("1.5")), float)
+        self.assertIs(type(parseNumber("1e3")), float)
+        self.assertIs(type(parseNumber("12", legacyFloats=True)), float)
+
+    def test_divide(self):
+        self.assertEqual(divide(6, 3), 2)
+        self.assertIs(type(divide(6, 3)), int)
+        self.assertEqual(divide(7, 2), 3.5)
+        self.assertIs(type(divide(6.0, 3)), float)
+
+    def test_integer_arithmetic(self):
+        self.assertOutput(
+            "set ra 7\n"
+            "add ra 1 rb\n"
+            "div rb 4 rc\n"
+            "div ra 2 rd\n"
+            "mod ra 4 re\n"
+            "add ra 0.5 rf\n"
+            "mov rb rg\n"
+            "stdout rb , rc , rd , re , rf , rg endl\n",
+            "0 2 3.5 3 7.5 8\n",
+        )
+
+    def test_exact_pow(self):
+        self.assertOutput(
+            "pow 3 100 ra\npow 2 -1 rb\nstdout ra , rb endl\n",
+            f"{3 ** 100} 0.5\n",
+        )
+
+    def test_too_large_to_print(self):
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                output, _, _ = execute("pow 10 5000 ra\nstdout ra\n", backend)
+                self.assertIn("Number is too large to print", output)
+
+        with self.assertRaises(CnstrError) as context:
+            Lexer(f"set ra {'9' * 5000}\n").tokenize()
+
+        self.assertIn("more than", str(context.exception))
+
+    def test_legacy_floats(self):
+        self.assertOutput(
+            "set ra 7\nadd ra 1 rb\ndiv rb 4 rc\nmov rb rg\nstdout rb , rc , rg endl\n",
+            "0.0 2.0 8.0\n",
+            legacyFloats=True,
+        )
+
+    def test_counter_indices(self):
+        # Integer counters and strlen results are valid charat indices.
+        self.assertOutput(
+            "set rs 'abc'\n"
+            "strlen rs rl\n"
+            "sub rl 1 ri\n"
+            "charat rs ri ra\n"
+            "charat rs 0 rb\n"
+            "stdout ra rb endl\n",
+            "ca\n",
+        )
+
+    def test_non_finite_indices(self):
+        # Infinite and NaN indices are out of bounds, whether literal or not.
+        error = "Index out of bounds."
+
+        for source in (
+            "set rs 'abc'\ncharat rs 1e999 ra\n",
+            "set rs 'abc'\nset rf 1e999\ncharat rs rf ra\n",
+            "set rs 'abc'\nset rf 1e999\nsub rf rf rn\ncharat rs rn ra\n",
+        ):
+            for legacyFloats in (False, True):
+                for backend in BACKENDS:
+                    with self.subTest(
+                        source=source, legacyFloats=legacyFloats, backend=backend
+                    ):
+                        output, _, _ = execute(source, backend, legacyFloats)
+                        self.assertIn(error, output)
+
+    def test_legacy_charat_indices(self):
+        for source in (
+            "set rs 'abc'\ncharat rs 0 rb\n",
+            "set rs 'abc'\nstrlen rs rl\nsub rl 1 ri\ncharat rs rl rb\n",
+        ):
+            for backend in BACKENDS:
+                with self.subTest(source=source, backend=backend):
+                    output, _, _ = execute(source, backend, legacyFloats=True)
+                    self.assertIn("Expected number, got '<class 'int'>'", output)
+
+    def test_registers_start_at_zero(self):
+        for backend in BACKENDS:
+            with self.subTest(backend):
+                _, registers, _ = execute("add ri 1 ri\n", backend)
+                self.assertIs(type(registers["ri"]), int)
+
+                _, registers, _ = execute("add ri 1 ri\n", backend, legacyFloats=True)
+                self.assertIs(type(registers["ri"]), float)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import glob
+import os
+import unittest
+
+from tests.helpers import execute
+
+PROGRAMS = os.path.join(os.path.dirname(__file__), "..", "..", "programs")
+
+
+class TestRun(unittest.TestCase):
+    def assertSameAsReference(self, source: str):
+        output, registers, jumpPoints = execute(source, "closures")
+        expectedOutput, expectedRegisters, expectedJumpPoints = execute(source, "reference")
+
+        self.assertEqual(output, expectedOutput)
+        self.assertEqual(jumpPoints, expectedJumpPoints)
+
+        # Compiled programs preallocate every register they mention.
+        for register, value in registers.items():
+            self.assertEqual(value, expectedRegisters.get(register, 0.0))
+        self.assertLessEqual(expectedRegisters.keys(), registers.keys())
+
+    def test_programs(self):
+        for name in sorted(glob.glob(os.path.join(PROGRAMS, "*.cnstr"))):
+            with open(name) as f:
+                source = f.read()
+            with self.subTest(name):
+                self.assertSameAsReference(source)
+
+    def test_strings(self):
+        self.assertSameAsReference(
+            'set rs "abc"\n'
+            'strapp rs "def" rs\n'
+            "strlen rs rl\n"
+            "set ri 1\n"
+            "charat rs ri rc\n"
+            "stdout rc , rl endl\n"
+        )
+
+    def test_math(self):
+        self.assertSameAsReference(
+            "set ra 7\n"
+            "sub ra 2 rb\n"
+            "mul 3 rb rc\n"
+            "div rc ra rd\n"
+            "mod rc 4 re\n"
+            "pow 2 10 rf\n"
+            "mov rf rg\n"
+            "stdout ra rb rc rd re rf rg\n"
+        )
+
+    def test_jumps(self):
+        self.assertSameAsReference(
+            'jmp "skip"\n'
+            "stdout 'skipped'\n"
+            'setjmpp "skip"\n'
+            "add ri 1 ri\n"
+            'jmpif "skip" ri <= 3\n'
+            'jmpif "skip" ri != ri\n'
+            "stdout ri\n"
+        )
+
+    def test_duplicate_jump_points(self):
+        self.assertSameAsReference(
+            'jmp "x"\n'
+            'setjmpp "a"\n'
+            "add ri 1 ri\n"
+            'jmpif "b" ri > 2\n'
+            'jmp "a"\n'
+            'setjmpp "x"\n'
+            "add rj 1 rj\n"
+            'jmp "a"\n'
+            'setjmpp "a"\n'
+            'jmp "start"\n'
+            'setjmpp "b"\n'
+            "stdout ri , rj\n"
+        )
+
+    def test_runtime_errors(self):
+        for source in (
+            'jmp "missing"\n',
+            'jmpif "missing" ra = 1\n',
+            "set ra 1\nstrlen ra rb\n",
+            "set ra 'abc'\nset ri 5\ncharat ra ri rb\n",
+        ):
+            with self.subTest(source):
+                self.assertSameAsReference(source)
+
+    def test_errors_reported_before_running(self):
+        output, registers, _ = execute("set ra 1\nadd ra 'x' rb\n", "closures")
+
+        self.assertIn("errors while compiling", output)
+        self.assertEqual(registers, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import io
+import mmap
+import os
+import tempfile
+import unittest
+
+from common import TokenType
+from lexer import Lexer
+
+SOURCE = (
+    "// comment\n"
+    "\n"
+    'set rs "a b"\r\n'
+    "add ra 1.5 rb\n"
+    'jmpif "x" ra >= rb'
+)
+
+
+def splitTokens(tokens):
+    lines, line = [], []
+    for token in tokens:
+        if token.tokenType == TokenType.ENDLINE:
+            lines.append(line)
+            line = []
+        else:
+            line.append(token)
+    return lines
+
+
+class TestIterLines(unittest.TestCase):
+    def test_string(self):
+        expected = splitTokens(Lexer(SOURCE).tokenize())
+
+        self.assertEqual(list(Lexer(SOURCE).iterLines()), expected)
+
+    def test_file(self):
+        expected = splitTokens(Lexer(SOURCE).tokenize())
+
+        self.assertEqual(list(Lexer(io.StringIO(SOURCE)).iterLines()), expected)
+
+    def test_mmap(self):
+        expected = splitTokens(Lexer(SOURCE).tokenize())
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "source.cnstr")
+            with open(path, "wb") as f:
+                f.write(SOURCE.encode())
+
+            with open(path, "rb") as f, mmap.mmap(
+                f.fileno(), 0, access=mmap.ACCESS_READ
+            ) as mapped:
+                self.assertEqual(list(Lexer(mapped).iterLines()), expected)
+
+    def test_line_boundaries(self):
+        # Lines break wherever str.splitlines() breaks them, in every source.
+        source = (
+            'set ra 1\rset rb 2\x0bset rc 3\x1cstdout "ab"\x85\r\n\x0c\nadd ra 1 ra'
+        )
+        expected = splitTokens(Lexer(source).tokenize())
+        self.assertEqual(len(expected), 8)
+
+        self.assertEqual(list(Lexer(source).iterLines()), expected)
+        self.assertEqual(
+            list(Lexer(io.StringIO(source, newline="")).iterLines()), expected
+        )
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "source.cnstr")
+            with open(path, "wb") as f:
+                f.write(source.encode())
+
+            with open(path, "rb") as f, mmap.mmap(
+                f.fileno(), 0, access=mmap.ACCESS_READ
+            ) as mapped:
+                self.assertEqual(list(Lexer(mapped).iterLines()), expected)
+
+    def test_empty(self):
+        self.assertEqual(list(Lexer("").iterLines()), [])
+        self.assertEqual(list(Lexer("\n").iterLines()), [[]])
+
+
+if __name__ == '__main__':
+    unittest.main()
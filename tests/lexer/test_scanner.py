@@ -0,0 +1,95 @@
+import dataclasses
+import random
+import unittest
+
+from lexer import Lexer, MAX_WORDS
+
+
+def tokenize(line: str, reference: bool):
+    lexer = Lexer(line)
+    if reference:
+        tokens = lexer._tokenizeLineReference(line)
+    else:
+        tokens = lexer._tokenizeLine(line)
+    return tokens, lexer._errors
+
+
+class TestScanner(unittest.TestCase):
+    def assertSameAsReference(self, line: str):
+        self.assertEqual(tokenize(line, False), tokenize(line, True), line)
+
+    def test_smart_split_cases(self):
+        for line in (
+            "hello world",
+            "hello 'world'",
+            '"split this" string',
+            'hello "world" and \'universe\'',
+            "",
+            "   ",
+            "set ra 1.5",
+            'strapp rs "a b" rs',
+            'jmpif "loop" rco < ram',
+            "stdout ra , rb endl",
+            "// comment 'x'",
+        ):
+            with self.subTest(line):
+                self.assertSameAsReference(line)
+
+    def test_edge_cases(self):
+        for line in (
+            "1e3 -5 +.5 1. . 1e- 1E+ nan inf 1_0",
+            "r rA r1 r12 r123 ra'b' r'x y'",
+            "'unterminated quote",
+            '"',
+            "'",
+            "''",
+            "'a'b \"c\"'d'",
+            'ab"c d"e',
+            "set\tra 1",
+            "add ra 1 rb  ",
+        ):
+            with self.subTest(line):
+                self.assertSameAsReference(line)
+
+    def test_random_lines(self):
+        pieces = ["r", "a", "1", "e", ".", "-", "+", "'", '"', " ", " ", "set", "<=", ","]
+        rng = random.Random(1234)
+
+        for _ in range(2000):
+            line = "".join(rng.choice(pieces) for _ in range(rng.randrange(12)))
+            self.assertSameAsReference(line)
+
+    def test_tokens_are_shared(self):
+        tokens = Lexer('set ra "x"\nadd ra 1 ra\nstrapp ra "x" ra\n').tokenize()
+        registers = [token for token in tokens if token.value == "ra"]
+        strings = [token for token in tokens if token.value == "x"]
+        endlines = [token for token in tokens if token.value == "\n"]
+
+        self.assertEqual(len(registers), 5)
+        self.assertEqual(len({id(token) for token in registers}), 1)
+        self.assertEqual(len({id(token) for token in strings}), 1)
+        self.assertEqual(len({id(token) for token in endlines}), 1)
+
+        # Shared tokens can't be changed through one occurrence.
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            registers[0].value = "rb"
+
+        self.assertFalse(hasattr(registers[0], "__dict__"))
+
+    def test_word_table_is_bounded(self):
+        lexer = Lexer("".join(f'set ra "s{i}"\n' for i in range(3 * MAX_WORDS)))
+
+        for tokens in lexer.iterLines():
+            self.assertLessEqual(len(lexer._words), MAX_WORDS + len(tokens))
+
+        self.assertEqual(tokens[-1].value, f"s{3 * MAX_WORDS - 1}")
+
+        # Lexers kept for many lines don't grow either.
+        for i in range(3 * MAX_WORDS):
+            lexer.lexLine(f"add ra {i} rb")
+
+        self.assertLessEqual(len(lexer._words), MAX_WORDS + 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+
+from errors import CnstrLimitError
+from limits import Limits
+from tests.helpers import execute, run
+import api
+
+BACKENDS = ("reference", "closures", "unfused", "pyexec")
+
+COUNTDOWN = (
+    "set rn 10\n"
+    'setjmpp "loop"\n'
+    "sub rn 1 rn\n"
+    'jmpif "loop" rn > 0\n'
+)
+
+FOREVER = 'setjmpp "loop"\nadd ra 1 ra\njmp "loop"\n'
+
+
+class TestLimits(unittest.TestCase):
+    def assertLimitError(self, source: str, backend: str, limits: Limits) -> CnstrLimitError:
+        _, _, error = run(source, backend, limits=limits)
+        self.assertIsInstance(error, CnstrLimitError)
+
+        return error
+
+    def test_instruction_limit(self):
+        # Nine jumps back over two instructions each.
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                output, registers, _ = execute(
+                    COUNTDOWN, backend, limits=Limits(maxInstructions=18)
+                )
+                self.assertEqual(output, "")
+                self.assertEqual(registers["rn"], 0)
+
+                error = self.assertLimitError(
+                    COUNTDOWN, backend, Limits(maxInstructions=17)
+                )
+                self.assertEqual(error.limit, "instructions")
+                self.assertEqual(error.lineNum, 3)
+                self.assertEqual(error.message, "Instruction limit of 17 exceeded.")
+
+    def test_infinite_loop(self):
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                error = self.assertLimitError(
+                    FOREVER, backend, Limits(maxInstructions=100_000)
+                )
+                self.assertEqual(error.lineNum, 2)
+                self.assertEqual(error.line, "jmp 'loop'")
+
+    def test_time_limit(self):
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                error = self.assertLimitError(FOREVER, backend, Limits(maxSeconds=0.05))
+                self.assertEqual(error.limit, "time")
+
+    def test_output_limit(self):
+        source = 'setjmpp "loop"\nstdout "ab" "é"\njmp "loop"\n'
+
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                error = self.assertLimitError(source, backend, Limits(maxOutputBytes=10))
+                self.assertEqual(error.limit, "output")
+                self.assertEqual(error.lineNum, 1)
+
+    def test_output_before_the_limit_is_kept(self):
+        with self.assertRaises(CnstrLimitError) as context:
+            api.run(
+                'setjmpp "loop"\nstdout "ab" "é"\njmp "loop"\n',
+                limits=Limits(maxOutputBytes=10),
+            )
+
+        # Each write is 4 bytes, the third one would exceed the limit.
+        self.assertEqual(context.exception.output, "abéabé")
+
+    def test_digit_limit(self):
+        source = "pow 10 999 ra\nmul ra 10 rb\nmul rb 10 rc\n"
+
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                error = self.assertLimitError(source, backend, Limits(maxDigits=1000))
+                self.assertEqual(error.limit, "digits")
+                self.assertEqual(error.lineNum, 2)
+                self.assertEqual(
+                    error.message, "Integer limit of 1000 digits exceeded."
+                )
+
+                error = self.assertLimitError(
+                    "pow 7 100000000000 ra\n", backend, Limits(maxDigits=1000)
+                )
+                self.assertEqual(error.limit, "digits")
+
+                output, registers, _ = execute(
+                    "pow 2 1000 ra\npow -1 100000000000 rb\n",
+                    backend,
+                    limits=Limits(maxDigits=1000),
+                )
+                self.assertEqual(output, "")
+                self.assertEqual(registers["ra"], 2**1000)
+                self.assertEqual(registers["rb"], 1)
+
+    def test_no_limits(self):
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                output, _, _ = execute(COUNTDOWN + "stdout rn\n", backend, limits=Limits())
+                self.assertEqual(output, "0")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import glob
+import os
+import unittest
+
+from lexer import Lexer
+from interpreter import Interpreter
+from errors import CnstrLimitError
+from compiler import Opcode
+from optimizer import Optimizer
+from limits import Limits
+from tests.helpers import execute
+
+PROGRAMS = os.path.join(os.path.dirname(__file__), "..", "..", "programs")
+
+
+def optimize(source: str) -> Optimizer:
+    optimizer = Optimizer(Interpreter(Lexer(source).tokenize()).compile())
+    optimizer.program = optimizer.optimize()
+    return optimizer
+
+
+class TestOptimizer(unittest.TestCase):
+    def assertSameAsUnoptimized(self, source: str):
+        self.assertEqual(
+            execute(source, "closures", optimize=True), execute(source, "closures")
+        )
+
+    def test_programs(self):
+        for name in sorted(glob.glob(os.path.join(PROGRAMS, "*.cnstr"))):
+            with open(name) as f:
+                source = f.read()
+            with self.subTest(name):
+                self.assertSameAsUnoptimized(source)
+
+    def test_folds_constants(self):
+        source = (
+            "set ra 7\n"
+            "sub ra 2 rb\n"
+            "mul 3 rb rc\n"
+            "set rs 'ab'\n"
+            "strapp rs 'c' rs\n"
+            "strlen rs rl\n"
+            "stdout rc , rs , rl endl\n"
+        )
+        self.assertSameAsUnoptimized(source)
+
+        optimizer = optimize(source)
+        opcodes = [instruction.opcode for instruction in optimizer.program.instructions]
+
+        self.assertNotIn(Opcode.MUL, opcodes)
+        self.assertNotIn(Opcode.STRAPP, opcodes)
+        self.assertEqual(optimizer.report.instructionsBefore, 7)
+
+    def test_digit_limit(self):
+        # Products the run stops at aren't folded into a 'set'.
+        source = "set ra 10\npow ra 60 rb\nmul rb rb rc\nstdout rc endl\n"
+        limits = Limits(maxDigits=100)
+
+        for optimized in (False, True):
+            with self.subTest(optimized=optimized):
+                interpreter = Interpreter(Lexer(source).tokenize(), limits=limits)
+                program = interpreter.compile()
+
+                if optimized:
+                    program = Optimizer(program, limits.maxDigits).optimize()
+
+                with self.assertRaises(CnstrLimitError) as context:
+                    interpreter.run(program)
+
+                self.assertEqual(context.exception.lineNum, 2)
+
+    def test_removes_dead_stores(self):
+        source = "set ra 1\nset ra 2\ncpy ra ra\nstdout ra\n"
+        self.assertSameAsUnoptimized(source)
+
+        optimizer = optimize(source)
+
+        self.assertEqual(optimizer.report.deadStores, 2)
+        self.assertEqual(optimizer.report.removed, 2)
+
+    def test_loops(self):
+        # ri is only known before the loop, it must not be folded inside it.
+        self.assertSameAsUnoptimized(
+            "set ri 0\n"
+            "set rn 3\n"
+            'setjmpp "loop"\n'
+            "add ri 1 ri\n"
+            "stdout ri , rn\n"
+            'jmpif "loop" ri < rn\n'
+            "set rn 0\n"
+            'jmpif "loop" rn > 0\n'
+        )
+
+    def test_duplicate_jump_points(self):
+        self.assertSameAsUnoptimized(
+            'jmp "x"\n'
+            'setjmpp "a"\n'
+            "add ri 1 ri\n"
+            'jmpif "b" ri > 2\n'
+            'jmp "a"\n'
+            'setjmpp "x"\n'
+            "set rj 1\n"
+            'jmp "a"\n'
+            'setjmpp "a"\n'
+            'jmp "start"\n'
+            'setjmpp "b"\n'
+            "stdout ri , rj\n"
+        )
+
+    def test_runtime_errors(self):
+        for source in (
+            'set ra 1\njmpif "missing" ra = 1\n',
+            "set ra 1\nstrlen ra rb\n",
+            "set ra 'abc'\nset ri 5\ncharat ra ri rb\n",
+        ):
+            with self.subTest(source):
+                self.assertSameAsUnoptimized(source)
+
+
+if __name__ == '__main__':
+    unittest.main()
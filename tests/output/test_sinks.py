@@ -0,0 +1,47 @@
+import io
+import unittest
+
+from lexer import Lexer
+from interpreter import Interpreter
+from output import BufferedSink, LineBufferedSink, CaptureSink
+
+
+class TestSinks(unittest.TestCase):
+    def test_buffered_threshold(self):
+        stream = io.StringIO()
+        sink = BufferedSink(stream, threshold=4)
+
+        sink.write("ab")
+        self.assertEqual(stream.getvalue(), "")
+        sink.write("cd")
+        self.assertEqual(stream.getvalue(), "abcd")
+        sink.write("e")
+        sink.flush()
+        self.assertEqual(stream.getvalue(), "abcde")
+
+    def test_line_buffered(self):
+        stream = io.StringIO()
+        sink = LineBufferedSink(stream)
+
+        sink.write("ab")
+        self.assertEqual(stream.getvalue(), "")
+        sink.write("c\n")
+        self.assertEqual(stream.getvalue(), "abc\n")
+
+    def test_capture(self):
+        source = "set ra 'hé'\nstdout ra , 1 endl\nstdout\n"
+
+        for reference in (False, True):
+            sink = CaptureSink()
+            interpreter = Interpreter(Lexer(source).tokenize(), sink)
+
+            if reference:
+                interpreter.interpret()
+            else:
+                interpreter.run()
+
+            self.assertEqual(sink.getvalue(), "hé 1\n\n".encode())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import tempfile
+import unittest
+
+from pool import findPrograms, compileSource, runCompiled, runPrograms
+
+PROGRAMS = {
+    "count.cnstr": 'set rn 3\nsetjmpp "loop"\nstdout rn endl\nsub rn 1 rn\njmpif "loop" rn > 0\n',
+    "same.cnstr": 'set rn 3\nsetjmpp "loop"\nstdout rn endl\nsub rn 1 rn\njmpif "loop" rn > 0\n',
+    "lexer.cnstr": "set ra 1\nbogus ra\n",
+    "jump.cnstr": 'stdout "hi" endl\njmp "nowhere"\n',
+    "zero.cnstr": 'stdout "hi" endl\nset ra 1\ndiv ra 0 rb\n',
+}
+
+
+class TestPool(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+        for name, source in PROGRAMS.items():
+            with open(os.path.join(self.directory.name, name), "w") as f:
+                f.write(source)
+
+        with open(os.path.join(self.directory.name, "notes.txt"), "w") as f:
+            f.write("not a program")
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory.name, name)
+
+    def test_find_programs(self):
+        self.assertEqual(
+            findPrograms([self.directory.name]),
+            sorted(self.path(name) for name in PROGRAMS),
+        )
+        self.assertEqual(
+            findPrograms([self.path("[cs]*.cnstr"), self.path("count.cnstr")]),
+            [self.path("count.cnstr"), self.path("same.cnstr")],
+        )
+
+    def test_compile_errors_are_returned(self):
+        result = compileSource(PROGRAMS["lexer.cnstr"])
+        self.assertIsNone(result.bytecode)
+        self.assertIn("Invalid token: bogus", result.error)
+
+    def test_run_compiled(self):
+        source = PROGRAMS["count.cnstr"]
+        result = runCompiled("count.cnstr", source, compileSource(source).bytecode)
+        self.assertTrue(result.ok)
+        self.assertEqual(result.output, "3\n2\n1\n")
+        self.assertEqual(result.registers, {"rn": 0})
+
+    def test_run_programs(self):
+        paths = [self.path(name) for name in PROGRAMS]
+        results = {os.path.basename(result.path): result for result in runPrograms(paths, 2)}
+
+        self.assertEqual([result.path for result in results.values()], paths)
+
+        for name in ("count.cnstr", "same.cnstr"):
+            self.assertTrue(results[name].ok)
+            self.assertEqual(results[name].output, "3\n2\n1\n")
+            self.assertGreater(results[name].wallTime, 0)
+
+        self.assertEqual(results["lexer.cnstr"].stage, "compile")
+
+        # Undefined jump points are found before running.
+        self.assertEqual(results["jump.cnstr"].stage, "compile")
+        self.assertEqual(results["jump.cnstr"].output, "")
+        self.assertIn("Jump point 'nowhere' does not exist.", results["jump.cnstr"].error)
+
+        # Output written before a runtime error is kept.
+        self.assertEqual(results["zero.cnstr"].stage, "run")
+        self.assertEqual(results["zero.cnstr"].output, "hi\n")
+        self.assertIn("ZeroDivisionError", results["zero.cnstr"].error)
+
+    def test_unexpected_error_in_batch(self):
+        paths = [self.path("count.cnstr"), self.path("huge.cnstr"), self.path("same.cnstr")]
+
+        with open(paths[1], "w") as f:
+            f.write('stdout "hi" endl\npow 10 5000 rb\nstdout rb endl\n')
+
+        results = runPrograms(paths, 2)
+
+        self.assertEqual([result.ok for result in results], [True, False, True])
+        self.assertEqual(results[1].stage, "run")
+        self.assertEqual(results[1].output, "hi\n")
+        self.assertTrue(results[1].error)
+        self.assertEqual(results[2].output, "3\n2\n1\n")
+
+    def test_unreadable_program(self):
+        result, = runPrograms([self.path("missing.cnstr")], 1)
+        self.assertEqual(result.stage, "read")
+
+
+if __name__ == "__main__":
+    unittest.main()
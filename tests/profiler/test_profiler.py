@@ -0,0 +1,124 @@
+import contextlib
+import glob
+import io
+import json
+import os
+import unittest
+
+from lexer import Lexer
+from interpreter import Interpreter
+from errors import CnstrError, CnstrRuntimeError
+from profiler import LineProfile
+from output import CaptureSink
+
+PROGRAMS = os.path.join(os.path.dirname(__file__), "..", "..", "programs")
+
+NESTED = (
+    "set rn 3\n"
+    'setjmpp "outer"\n'
+    "set rm 4\n"
+    'setjmpp "inner"\n'
+    "add rt rm rt\n"
+    "sub rm 1 rm\n"
+    'jmpif "inner" rm > 0\n'
+    "sub rn 1 rn\n"
+    'jmpif "outer" rn > 0\n'
+    "stdout rt\n"
+)
+
+
+def profile(source: str) -> tuple[LineProfile, Interpreter, str]:
+    sink = CaptureSink()
+    interpreter = Interpreter(Lexer(source).tokenize(), sink)
+    lineProfile = interpreter.profileLines()
+
+    return lineProfile, interpreter, sink.getvalue().decode()
+
+
+class TestProfiler(unittest.TestCase):
+    def test_same_as_run(self):
+        for path in sorted(glob.glob(os.path.join(PROGRAMS, "*.cnstr"))):
+            with open(path, "r") as f:
+                source = f.read()
+
+            results = []
+
+            for mode in ("run", "profile"):
+                output = io.StringIO()
+
+                with contextlib.redirect_stdout(output):
+                    interpreter = Interpreter(Lexer(source).tokenize())
+                    try:
+                        if mode == "run":
+                            interpreter.run()
+                        else:
+                            interpreter.profileLines()
+                    except CnstrError as error:
+                        print(error)
+
+                results.append((output.getvalue(), dict(interpreter._registers)))
+
+            with self.subTest(program=os.path.basename(path)):
+                self.assertEqual(results[0], results[1])
+
+    def test_counts(self):
+        lineProfile, _, output = profile(NESTED)
+        self.assertEqual(output, "30")
+
+        counts = {line.lineNum: line.count for line in lineProfile.lines()}
+        self.assertEqual(counts, {0: 1, 1: 1, 2: 3, 3: 3, 4: 12, 5: 12, 6: 12, 7: 3, 8: 3, 9: 1})
+
+        opcodes = {opcode.opcode: opcode.count for opcode in lineProfile.opcodes()}
+        self.assertEqual(opcodes["sub"], 15)
+        self.assertEqual(opcodes["jmpif"], 15)
+
+        loops = {(loop.label, loop.lineNum): loop.trips for loop in lineProfile.loops()}
+        self.assertEqual(loops, {("inner", 6): 9, ("outer", 8): 2})
+
+        self.assertEqual(
+            lineProfile.totalTime, sum(line.time for line in lineProfile.lines())
+        )
+
+    def test_report(self):
+        lineProfile, _, _ = profile(NESTED)
+        report = lineProfile.format()
+
+        self.assertIn("line 4: add rt rm rt", report)
+        self.assertIn("'inner' from line 6", report)
+
+        data = json.loads(json.dumps(lineProfile.toJson()))
+        self.assertEqual(len(data["lines"]), 10)
+        self.assertEqual(data["loops"][0]["label"], "inner")
+
+    def test_collapsed_stacks(self):
+        lineProfile, _, _ = profile(NESTED)
+        stacks = {}
+
+        for line in lineProfile.collapsed().splitlines():
+            frames, time = line.rsplit(" ", 1)
+            stacks[frames] = int(time)
+
+        self.assertIn("<cnstr>;line 0: set rn 3", stacks)
+        self.assertIn("<cnstr>;loop 'outer' line 8;line 2: set rm 4", stacks)
+        self.assertIn(
+            "<cnstr>;loop 'outer' line 8;loop 'inner' line 6;line 4: add rt rm rt",
+            stacks,
+        )
+        self.assertEqual(sum(stacks.values()), lineProfile.totalTime)
+
+    def test_kept_on_error(self):
+        source = 'set ra 2\nsetjmpp "loop"\nsub ra 1 ra\ndiv 1 ra rb\njmp "loop"\n'
+        interpreter = Interpreter(Lexer(source).tokenize(), CaptureSink())
+        program = interpreter.compile()
+        lineProfile = LineProfile(program)
+
+        with self.assertRaises(CnstrRuntimeError):
+            interpreter.profileLines(program, lineProfile)
+
+        counts = {line.lineNum: line.count for line in lineProfile.lines()}
+        self.assertEqual(counts[2], 2)
+        self.assertEqual(lineProfile.loops()[0].trips, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+import io
+import os
+import tempfile
+import unittest
+
+from lexer import Lexer
+from interpreter import Interpreter
+from compiler import Program
+from errors import CnstrLimitError, CnstrSnapshotError
+from limits import Limits
+from output import BufferedSink, CaptureSink
+from snapshot import Snapshot, Checkpoints
+
+PROGRAM = (
+    "set rn 200\n"
+    'set rs ""\n'
+    'setjmpp "loop"\n'
+    'strapp rs "x" rs\n'
+    "stdout rn ,\n"
+    "sub rn 1 rn\n"
+    'jmpif "loop" rn > 0\n'
+    "strlen rs rl\n"
+    "stdout rl endl\n"
+)
+
+
+def compileSource(source: str) -> Program:
+    return Interpreter(Lexer(source).tokenize()).compile()
+
+
+def runWith(program: Program, **options) -> tuple[str, Interpreter]:
+    sink = CaptureSink()
+    interpreter = Interpreter([], sink)
+    interpreter.run(program, **options)
+
+    return sink.getvalue().decode(), interpreter
+
+
+class TestSnapshot(unittest.TestCase):
+    def test_resume_from_checkpoints(self):
+        program = compileSource(PROGRAM)
+        expected, finished = runWith(program)
+
+        for fuse in (True, False):
+            snapshots = []
+            output, _ = runWith(
+                program, fuse=fuse, checkpoints=Checkpoints(100, snapshots.append)
+            )
+            self.assertEqual(output, expected)
+            self.assertGreater(len(snapshots), 5)
+
+            for snapshot in snapshots:
+                with self.subTest(fuse=fuse, pc=snapshot.pc, rn=snapshot.registers["rn"]):
+                    snapshot = Snapshot.loads(snapshot.dumps())
+                    output, interpreter = runWith(program, fuse=fuse, resume=snapshot)
+
+                    # Resumed runs write what was left to write.
+                    self.assertTrue(expected.endswith(output))
+                    self.assertLess(len(output), len(expected))
+                    self.assertEqual(
+                        dict(interpreter._registers), dict(finished._registers)
+                    )
+
+    def test_redefined_jump_point(self):
+        program = compileSource(
+            'setjmpp "a"\n'
+            "add rn 1 rn\n"
+            "stdout rn endl\n"
+            'jmpif "a" rn < 5\n'
+            'jmp "end"\n'
+            'setjmpp "a"\n'
+            'stdout "never" endl\n'
+            'setjmpp "end"\n'
+        )
+        expected, _ = runWith(program)
+        self.assertEqual(expected, "1\n2\n3\n4\n5\n")
+
+        for fuse in (True, False):
+            snapshots = []
+            runWith(program, fuse=fuse, checkpoints=Checkpoints(1, snapshots.append))
+            self.assertTrue(snapshots)
+
+            for snapshot in snapshots:
+                with self.subTest(fuse=fuse, pc=snapshot.pc, rn=snapshot.registers["rn"]):
+                    output, _ = runWith(program, fuse=fuse, resume=snapshot)
+                    self.assertTrue(expected.endswith(output), output)
+
+    def test_pending_output(self):
+        program = compileSource(PROGRAM)
+        stream = io.StringIO()
+        interpreter = Interpreter([], BufferedSink(stream))
+        snapshots = []
+
+        # Checkpoints flush the output, snapshots of the sink take the rest.
+        interpreter.run(program, checkpoints=Checkpoints(100, snapshots.append))
+        self.assertEqual(snapshots[0].output, "")
+
+        sink = BufferedSink(io.StringIO())
+        interpreter = Interpreter([], sink)
+        interpreter.run(program)
+        sink.write("unflushed")
+
+        snapshot = interpreter.snapshot()
+        self.assertEqual(snapshot.output, "unflushed")
+        self.assertEqual(snapshot.pc, len(program.instructions))
+        self.assertEqual(snapshot.registers["rs"], "x" * 200)
+
+        output, _ = runWith(program, resume=Snapshot.loads(snapshot.dumps()))
+        self.assertEqual(output, "unflushed")
+
+    def test_file(self):
+        program = compileSource(PROGRAM)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "run.snapshot")
+            runWith(program, checkpoints=Checkpoints.toFile(path, 300))
+
+            self.assertEqual(os.listdir(directory), ["run.snapshot"])
+
+            snapshot = Snapshot.load(path)
+            self.assertGreater(snapshot.pc, 0)
+            self.assertEqual(snapshot.jumpPoints["loop"], 2)
+
+    def test_different_program(self):
+        snapshots = []
+        runWith(compileSource(PROGRAM), checkpoints=Checkpoints(100, snapshots.append))
+
+        with self.assertRaises(CnstrSnapshotError):
+            runWith(compileSource(PROGRAM + "set rz 1\n"), resume=snapshots[0])
+
+    def test_invalid_data(self):
+        with self.assertRaises(CnstrSnapshotError):
+            Snapshot.loads(b"CNSTRBC")
+
+        with self.assertRaises(CnstrSnapshotError):
+            Snapshot.loads(b"CNSTRSN garbage")
+
+        snapshot = Snapshot("hash", 0, {"ra": 1}, {}).dumps()
+        with self.assertRaises(CnstrSnapshotError):
+            Snapshot.loads(snapshot[:-4])
+
+    def test_resume_after_limit(self):
+        program = compileSource(PROGRAM)
+        expected, _ = runWith(program)
+        snapshots = []
+
+        sink = CaptureSink()
+        interpreter = Interpreter([], sink, limits=Limits(maxInstructions=500))
+
+        with self.assertRaises(CnstrLimitError):
+            interpreter.run(program, checkpoints=Checkpoints(50, snapshots.append))
+
+        before = sink.getvalue().decode()
+        snapshot = snapshots[-1]
+
+        # The output from the last checkpoint up to the limit is repeated.
+        output, _ = runWith(program, resume=snapshot)
+        self.assertEqual(before[: len(expected) - len(output)] + output, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
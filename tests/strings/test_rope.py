@@ -0,0 +1,113 @@
+import unittest
+
+from rope import Rope, concat, MIN_ROPE_LENGTH
+from tests.helpers import execute
+
+BACKENDS = ("reference", "closures", "pyexec")
+
+
+class TestRope(unittest.TestCase):
+    def test_concat(self):
+        short = concat("ab", "cd")
+        self.assertIs(type(short), str)
+
+        long = concat("a" * MIN_ROPE_LENGTH, "b")
+        self.assertIs(type(long), Rope)
+        self.assertEqual(long, "a" * MIN_ROPE_LENGTH + "b")
+        self.assertEqual(len(concat(long, long)), 2 * len(long))
+
+    def test_values_are_independent(self):
+        base = Rope("abc")
+        first = base.append("d")
+        second = base.append("e")
+        third = first.append("f")
+
+        self.assertEqual(str(base), "abc")
+        self.assertEqual(str(first), "abcd")
+        self.assertEqual(str(second), "abce")
+        self.assertEqual(str(third), "abcdf")
+        self.assertEqual(str(first.append("g")), "abcdg")
+
+    def test_length_without_joining(self):
+        rope = Rope("abc").append("de").append("f")
+
+        self.assertEqual(len(rope), 6)
+        self.assertIsNone(rope._string)
+
+    def test_compares_like_str(self):
+        rope = Rope("abc").append("d")
+
+        self.assertEqual(rope, "abcd")
+        self.assertEqual("abcd", rope)
+        self.assertLess(rope, "abce")
+        self.assertGreater("abce", rope)
+        self.assertNotEqual(rope, 1.0)
+        self.assertEqual(repr(rope), repr("abcd"))
+        self.assertEqual(rope[1], "b")
+        with self.assertRaises(TypeError):
+            rope < 1.0
+
+    def test_programs(self):
+        source = (
+            "set rs ''\n"
+            "set rc 'abc'\n"
+            "cpy rs rk\n"
+            'setjmpp "loop"\n'
+            "strapp rs rc rs\n"
+            "add ri 1 ri\n"
+            "cpy rs rk\n"
+            "strapp rk '!' rk\n"
+            'jmpif "loop" ri < 200\n'
+            "strlen rs rl\n"
+            "sub rl 1 rj\n"
+            "charat rs rj rz\n"
+            "strapp rs rs rd\n"
+            "strlen rd rm\n"
+            "cpy rs rt\n"
+            'jmpif "same" rt = rs\n'
+            "stdout 'different'\n"
+            'setjmpp "same"\n'
+            "stdout rl , rz , rm , rk endl\n"
+        )
+        expected, expectedRegisters, _ = execute(source, "reference")
+
+        self.assertTrue(expected.startswith(f"600 c 1200 {'abc' * 200}!\n"))
+
+        for backend in BACKENDS[1:]:
+            with self.subTest(backend):
+                output, registers, _ = execute(source, backend)
+                self.assertEqual(output, expected)
+                self.assertEqual(registers, expectedRegisters)
+
+    def test_math_on_long_strings(self):
+        # 'add' and 'mul' of strings work, and the other operators fail the
+        # same way, on both sides of the rope threshold.
+        for length in (10, MIN_ROPE_LENGTH - 1, MIN_ROPE_LENGTH + 44):
+            string = "x" * length
+            source = (
+                f"set ra '{string}'\n"
+                "strapp ra 'y' rb\n"
+                "add rb rb rc\n"
+                "mul rb 2 rd\n"
+                "set rz 'z'\n"
+                "add rz rb re\n"
+                "stdout rc , rd , re endl\n"
+            )
+            expected = f"{string}y{string}y " * 2 + f"z{string}y\n"
+
+            for backend in BACKENDS:
+                with self.subTest(length=length, backend=backend):
+                    output, _, _ = execute(source, backend)
+                    self.assertEqual(output, expected)
+
+                    output, _, _ = execute(f"set ra '{string}'\nsub ra 1 rb\n", backend)
+                    self.assertIn("unsupported operand type(s) for -: 'str'", output)
+
+                    output, _, _ = execute(
+                        f"set ra '{string}'\nstrapp ra 'y' rb\nsub rb 1 rc\n", backend
+                    )
+                    self.assertIn("unsupported operand type(s) for -: 'str'", output)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import glob
+import os
+import unittest
+
+from lexer import Lexer
+from interpreter import Interpreter
+from tests.helpers import execute
+from transpiler import Transpiler, CHAIN_LENGTH
+from limits import Limits
+
+PROGRAMS = os.path.join(os.path.dirname(__file__), "..", "..", "programs")
+
+
+class TestTranspiler(unittest.TestCase):
+    def assertSameAsReference(self, source: str):
+        output, registers, jumpPoints = execute(source, "pyexec")
+        expectedOutput, expectedRegisters, expectedJumpPoints = execute(source, "reference")
+
+        self.assertEqual(output, expectedOutput)
+        self.assertEqual(jumpPoints, expectedJumpPoints)
+
+        # Compiled programs preallocate every register they mention.
+        for register, value in registers.items():
+            self.assertEqual(value, expectedRegisters.get(register, 0.0))
+        self.assertLessEqual(expectedRegisters.keys(), registers.keys())
+
+    def test_programs(self):
+        for name in sorted(glob.glob(os.path.join(PROGRAMS, "*.cnstr"))):
+            with open(name) as f:
+                source = f.read()
+            with self.subTest(name):
+                self.assertSameAsReference(source)
+
+    def test_strings(self):
+        self.assertSameAsReference(
+            'set rs "abc"\n'
+            'strapp rs "def" rs\n'
+            "strlen rs rl\n"
+            "set ri 1\n"
+            "charat rs ri rc\n"
+            "stdout rc , rl , \"x\" endl\n"
+        )
+
+    def test_math(self):
+        self.assertSameAsReference(
+            "set ra 7\n"
+            "sub ra 2 rb\n"
+            "mul -3 rb rc\n"
+            "pow -2 2 rh\n"
+            "div rc ra rd\n"
+            "mod rc 4 re\n"
+            "pow 2 10 rf\n"
+            "mov rf rg\n"
+            "mov rg rg\n"
+            "stdout ra rb rc rd re rf rg rh\n"
+        )
+
+    def test_jumps(self):
+        self.assertSameAsReference(
+            'jmp "skip"\n'
+            "stdout 'skipped'\n"
+            'setjmpp "skip"\n'
+            "add ri 1 ri\n"
+            'jmpif "skip" ri <= 3\n'
+            'jmpif "skip" ri != ri\n'
+            'setjmpp "self"\n'
+            "add rj 2 rj\n"
+            'jmpif "self" rj < 10\n'
+            'jmpif "end" rj >= 10\n'
+            "stdout 'skipped'\n"
+            'setjmpp "end"\n'
+            "stdout ri , rj\n"
+        )
+
+    def test_duplicate_jump_points(self):
+        self.assertSameAsReference(
+            'jmp "x"\n'
+            'setjmpp "a"\n'
+            "add ri 1 ri\n"
+            'jmpif "b" ri > 2\n'
+            'jmp "a"\n'
+            'setjmpp "x"\n'
+            "add rj 1 rj\n"
+            'jmp "a"\n'
+            'setjmpp "a"\n'
+            'jmp "start"\n'
+            'setjmpp "b"\n'
+            "stdout ri , rj\n"
+        )
+
+    def test_runtime_errors(self):
+        for source in (
+            'jmp "missing"\n',
+            'set ra 2\njmpif "missing" ra = 1\n',
+            "set ra 1\nstrlen ra rb\n",
+            "set ra 'abc'\nset ri 5\ncharat ra ri rb\n",
+            "set ra 'abc'\nstrlen ra ri\ncharat ra ri rb\n",
+            "set ra 'abc'\ncharat ra 1 rb\n",
+            "set ra 'abc'\nset rb 1\nstrapp ra rb rc\n",
+        ):
+            with self.subTest(source):
+                self.assertSameAsReference(source)
+
+    def test_self_loops_become_inner_loops(self):
+        source = 'setjmpp "loop"\nadd ri 1 ri\njmpif "loop" ri < 10\n'
+        program = Interpreter(Lexer(source).tokenize()).compile()
+
+        self.assertIn("    while True:\n", Transpiler(program).transpile().split("if block == 0:")[1])
+
+    def test_many_blocks(self):
+        # Jumps back and forth between blocks in different chains of the
+        # bisected dispatch, with and without limits.
+        lines = []
+        for i in range(CHAIN_LENGTH * 5):
+            lines += [f'setjmpp "p{i}"', f"add ra {i} ra", f'jmpif "p{i}" ra < 0']
+        lines += [
+            "add rn 1 rn",
+            'jmpif "back" rn > 3',
+            'jmp "p3"',
+            'setjmpp "back"',
+            "stdout ra , rn endl",
+        ]
+        source = "\n".join(lines) + "\n"
+        program = Interpreter(Lexer(source).tokenize()).compile()
+
+        self.assertIn("if block < ", Transpiler(program).transpile())
+        self.assertSameAsReference(source)
+
+        interpreter = Interpreter(
+            Lexer(source).tokenize(), limits=Limits(maxInstructions=10_000)
+        )
+        interpreter.runTranspiled()
+        self.assertEqual(interpreter._registers["rn"], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,191 @@
+import glob
+import os
+import unittest
+
+from lexer import Lexer
+from compiler import Compiler, Program
+from typeinference import TypeInference, ValueType, worthInferring
+from tests.helpers import run
+
+PROGRAMS = os.path.join(os.path.dirname(__file__), "..", "..", "programs")
+
+STRINGS = (
+    'set rs ""\n'
+    "set rn 5\n"
+    'setjmpp "build"\n'
+    'strapp rs "ab" rs\n'
+    "sub rn 1 rn\n"
+    'jmpif "build" rn > 0\n'
+    "strlen rs rl\n"
+    'set rr ""\n'
+    'setjmpp "walk"\n'
+    "sub rl 1 rl\n"
+    "charat rs rl rc\n"
+    "strapp rr rc rr\n"
+    "div rl 2 rh\n"
+    'jmpif "walk" rl > 0\n'
+    "stdout rr , rh endl\n"
+)
+
+# Programs whose checks can't be proven away, or fail while running.
+UNPROVEN = (
+    # 'rx' is a string on the first trip and a number after.
+    'set rx "s"\nset rn 3\nsetjmpp "loop"\nstrlen rx ry\nset rx 1\n'
+    'sub rn 1 rn\njmpif "loop" rn > 0\n',
+    # The index runs past the end of the string.
+    'set rs "abc"\nset ri 0\nsetjmpp "loop"\ncharat rs ri rc\n'
+    'add ri 1 ri\njmpif "loop" ri < 5\n',
+    # Division by zero on ints.
+    'set ra 4\nset rb 2\nsetjmpp "loop"\ndiv ra rb rc\nsub rb 1 rb\n'
+    'jmpif "loop" rb > -1\n',
+)
+
+
+def compileSource(source: str, legacyFloats: bool = False) -> Program:
+    lexer = Lexer(source, legacyFloats)
+    return Compiler(lexer.iterLines(), legacyFloats=legacyFloats).compile()
+
+
+def runAll(source: str, legacyFloats: bool = False, inputs=None) -> list:
+    """
+    Returns the output, registers and error of the reference interpreter
+    and of the compiled backends.
+    """
+    results = []
+
+    for backend in ("reference", "closures", "pyexec"):
+        output, interpreter, error = run(source, backend, legacyFloats, inputs=inputs)
+
+        # The reference interpreter only creates the registers it reached.
+        if error is None:
+            results.append((output, dict(interpreter._registers), None))
+        else:
+            results.append((output, None, str(error)))
+
+    return results
+
+
+class TestTypeInference(unittest.TestCase):
+    def test_types(self):
+        program = compileSource(STRINGS)
+        types = TypeInference(program, {}).infer()
+
+        # Before 'charat rs rl rc', on every trip around "walk".
+        registers = types.registerTypes(10)
+        self.assertEqual(registers["rs"], ValueType.STRING)
+        self.assertEqual(registers["rl"], ValueType.INT)
+        self.assertEqual(registers["rc"], ValueType.INT | ValueType.STRING)
+        self.assertEqual(registers["rh"], ValueType.NUMBER)
+
+        charat = program.instructions[10]
+        self.assertTrue(types.proven(charat, 0, ValueType.STRING))
+        self.assertTrue(types.proven(charat, 1, ValueType.NUMBER))
+        self.assertTrue(types.proven(program.instructions[11], 1, ValueType.STRING))
+        self.assertTrue(types.proven(program.instructions[12], 0, ValueType.INT))
+        self.assertEqual(types.errors(), [])
+
+    def test_unknown_inputs(self):
+        program = compileSource(STRINGS.replace('set rs ""\n', "// rs is an input\n"))
+        strapp = program.instructions[3]
+
+        types = TypeInference(program).infer()
+        self.assertFalse(types.proven(strapp, 0, ValueType.STRING))
+        self.assertEqual(types.registerTypes(0)["rs"], ValueType.ANY)
+
+        # After the first 'strapp' it is a string either way.
+        self.assertTrue(types.proven(program.instructions[10], 0, ValueType.STRING))
+
+        types = TypeInference(program, {"rs": "xy"}).infer()
+        self.assertTrue(types.proven(strapp, 0, ValueType.STRING))
+
+        types = TypeInference(program, {}).infer()
+        self.assertEqual(types.registerTypes(3)["rs"], ValueType.INT | ValueType.STRING)
+        self.assertEqual(types.errors(), [])
+
+    def test_errors(self):
+        source = (
+            "set rn 3\n"
+            'set rs "abc"\n'
+            "strlen rn rl\n"
+            "add rs 1 ry\n"
+            "mul rs 2 ry\n"
+            'jmpif "start" rs < rn\n'
+            "charat rs rs rc\n"
+            'strapp rs "x" rs\n'
+        )
+        errors = TypeInference(compileSource(source), {}).infer().errors()
+
+        self.assertEqual([error.lineNum for error in errors], [2, 3, 5, 6])
+        self.assertIn("'rn' is always a number", errors[0].message)
+        self.assertIn("the string in 'rs' and the number 1", errors[1].message)
+
+        # Literal indices are never numbers with legacy floats.
+        source = 'set rs "abc"\ncharat rs 1 rc\n'
+        errors = TypeInference(compileSource(source, True), {}).infer().errors()
+        self.assertEqual([error.lineNum for error in errors], [1])
+
+    def test_string_math(self):
+        # 'rs' is a rope after the loop, and adds and multiplies like a str.
+        source = (
+            'set rs ""\n'
+            "set rn 200\n"
+            'setjmpp "build"\n'
+            'strapp rs "ab" rs\n'
+            "sub rn 1 rn\n"
+            'jmpif "build" rn > 0\n'
+            "add rs rs rt\n"
+            "mul rs 2 ru\n"
+            "strlen rt rl\n"
+            "strlen ru rm\n"
+            "stdout rl , rm endl\n"
+        )
+        program = compileSource(source)
+        types = TypeInference(program, {}).infer()
+
+        registers = types.registerTypes(8)
+        self.assertEqual(registers["rt"], ValueType.STRING)
+        self.assertEqual(registers["ru"], ValueType.STRING)
+        self.assertTrue(types.proven(program.instructions[8], 0, ValueType.STRING))
+        self.assertEqual(types.errors(), [])
+
+        reference, *compiled = runAll(source)
+        self.assertEqual(reference[0], "800 800\n")
+
+        for result in compiled:
+            self.assertEqual(result, reference)
+
+    def test_worth_inferring(self):
+        self.assertTrue(worthInferring(compileSource(STRINGS)))
+        self.assertFalse(worthInferring(compileSource('set rs "a"\nstrlen rs rl\n')))
+        self.assertFalse(
+            worthInferring(compileSource('setjmpp "loop"\nadd ra 1 ra\njmp "loop"\n'))
+        )
+
+    def test_same_as_reference(self):
+        sources = [STRINGS, *UNPROVEN]
+
+        for path in sorted(glob.glob(os.path.join(PROGRAMS, "*.cnstr"))):
+            with open(path, "r") as f:
+                sources.append(f.read())
+
+        for source in sources:
+            for legacyFloats in (False, True):
+                with self.subTest(source=source[:40], legacy=legacyFloats):
+                    reference, *compiled = runAll(source, legacyFloats)
+
+                    for result in compiled:
+                        self.assertEqual(result, reference)
+
+    def test_inputs(self):
+        source = STRINGS.replace('set rs ""\n', "// rs is an input\n")
+
+        for inputs in ({"rs": "xy"}, {"rs": 7}):
+            with self.subTest(inputs=inputs):
+                reference, *compiled = runAll(source, inputs=inputs)
+
+                for result in compiled:
+                    self.assertEqual(result, reference)
+
+
+if __name__ == "__main__":
+    unittest.main()